@@ -0,0 +1,217 @@
+"""
+Bloom filters over storage keys.
+
+A `KeyFilter` answers "is this key certainly absent?" from memory, so
+membership checks for missing keys skip the round trip through the
+writer queue. Positive answers still go to the database, and the false
+ones are counted.
+
+Filters live on the connection like document caches and learn every key
+written through a storage handle. Deleted keys stay in the filter, which
+only costs a database lookup. Keys written by other connections are only
+seen after a rebuild, triggered by `PRAGMA data_version` when a
+`check_interval` is set.
+"""
+import math
+import time
+from hashlib import blake2b
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from .threads import SqliteMultiThread
+
+
+class KeyFilter:
+    """
+    Bloom filter over the keys of one table.
+
+    Args:
+        connection (SqliteMultiThread): Connection used to scan the keys.
+        name (str): Table name, already quoted for SQL.
+        column (str): Key column name.
+        text_keys (bool): Whether the key column has TEXT affinity, str keys
+            are only filtered when SQLite compares them as text.
+        capacity (int): Expected number of keys, the filter is rebuilt
+            twice as large when exceeded. None sizes it from the table.
+        error_rate (float): Target false positive rate.
+        check_interval (float): Seconds between `PRAGMA data_version`
+            checks for writes by other connections, None never checks.
+    """
+
+    def __init__(self, connection: SqliteMultiThread, name: str,
+                 column: str, text_keys: bool = True,
+                 capacity: Optional[int] = None, error_rate: float = 0.01,
+                 check_interval: Optional[float] = None):
+        self.__conn = connection
+        self.__name = name
+        self.column = column
+        self.text_keys = text_keys
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.check_interval = check_interval
+        self.__lock = Lock()
+        self.__data_version = None
+        self.__checked_at = 0.0
+        # (size in bits, hash count, bits), swapped whole on rebuild
+        self.__state = None
+        # Keys added while a rebuild scans the table
+        self.__pending = None
+        self.entries = 0
+        self.lookups = 0
+        self.negatives = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+
+    def __digest(self, key) -> Optional[bytes]:
+        '''
+        Bytes to hash for `key`, None for keys SQLite may compare
+        differently (floats, str keys on numeric columns...)
+        '''
+        if type(key) is str:
+            if not self.text_keys:
+                return None
+            return b's' + key.encode('utf-8', 'surrogatepass')
+        if type(key) is int:
+            # Stored as text in TEXT columns, compared as text either way
+            return b's' + str(key).encode('ascii')
+        if type(key) is bytes:
+            return b'b' + key
+        return None
+
+    @staticmethod
+    def __positions(data: bytes, size: int, hashes: int):
+        digest = blake2b(data, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % size for i in range(hashes)]
+
+    @classmethod
+    def __set(cls, state, data: bytes) -> bool:
+        '''
+        Set the bits of `data`, True if any was unset (a new key)
+        '''
+        size, hashes, bits = state
+        new = False
+        for pos in cls.__positions(data, size, hashes):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                new = True
+        return new
+
+    def rebuild(self, capacity: Optional[int] = None):
+        '''
+        Rescan the keys of the table into a new filter
+        '''
+        self.__rebuild(capacity, [])
+
+    def __rebuild(self, capacity: Optional[int], pending: list):
+        '''
+        Rebuild, also setting `pending`: keys added but maybe not yet
+        written when the scan runs
+        '''
+        with self.__lock:
+            if self.__pending is not None:
+                # Another thread is already rebuilding
+                self.__pending.extend(pending)
+                return
+            self.__pending = pending
+        if capacity is not None:
+            self.capacity = capacity
+        if self.capacity is None:
+            GET_LEN = f'SELECT COUNT(*) FROM "{self.__name}"'
+            rows = self.__conn.select_one(GET_LEN)[0]
+            self.capacity = max(1024, 2 * rows)
+        # Optimal size and hash count for capacity and error rate
+        size = -self.capacity * math.log(self.error_rate) / math.log(2) ** 2
+        size = max(8, int(math.ceil(size / 8)) * 8)
+        hashes = max(1, round(size / self.capacity * math.log(2)))
+        state = (size, hashes, bytearray(size // 8))
+        entries = 0
+        try:
+            data_version = self.__conn.select_one('PRAGMA data_version')[0]
+            column = self.column.replace('"', '""')
+            GET_KEYS = f'SELECT "{column}" FROM "{self.__name}"'
+            for item in self.__conn.select(GET_KEYS):
+                data = self.__digest(item[0])
+                if data is not None and self.__set(state, data):
+                    entries += 1
+        except Exception:
+            with self.__lock:
+                self.__pending = None
+            raise
+        with self.__lock:
+            pending, self.__pending = self.__pending, None
+            for data in pending:
+                if self.__set(state, data):
+                    entries += 1
+            self.__state = state
+            self.entries = entries
+            self.__data_version = data_version
+            self.__checked_at = time.monotonic()
+            self.rebuilds += 1
+        if self.entries > self.capacity:
+            self.__rebuild(2 * self.entries, pending)
+
+    def validate(self):
+        '''
+        Rebuild if another connection committed since the last check
+        '''
+        if self.check_interval is None:
+            return
+        now = time.monotonic()
+        if now - self.__checked_at < self.check_interval:
+            return
+        version = self.__conn.select_one('PRAGMA data_version')[0]
+        self.__checked_at = now
+        if version != self.__data_version:
+            self.rebuild()
+
+    def add(self, key):
+        '''
+        Record a key before it is written
+        '''
+        data = self.__digest(key)
+        if data is None:
+            return
+        with self.__lock:
+            if self.__pending is not None:
+                self.__pending.append(data)
+            if self.__state is not None and self.__set(self.__state, data):
+                self.entries += 1
+            grow = self.__pending is None and self.entries > self.capacity
+        if grow:
+            self.__rebuild(2 * self.entries, [data])
+
+    def lookup(self, key) -> Optional[bool]:
+        '''
+        False if `key` is certainly absent, True if it may be present and
+        None if the filter cannot tell
+        '''
+        data = self.__digest(key)
+        if data is None or self.__state is None:
+            return None
+        self.validate()
+        self.lookups += 1
+        size, hashes, bits = self.__state
+        for pos in self.__positions(data, size, hashes):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                self.negatives += 1
+                return False
+        return True
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        size, hashes, _ = self.__state or (8, 1, None)
+        return {
+            'lookups': self.lookups,
+            'negatives': self.negatives,
+            'false_positives': self.false_positives,
+            'rebuilds': self.rebuilds,
+            'entries': self.entries,
+            'capacity': self.capacity,
+            'bits': size,
+            'hashes': hashes,
+            'estimated_error_rate':
+                (1 - math.exp(-hashes * self.entries / size)) ** hashes,
+        }
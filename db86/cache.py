@@ -0,0 +1,270 @@
+"""
+Decoded document and query result caches for JSON storages.
+
+A `DocumentCache` keeps recently read documents of one storage in LRU
+order, bounded by entry count and by the approximate size of their
+encoded JSON. Caches live on the connection, so every `JSONStorage`
+handle for the same table shares one cache and sees its writes.
+
+Writes made through the storage invalidate the affected keys. Writes
+from other connections or processes are detected through
+`PRAGMA data_version`, checked at most once every `check_interval`
+seconds.
+
+A `QueryCache` keeps results of `JSONStorage.query` for a whole
+database. Entries remember the write count of their storage, which every
+write through a storage bumps, so a result is reused until that storage
+changes.
+
+Both build on `LRUCache`, which owns the data_version check, the size
+accounting and the eviction.
+"""
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+from .threads import SqliteMultiThread
+
+MISSING = object()
+
+
+def copy_tree(obj: Any) -> Any:
+    '''
+    Copy nested dicts and lists, much cheaper than `copy.deepcopy`
+    for decoded JSON
+    '''
+    if type(obj) is dict:
+        return {k: copy_tree(v) for k, v in obj.items()}
+    if type(obj) is list:
+        return [copy_tree(v) for v in obj]
+    return obj
+
+
+class LRUCache:
+    """
+    LRU of values bounded by entry count and approximate size, shared by
+    the document and query caches.
+
+    Writes made through this connection are invalidated by the callers,
+    commits of other connections or processes clear everything once
+    `PRAGMA data_version` changes.
+
+    Args:
+        connection (SqliteMultiThread): Connection used for data_version.
+        max_entries (int): Maximum number of entries.
+        max_bytes (int): Maximum total size of the entries.
+        check_interval (float): Seconds between `PRAGMA data_version`
+            checks, 0 checks on every read at the cost of a blocking
+            round trip to the writer thread per hit.
+        copy (bool): Store and hand out copies so callers can mutate
+            their values.
+    """
+
+    def __init__(self, connection: SqliteMultiThread, max_entries: int,
+                 max_bytes: Optional[int], check_interval: float,
+                 copy: bool = True):
+        self.__conn = connection
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.copy = copy
+        self.__lock = Lock()
+        # key -> (value, size, *extra)
+        self.__items = OrderedDict()
+        self.__bytes = 0
+        self.__data_version = None
+        self.__checked_at = 0.0
+        # Bumped on every invalidation, a read started before it must not
+        # store what it fetched
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.__items)
+
+    def validate(self):
+        '''
+        Drop everything if another connection committed since last check
+        '''
+        now = time.monotonic()
+        if self.__data_version is not None and\
+                now - self.__checked_at < self.check_interval:
+            return
+        version = self.__conn.select_one('PRAGMA data_version')[0]
+        self.__checked_at = now
+        if self.__data_version is not None and\
+                version != self.__data_version:
+            self.clear()
+        self.__data_version = version
+
+    def _get(self, key, fresh: Optional[Callable[[tuple], bool]] = None
+             ) -> Any:
+        '''
+        Value cached for `key`, or `MISSING`. Entries failing `fresh`
+        are invalidated.
+        '''
+        self.validate()
+        with self.__lock:
+            item = self.__items.get(key, MISSING)
+            if item is not MISSING and fresh is not None\
+                    and not fresh(item):
+                del self.__items[key]
+                self.__bytes -= item[1]
+                self.invalidations += 1
+                item = MISSING
+            if item is MISSING:
+                self.misses += 1
+                return MISSING
+            self.__items.move_to_end(key)
+            self.hits += 1
+        return copy_tree(item[0]) if self.copy else item[0]
+
+    def _put(self, key, value: Any, size: int, generation: int, *extra):
+        '''
+        Store `value` of `size` bytes, read while the cache was at
+        `generation`, with `extra` kept next to it
+        '''
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        if self.copy:
+            value = copy_tree(value)
+        with self.__lock:
+            if generation != self.generation:
+                return
+            old = self.__items.pop(key, None)
+            if old is not None:
+                self.__bytes -= old[1]
+            self.__items[key] = (value, size, *extra)
+            self.__bytes += size
+            while len(self.__items) > self.max_entries or (
+                    self.max_bytes is not None
+                    and self.__bytes > self.max_bytes):
+                _, old = self.__items.popitem(last=False)
+                self.__bytes -= old[1]
+                self.evictions += 1
+
+    def discard(self, key):
+        '''
+        Invalidate a single key
+        '''
+        with self.__lock:
+            self.generation += 1
+            old = self.__items.pop(key, None)
+            if old is not None:
+                self.__bytes -= old[1]
+                self.invalidations += 1
+
+    def clear(self):
+        '''
+        Invalidate every key
+        '''
+        with self.__lock:
+            self.generation += 1
+            self.invalidations += len(self.__items)
+            self.__items.clear()
+            self.__bytes = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': len(self.__items),
+            'bytes': self.__bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+        }
+
+
+class DocumentCache(LRUCache):
+    """
+    LRU cache of decoded documents for one storage.
+
+    Args:
+        connection (SqliteMultiThread): Connection used for data_version.
+        max_entries (int): Maximum number of cached documents.
+        max_bytes (int): Maximum total size of the cached documents,
+            measured on their encoded JSON.
+        check_interval (float): Seconds between `PRAGMA data_version`
+            checks, 0 checks on every read at the cost of a blocking
+            round trip to the writer thread per hit.
+        copy (bool): Hand out copies so callers can mutate the result.
+            Disable only if cached documents are never modified in place.
+    """
+
+    def __init__(self, connection: SqliteMultiThread,
+                 max_entries: int = 1024,
+                 max_bytes: Optional[int] = 64 * 1024 * 1024,
+                 check_interval: float = 1.0, copy: bool = True):
+        super().__init__(connection, max_entries, max_bytes, check_interval,
+                         copy)
+
+    def get(self, key) -> Any:
+        '''
+        Cached document for `key`, or `MISSING`
+        '''
+        return self._get(key)
+
+    def put(self, key, value: Any, size: int, generation: int):
+        '''
+        Store a document read while the cache was at `generation`
+        '''
+        self._put(key, value, size, generation)
+
+
+class QueryCache(LRUCache):
+    """
+    LRU cache of `JSONStorage.query` results for one connection.
+
+    Args:
+        connection (SqliteMultiThread): Connection holding the per-storage
+            write counters and used for data_version.
+        max_entries (int): Maximum number of cached results.
+        max_bytes (int): Maximum total size of the cached results,
+            measured on their JSON.
+        check_interval (float): Seconds between `PRAGMA data_version`
+            checks, 0 checks on every query.
+    """
+
+    def __init__(self, connection: SqliteMultiThread,
+                 max_entries: int = 256,
+                 max_bytes: Optional[int] = 16 * 1024 * 1024,
+                 check_interval: float = 0.0):
+        super().__init__(connection, max_entries, max_bytes, check_interval)
+
+    @staticmethod
+    def make_key(name: str, recipe: Any, *args) -> Optional[str]:
+        '''
+        Canonical key for `recipe` on storage `name`, None if the recipe
+        cannot be serialized
+        '''
+        try:
+            return json.dumps([name, recipe, *args], sort_keys=True,
+                              separators=(',', ':'))
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, key: str, writes: int) -> Any:
+        '''
+        Cached result for `key` computed at `writes`, or `MISSING`
+        '''
+        # A result of an older write count means the storage changed
+        return self._get(key, lambda item: item[2] == writes)
+
+    def put(self, key: str, value: Any, writes: int, generation: int):
+        '''
+        Store a result computed at `writes` while the cache was at
+        `generation`
+        '''
+        try:
+            size = len(json.dumps(value, skipkeys=True, default=repr))
+        except (TypeError, ValueError):
+            return
+        self._put(key, value, size, generation, writes)
@@ -0,0 +1,329 @@
+"""
+Document codecs for JSON storages.
+
+A codec turns documents into the value stored in the `object` column and
+back. The codec of a storage is recorded in the `_db86_meta` table when
+the storage is created, so any later handle decodes it the same way.
+
+Codecs:
+    JSONCodec:
+        JSON text, default. Optional `dumps`/`loads` let a faster
+        encoder (orjson, ujson...) replace the stdlib.
+
+    JSONBCodec:
+        SQLite's binary JSON (SQLite 3.45+). Encoding happens in SQLite
+        and the JSON functions read it without re-parsing.
+
+    Codec:
+        Base class for custom codecs. Codecs which are not `native` are
+        exposed to SQLite through registered functions, so path queries
+        and filters keep working at the cost of a decode per row.
+
+    CompressedCodec:
+        Wraps another codec and compresses documents above a size
+        threshold with zlib (optionally with a shared dictionary) or lzma.
+"""
+import json
+import lzma
+import re
+import sqlite3
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+META_TABLE = '_db86_meta'
+
+
+class Codec:
+    """
+    Base class for document codecs.
+
+    Subclasses set `name`, implement `encode` and `decode`, and set
+    `native` when the encoded value is JSON text SQLite can read as is.
+    """
+    name: str = None
+    native: bool = False
+    column_type: str = 'BLOB'
+
+    def encode(self, value: Any) -> Union[str, bytes]:
+        raise NotImplementedError
+
+    def decode(self, data: Union[str, bytes]) -> Any:
+        raise NotImplementedError
+
+    def text(self, data: Union[str, bytes]) -> str:
+        '''
+        JSON text of a stored value
+        '''
+        return json.dumps(self.decode(data))
+
+    def check(self):
+        '''
+        Raise if the codec cannot be used with this SQLite
+        '''
+
+    @property
+    def functions(self) -> Dict[str, Callable]:
+        '''
+        SQL functions to register for a non-native codec
+        '''
+        if self.native:
+            return {}
+        return {
+            self.load_function: lambda x: None if x is None
+            else json.dumps(self.decode(x)),
+            self.dump_function: lambda x: None if x is None
+            else self.encode(json.loads(x)),
+        }
+
+    @property
+    def load_function(self) -> str:
+        return f'db86_load_{self.name}'
+
+    @property
+    def dump_function(self) -> str:
+        return f'db86_dump_{self.name}'
+
+    def column_sql(self, column: str) -> str:
+        '''
+        Expression selected for `decode`
+        '''
+        return column
+
+    def bind_sql(self) -> str:
+        '''
+        Placeholder for a value returned by `encode`
+        '''
+        return '?'
+
+    def document_sql(self, column: str) -> str:
+        '''
+        Expression the SQLite JSON functions can read
+        '''
+        if self.native:
+            return column
+        return f'{self.load_function}({column})'
+
+    def store_sql(self, expr: str) -> str:
+        '''
+        Convert the JSON text `expr` back into the stored value
+        '''
+        if self.native:
+            return expr
+        return f'{self.dump_function}({expr})'
+
+
+class JSONCodec(Codec):
+    """
+    JSON text codec.
+
+    Args:
+        dumps (Callable): Encoder, may return str or UTF-8 bytes.
+        loads (Callable): Decoder, accepting str.
+        name (str): Codec name, required with a custom `dumps`/`loads`.
+    """
+    native = True
+    column_type = 'TEXT'
+
+    def __init__(self, dumps: Optional[Callable] = None,
+                 loads: Optional[Callable] = None, name: str = 'json'):
+        self.name = name
+        self.dumps = dumps or json.dumps
+        self.loads = loads or json.loads
+
+    def encode(self, value: Any) -> str:
+        data = self.dumps(value)
+        # SQLite's JSON functions refuse BLOBs
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return data
+
+    def decode(self, data: str) -> Any:
+        return self.loads(data)
+
+    def text(self, data: str) -> str:
+        return data
+
+
+class JSONBCodec(JSONCodec):
+    """
+    SQLite binary JSON, text goes in and out through `jsonb()`/`json()`.
+    """
+    column_type = 'BLOB'
+
+    def __init__(self, dumps: Optional[Callable] = None,
+                 loads: Optional[Callable] = None, name: str = 'jsonb'):
+        super().__init__(dumps, loads, name)
+
+    def check(self):
+        if sqlite3.sqlite_version_info < (3, 45, 0):
+            raise RuntimeError(
+                f'Codec {self.name} requires SQLite 3.45+,'
+                f' found {sqlite3.sqlite_version}'
+            )
+
+    def column_sql(self, column: str) -> str:
+        return f'json({column})'
+
+    def bind_sql(self) -> str:
+        return 'jsonb(?)'
+
+    def store_sql(self, expr: str) -> str:
+        return f'jsonb({expr})'
+
+
+class CompressedCodec(Codec):
+    """
+    Compress the output of `codec` for documents of `threshold` bytes or
+    more.
+
+    Smaller documents are stored exactly as `codec` encodes them, larger
+    ones as a BLOB starting with a one byte header naming the compression,
+    so every row decodes on its own and the threshold can change freely.
+
+    Args:
+        codec (Codec): Codec producing the uncompressed value.
+        method (str): 'zlib' or 'lzma'.
+        threshold (int): Minimum encoded size to compress, in bytes.
+        dictionary (bytes): Shared zlib dictionary, see `train_dictionary`.
+            Readers need the same dictionary to decode.
+    """
+    RAW = b'\x00'
+    HEADERS = {'zlib': b'z', 'lzma': b'x'}
+    ZDICT = b'd'
+    column_type = 'BLOB'
+
+    def __init__(self, codec: Codec, method: str = 'zlib',
+                 threshold: int = 1024, dictionary: Optional[bytes] = None):
+        if method not in self.HEADERS:
+            raise ValueError(f'Unknown compression: {method}')
+        if dictionary and method != 'zlib':
+            raise ValueError('Dictionaries are only supported with zlib')
+        if isinstance(codec, (JSONBCodec, CompressedCodec)):
+            raise ValueError(f'Codec {codec.name} cannot be compressed')
+        self.codec = codec
+        self.method = method
+        self.threshold = threshold
+        self.dictionary = dictionary or None
+        # Function names must differ between readers of other settings
+        tag = zlib.crc32(self.dictionary or b'')
+        self.name = f'{codec.name}_{method}_{threshold}_{tag:08x}'
+
+    def check(self):
+        self.codec.check()
+
+    def pack(self, data: Union[str, bytes]) -> Union[str, bytes]:
+        '''
+        Compress the output of the inner codec if large enough
+        '''
+        raw = data.encode('utf-8') if isinstance(data, str) else data
+        if len(raw) < self.threshold:
+            return data if isinstance(data, str) else self.RAW + data
+        if self.method == 'lzma':
+            return self.HEADERS['lzma'] + lzma.compress(raw)
+        if self.dictionary is None:
+            return self.HEADERS['zlib'] + zlib.compress(raw)
+        compressor = zlib.compressobj(zdict=self.dictionary)
+        return self.ZDICT + compressor.compress(raw) + compressor.flush()
+
+    def unpack(self, data: Union[str, bytes]) -> Union[str, bytes]:
+        '''
+        Stored value back to the output of the inner codec
+        '''
+        if isinstance(data, str):
+            return data
+        head, body = data[:1], data[1:]
+        if head == self.RAW:
+            return body
+        if head == self.HEADERS['zlib']:
+            body = zlib.decompress(body)
+        elif head == self.ZDICT:
+            if self.dictionary is None:
+                raise ValueError('Document needs a compression dictionary')
+            decompressor = zlib.decompressobj(zdict=self.dictionary)
+            body = decompressor.decompress(body) + decompressor.flush()
+        elif head == self.HEADERS['lzma']:
+            body = lzma.decompress(body)
+        else:
+            raise ValueError(f'Unknown compression header: {head!r}')
+        return body.decode('utf-8') if self.codec.native else body
+
+    def encode(self, value: Any) -> Union[str, bytes]:
+        return self.pack(self.codec.encode(value))
+
+    def decode(self, data: Union[str, bytes]) -> Any:
+        return self.codec.decode(self.unpack(data))
+
+    def text(self, data: Union[str, bytes]) -> str:
+        return self.codec.text(self.unpack(data))
+
+    @property
+    def functions(self) -> Dict[str, Callable]:
+        if not self.codec.native:
+            return super().functions
+        # JSON text inside, no need to parse it to (de)compress
+        return {
+            self.load_function: lambda x: None if x is None
+            else self.unpack(x),
+            self.dump_function: lambda x: None if x is None
+            else self.pack(x),
+        }
+
+
+def train_dictionary(documents: Iterable[Any], size: int = 32 * 1024,
+                     codec: Optional[Codec] = None) -> bytes:
+    '''
+    Build a zlib dictionary from sample documents.
+
+    Keys and short strings common to the samples are packed into `size`
+    bytes, the most frequent last since zlib reaches the end of the
+    dictionary with the shortest distances.
+    '''
+    codec = get_codec(codec)
+    counts = Counter()
+    for document in documents:
+        data = codec.encode(document)
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', 'replace')
+        counts.update(re.findall(r'"(?:[^"\\]|\\.){0,64}"\s*:?', data))
+    chosen, used = [], 0
+    for token, count in counts.most_common():
+        if count < 2:
+            break
+        token = token.encode('utf-8')
+        if used + len(token) > size:
+            continue
+        chosen.append(token)
+        used += len(token)
+    return b''.join(reversed(chosen))
+
+
+CODECS = {
+    'json': JSONCodec(),
+    'jsonb': JSONBCodec(),
+}
+
+
+def register_codec(codec: Codec):
+    '''
+    Make `codec` available by name to every storage
+    '''
+    if not codec.name or not codec.name.isidentifier():
+        raise ValueError(f'Invalid codec name: {codec.name!r}')
+    CODECS[codec.name] = codec
+
+
+def get_codec(codec: Union[str, Codec, None]) -> Codec:
+    '''
+    Resolve a codec name or instance, None is the default JSON codec
+    '''
+    if codec is None:
+        codec = 'json'
+    if isinstance(codec, str):
+        if codec not in CODECS:
+            raise KeyError(f'Unknown codec: {codec}')
+        codec = CODECS[codec]
+    elif not codec.name or not codec.name.isidentifier():
+        raise ValueError(f'Invalid codec name: {codec.name!r}')
+    codec.check()
+    return codec
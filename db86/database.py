@@ -2,10 +2,13 @@
 NoSQLite3 Database Class
 """
 import os
+from typing import Any, Dict, Optional
 from collections import UserDict
 from .threads import SqliteMultiThread
 from .logger import logger
-from .storages import Table, JSONStorage
+from .storages import Table, JSONStorage, _load_sql
+from .codecs import META_TABLE
+from .cache import QueryCache
 
 
 class Database(UserDict):
@@ -78,10 +81,22 @@ class Database(UserDict):
         elif type(args[0]) == tuple:  # Type arg
             table_name = args[0][0]
             astype = args[0][1]
+            # Optional creation options: db['name', 'table', {'strict': True}]
+            options = args[0][2] if len(args[0]) > 2 else {}
             if astype == 'table':
-                return Table(table_name, self.conn, self.flag)
+                return Table(table_name, self.conn, self.flag, **options)
             elif astype == 'json':
-                return JSONStorage(table_name, self.conn, self.flag)
+                return JSONStorage(table_name, self.conn, self.flag, **options)
+
+    def storage(self, table_name: str, astype: str = 'json', **options):
+        '''
+        Open a storage, creating it with `options` (e.g. `codec`) if new
+        '''
+        if astype == 'table':
+            return Table(table_name, self.conn, self.flag, **options)
+        elif astype == 'json':
+            return JSONStorage(table_name, self.conn, self.flag, **options)
+        raise ValueError(f'Unknown storage type: {astype}')
 
     def __setitem__(self, key, item):
         if type(item) is Table or JSONStorage:
@@ -111,14 +126,14 @@ class Database(UserDict):
 
     def __iter__(self):
         GET_TABLES = 'SELECT name FROM sqlite_master WHERE type="table"\
-                      ORDER BY rowid'
-        for key in self.conn.select(GET_TABLES):
+                      AND name != ? ORDER BY rowid'
+        for key in self.conn.select(GET_TABLES, (META_TABLE,)):
             yield key[0]
     
     def __len__(self):
         GET_TABLES = 'SELECT COUNT(rowid) FROM sqlite_master WHERE type="table"\
-                      ORDER BY rowid'
-        return self.conn.select_one(GET_TABLES)[0]
+                      AND name != ? ORDER BY rowid'
+        return self.conn.select_one(GET_TABLES, (META_TABLE,))[0]
 
     def __contains__(self, name):
         HAS_ITEM = 'SELECT 1 FROM sqlite_master WHERE name = ?'
@@ -135,6 +150,47 @@ class Database(UserDict):
         items = self.conn.select(GET_INDEX)
         return [x[0] for x in items]
 
+    def load(self, fp, batch_statements: int = 100) -> int:
+        '''
+        Restore `Table.dump`/`JSONStorage.dump` output read from `fp`,
+        recreating the dumped tables with their own schema. Returns the
+        number of rows written.
+
+        The dump is executed as is, only load trusted files.
+        '''
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+        count = _load_sql(self.conn, 'load', fp, batch_statements)
+        for cache in self.conn.caches.values():
+            cache.clear()
+        if self.conn.query_cache is not None:
+            self.conn.query_cache.clear()
+        for bloom in self.conn.blooms.values():
+            bloom.rebuild()
+        return count
+
+    def enable_query_cache(self, max_entries: int = 256,
+                           max_bytes: Optional[int] = 16 * 1024 * 1024,
+                           check_interval: float = 0.0) -> QueryCache:
+        '''
+        Reuse `JSONStorage.query` results until their storage is written,
+        see `QueryCache` for the options
+        '''
+        cache = QueryCache(self.conn, max_entries, max_bytes, check_interval)
+        self.conn.query_cache = cache
+        return cache
+
+    def disable_query_cache(self):
+        self.conn.query_cache = None
+
+    @property
+    def query_cache_stats(self) -> Optional[Dict[str, Any]]:
+        '''
+        Hit, miss, eviction and size counters, None when not cached
+        '''
+        cache = self.conn.query_cache
+        return cache.stats if cache is not None else None
+
     @property
     def views(self):
         GET_VIEW = 'SELECT name FROM sqlite_master WHERE type="view"\
@@ -161,5 +217,12 @@ class Database(UserDict):
 
         DEL_ITEM = f'DROP TABLE "{table_name}"'
         self.conn.execute(DEL_ITEM)
+        if META_TABLE in self:
+            DEL_META = f'DELETE FROM "{META_TABLE}" WHERE "name" = ?'
+            self.conn.execute(DEL_META, (table_name,))
+        self.conn.caches.pop(table_name.replace('"', '""'), None)
+        self.conn.blooms.pop(table_name.replace('"', '""'), None)
+        if self.conn.query_cache is not None:
+            self.conn.query_cache.clear()
         if self.conn.autocommit and self.conn.transaction_depth == 0:
             self.conn.commit()
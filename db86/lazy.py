@@ -0,0 +1,83 @@
+"""
+Lazy documents for JSON storages.
+
+A `LazyDocument` stands in for a decoded document. It either holds the
+stored value and decodes it on first access, or holds only the key and
+pulls single fields out of the database with `json_extract` until enough
+fields were asked for that decoding the whole document is cheaper.
+"""
+from collections.abc import Mapping
+from typing import Any, Iterator
+
+from .cache import MISSING, copy_tree
+
+
+class LazyDocument(Mapping):
+    """
+    Read-only mapping over the document at `key` of `storage`.
+
+    Args:
+        storage (JSONStorage): Storage the document belongs to.
+        key (str): Document key.
+        data (str | bytes): Stored value, fetched on demand if MISSING.
+        max_fields (int): Fields fetched one by one before the whole
+            document is loaded, only used without `data`.
+
+    Nested values are plain decoded objects, changing them does not
+    change the stored document.
+    """
+    __slots__ = ('_storage', '_key', '_data', '_value', '_fields',
+                 '_max_fields')
+
+    def __init__(self, storage, key, data: Any = MISSING,
+                 max_fields: int = 4):
+        self._storage = storage
+        self._key = key
+        self._data = data
+        self._value = None
+        self._fields = {}
+        self._max_fields = max_fields
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+    def _load(self) -> dict:
+        if self._value is None:
+            if self._data is MISSING:
+                self._data = self._storage._get_encoded(self._key)
+            self._value = self._storage.codec.decode(self._data)
+            self._data = self._fields = None
+        return self._value
+
+    def __getitem__(self, name):
+        if self._value is None and self._data is MISSING\
+                and type(name) is str and '"' not in name:
+            if name in self._fields:
+                value = self._fields[name]
+            elif len(self._fields) < self._max_fields:
+                value = self._storage._get_field(self._key, name)
+                self._fields[name] = value
+            else:
+                return self._load()[name]
+            if value is MISSING:
+                raise KeyError(name)
+            return value
+        return self._load()[name]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def __repr__(self):
+        if self._value is None:
+            return f'LazyDocument({self._key!r})'
+        return repr(self._value)
+
+    def to_dict(self) -> dict:
+        '''
+        A decoded copy of the document
+        '''
+        return copy_tree(self._load())
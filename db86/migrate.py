@@ -0,0 +1,180 @@
+"""
+Online schema changes.
+
+`Table.add_column(..., backfill=...)` and `Table.rebuild()` rewrite rows in
+chunks of consecutive rowids (keys for WITHOUT ROWID tables), one short
+statement and commit per chunk, so requests from other threads wait behind
+a single chunk instead of the whole table. A `Migration` runs the chunks,
+in the calling thread or in the background, and reports its progress.
+
+Usage:
+    migration = tab.add_column('total', 'REAL', backfill='"price" * "qty"',
+                               chunk_rows=5000, pause=0.01, wait=False)
+    migration.stats  # {'state': 'running', 'done': 120000, ...}
+    migration.join()
+"""
+import time
+from threading import Event, Thread
+from typing import Any, Callable, Dict, Optional
+
+from .threads import SqliteMultiThread
+
+
+class Migration:
+    """
+    Chunked rewrite of one table.
+
+    Args:
+        connection (SqliteMultiThread): Connection running the chunks.
+        name (str): Table name, already quoted for SQL.
+        order (str): Unique column walking the table in chunks, `rowid`
+            or the quoted key of a WITHOUT ROWID table.
+        apply (callable): `apply(cond, args)` rewrites the rows matching
+            the SQL condition `cond` with bind parameters `args`.
+        chunk_rows (int): Rows per chunk.
+        pause (float): Seconds slept after each chunk, leaving the writer
+            to other requests. Can be changed while running.
+        progress (callable): Called with `stats` after each chunk.
+        finish (callable): Called once after the last chunk.
+        abort (callable): Called instead of `finish` when the migration
+            fails or is cancelled.
+    """
+
+    def __init__(self, connection: SqliteMultiThread, name: str, order: str,
+                 apply: Callable[[str, tuple], None],
+                 chunk_rows: int = 10000, pause: float = 0.0,
+                 progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 finish: Optional[Callable[[], None]] = None,
+                 abort: Optional[Callable[[], None]] = None):
+        if chunk_rows < 1:
+            raise ValueError('chunk_rows must be positive')
+        self.__conn = connection
+        self.__name = name
+        self.__order = order
+        self.__apply = apply
+        self.__progress = progress
+        self.__finish = finish
+        self.__abort = abort
+        self.chunk_rows = chunk_rows
+        self.pause = pause
+        self.state = 'pending'
+        self.error = None
+        self.total = None
+        self.done = 0
+        self.chunks = 0
+        self.paused = 0.0
+        self.chunk_seconds = 0.0
+        self.__started = None
+        self.__finished = None
+        self.__cancel = Event()
+        self.__thread = None
+
+    def run(self) -> 'Migration':
+        '''
+        Run every chunk in the calling thread
+        '''
+        if self.state != 'pending':
+            raise RuntimeError('Migration already started')
+        self.state = 'running'
+        self.__started = time.monotonic()
+        try:
+            self.__run()
+        except BaseException as exc:
+            self.state = 'failed'
+            self.error = exc
+            if self.__abort is not None:
+                self.__abort()
+            raise
+        finally:
+            self.__finished = time.monotonic()
+        return self
+
+    def __run(self):
+        GET_LEN = f'SELECT COUNT(*) FROM "{self.__name}"'
+        self.total = self.__conn.select_one(GET_LEN)[0]
+        order = self.__order
+        GET_BOUND = f'SELECT MAX(o), COUNT(*) FROM (SELECT {order} AS o'\
+            + f' FROM "{self.__name}" WHERE {{}} ORDER BY {order} LIMIT ?)'
+        last = None
+        while not self.__cancel.is_set():
+            cond, args = ('1', ()) if last is None\
+                else (f'{order} > ?', (last,))
+            high, count = self.__conn.select_one(GET_BOUND.format(cond),
+                                                 args + (self.chunk_rows,))
+            if not count:
+                break
+            begin = time.monotonic()
+            self.__apply(f'{cond} AND {order} <= ?', args + (high,))
+            if self.__conn.transaction_depth == 0:
+                # Also raises the errors of the chunk
+                self.__conn.commit()
+            self.chunk_seconds = time.monotonic() - begin
+            last = high
+            self.done += count
+            self.chunks += 1
+            if self.__progress is not None:
+                self.__progress(self.stats)
+            if self.pause:
+                self.__cancel.wait(self.pause)
+                self.paused += self.pause
+        if self.__cancel.is_set():
+            self.state = 'cancelled'
+            if self.__abort is not None:
+                self.__abort()
+            return
+        if self.__finish is not None:
+            self.__finish()
+        self.state = 'done'
+
+    def start(self) -> 'Migration':
+        '''
+        Run the chunks in a background thread, see `join`
+        '''
+        if self.state != 'pending':
+            raise RuntimeError('Migration already started')
+        self.__thread = Thread(target=self.__background, daemon=True)
+        self.__thread.start()
+        return self
+
+    def __background(self):
+        try:
+            self.run()
+        except BaseException:
+            # Kept in `error` and raised by join()
+            pass
+
+    def join(self, timeout: Optional[float] = None) -> 'Migration':
+        '''
+        Wait for a background migration, raising its error if it failed
+        '''
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def cancel(self):
+        '''
+        Stop after the running chunk and call `abort`
+        '''
+        self.__cancel.set()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        if self.__started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.__finished or time.monotonic()) - self.__started
+        return {
+            'state': self.state,
+            'total': self.total,
+            'done': self.done,
+            'chunks': self.chunks,
+            'elapsed': elapsed,
+            'paused': self.paused,
+            'chunk_seconds': self.chunk_seconds,
+            'rows_per_second': self.done / elapsed if elapsed else 0.0,
+        }
+
+    def __repr__(self):
+        return f'Migration of {self.__name}: {self.state}'
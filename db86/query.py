@@ -0,0 +1,400 @@
+"""
+Lazy queries over tables.
+
+`Table.where()` returns a `TableQuery`. Refining it with `where`,
+`select`, `order_by` and `limit` returns a new query, nothing runs until
+it is iterated or asked for `count()`, `exists()`, `first()` or
+`aggregate()`, and rows are yielded as the connection produces them.
+
+`join()` adds other tables to the same SELECT, matched on their declared
+foreign keys by default. Their columns are named `<table>.<column>`, or
+just `<column>` when no other table of the query has one by that name.
+
+Usage:
+    rows = (tab.where(dept='eng')
+            .where({"path": "score", "op": "gte", "value": 50})
+            .select('key', 'score').order_by('-score').limit(10))
+    for key, score in rows:
+        ...
+
+    orders.join(customers, on='customer_id')\
+        .select('key', 'customers.name').where(status='open')
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .storages import _compile_filter
+
+
+AGGREGATES = ('sum', 'avg', 'min', 'max', 'count')
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _as_list(cols) -> List[str]:
+    if cols is None:
+        return []
+    return [cols] if isinstance(cols, str) else list(cols)
+
+
+def _raw_name(table) -> str:
+    return table.name.replace('""', '"')
+
+
+def _primary_key(table) -> List[str]:
+    GET_COLS = f'PRAGMA TABLE_INFO("{table.name}")'
+    info = sorted([x for x in table._select(GET_COLS) if x[5]],
+                  key=lambda x: x[5])
+    return [x[1] for x in info]
+
+
+def _foreign_keys(table) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    '''
+    (parent table, [(column, parent column)]) for each foreign key of
+    `table`, parent columns default to the parent primary key
+    '''
+    GET_FKS = f'PRAGMA FOREIGN_KEY_LIST("{table.name}")'
+    groups = {}
+    for fk_id, _, parent, src, dst, *_ in table._select(GET_FKS):
+        groups.setdefault(fk_id, (parent, []))[1].append((src, dst))
+    return list(groups.values())
+
+
+class TableQuery:
+    """
+    Immutable description of a SELECT on a `Table`.
+
+    Args:
+        table (Table): Table to query.
+        joins (tuple): (join type, table, name, ((column SQL, column SQL),
+            ...)) of the joined tables.
+        conds (tuple): (SQL condition, bind parameters) pairs, ANDed.
+        cols (tuple): Selected columns, every column if empty.
+        order (tuple): (column, descending) pairs.
+        limit (int): Maximum number of rows.
+        offset (int): Rows skipped before the first one returned.
+    """
+
+    def __init__(self, table, conds: Tuple = (), cols: Tuple = (),
+                 order: Tuple = (), limit: Optional[int] = None,
+                 offset: int = 0, joins: Tuple = ()):
+        self.table = table
+        self.joins = joins
+        self.conds = conds
+        self.cols = cols
+        self.order = order
+        self._limit = limit
+        self._offset = offset
+
+    def __copy(self, **changes) -> 'TableQuery':
+        state = {
+            'conds': self.conds, 'cols': self.cols, 'order': self.order,
+            'limit': self._limit, 'offset': self._offset,
+            'joins': self.joins,
+        }
+        state.update(changes)
+        return TableQuery(self.table, **state)
+
+    def __names(self) -> Dict[str, str]:
+        '''
+        Column names usable in the query and their SQL reference
+        '''
+        # Qualified even without joins, conditions stay valid after one
+        tables = [(_raw_name(self.table), self.table)]\
+            + [(name, table) for _, table, name, _ in self.joins]
+        names, plain, shared = {}, {}, set()
+        for index, (name, table) in enumerate(tables):
+            for col in table.columns:
+                ref = f'{_quote(name)}.{_quote(col)}'
+                if index == 0:
+                    # The queried table keeps its plain names
+                    names[col] = ref
+                elif col in plain:
+                    shared.add(col)
+                else:
+                    plain[col] = ref
+                names[f'{name}.{col}'] = ref
+        for col, ref in plain.items():
+            if col not in shared:
+                names.setdefault(col, ref)
+        return names
+
+    def __check(self, cols) -> Dict[str, str]:
+        names = self.__names()
+        for col in cols:
+            if col not in names:
+                raise KeyError(f'Unknown column: {col}')
+        return names
+
+    def join(self, other, on: Union[str, Dict[str, str], None] = None,
+             how: str = 'inner', alias: Optional[str] = None
+             ) -> 'TableQuery':
+        """
+        Join the rows of `other`, a `Table` of the same database.
+
+        Args:
+            other (Table): Table to join.
+            on: A column of this query holding a foreign key to `other`,
+                a column of `other` holding a foreign key to a table of
+                this query, or else a column both sides have. A
+                {column of this query: column of other} dict matches
+                columns explicitly. None picks the only foreign key
+                between `other` and the tables of this query.
+            how (str): 'inner', or 'left' to keep rows without a match.
+            alias (str): Name of `other` in this query, needed to join a
+                table twice.
+        """
+        if how not in ('inner', 'left'):
+            raise ValueError(f'Unknown join type: {how}')
+        name = alias or _raw_name(other)
+        tables = [(_raw_name(self.table), self.table)]\
+            + [(x[2], x[1]) for x in self.joins]
+        if name in [x[0] for x in tables]:
+            raise ValueError(f'{name} is already joined, pass an alias')
+        other_cols = other.columns
+
+        def ref(table_name, col):
+            return f'{_quote(table_name)}.{_quote(col)}'
+
+        if isinstance(on, dict):
+            names = self.__check(on)
+            for col in on.values():
+                if col not in other_cols:
+                    raise KeyError(f'Unknown column: {col}')
+            pairs = [(names[x], ref(name, y)) for x, y in on.items()]
+        else:
+            # (first column, column pairs, column count) per foreign key
+            # from this query to other, then from other to this query
+            found = []
+            for table_name, table in tables:
+                for parent, cols in _foreign_keys(table):
+                    if parent.lower() == _raw_name(other).lower():
+                        key = _primary_key(other) or ['rowid']
+                        pairs = [(ref(table_name, src),
+                                  ref(name, dst or key[i]))
+                                 for i, (src, dst) in enumerate(cols)]
+                        found.append((cols[0][0], pairs, len(cols)))
+                for parent, cols in _foreign_keys(other):
+                    if parent.lower() == _raw_name(table).lower():
+                        key = _primary_key(table) or ['rowid']
+                        pairs = [(ref(table_name, dst or key[i]),
+                                  ref(name, src))
+                                 for i, (src, dst) in enumerate(cols)]
+                        found.append((cols[0][0], pairs, len(cols)))
+            if on is not None:
+                found = [x for x in found if x[0] == on and x[2] == 1]
+                if not found and on in other_cols:
+                    found = [(on, [(ref(x[0], on), ref(name, on))], 1)
+                             for x in tables if on in x[1].columns][:1]
+            if not found:
+                raise ValueError(
+                    f'No foreign key or column to join {name} on'
+                    + (f' {on}' if on is not None else '')
+                )
+            if len(found) > 1:
+                raise ValueError(f'Ambiguous join with {name}, pass on')
+            pairs = found[0][1]
+        joins = self.joins + ((how, other, name, tuple(pairs)),)
+        return self.__copy(joins=joins)
+
+    def where(self, filter: Optional[Dict] = None,
+              **equals: Any) -> 'TableQuery':
+        '''
+        Keep rows matching `filter`, a `JSONStorage.query()` filter
+        expression with `path` naming a column, and `column=value` pairs
+        '''
+        names = self.__check(equals)
+        conds = list(self.conds)
+        if filter is not None:
+            cond, args = _compile_filter(filter, columns=names)
+            conds.append((cond, tuple(args)))
+        for col, value in equals.items():
+            conds.append((f'{names[col]} IS ?', (value,)))
+        return self.__copy(conds=tuple(conds))
+
+    def select(self, *cols: str) -> 'TableQuery':
+        '''
+        Return only `cols`, in this order
+        '''
+        self.__check(cols)
+        return self.__copy(cols=cols)
+
+    def order_by(self, *cols: str) -> 'TableQuery':
+        '''
+        Sort by `cols`, descending for names prefixed with '-'
+        '''
+        order = tuple([(x[1:], True) if x.startswith('-') else (x, False)
+                       for x in cols])
+        self.__check([x[0] for x in order])
+        return self.__copy(order=self.order + order)
+
+    def limit(self, limit: Optional[int],
+              offset: Optional[int] = None) -> 'TableQuery':
+        '''
+        Return at most `limit` rows, after skipping `offset`
+        '''
+        if offset is None:
+            offset = self._offset
+        return self.__copy(limit=limit, offset=offset)
+
+    def offset(self, offset: int) -> 'TableQuery':
+        return self.__copy(offset=offset)
+
+    @property
+    def columns(self) -> List[str]:
+        '''
+        Names of the returned columns, the joined ones qualified by
+        default
+        '''
+        if self.cols:
+            return list(self.cols)
+        return self.table.columns + [
+            f'{name}.{col}' for _, table, name, _ in self.joins
+            for col in table.columns
+        ]
+
+    def __from(self) -> str:
+        FROM = f'"{self.table.name}"'
+        for how, table, name, pairs in self.joins:
+            FROM += f' {how.upper()} JOIN "{table.name}"'
+            if name != _raw_name(table):
+                FROM += f' AS {_quote(name)}'
+            FROM += ' ON ' + ' AND '.join([f'{x} = {y}' for x, y in pairs])
+        return FROM
+
+    def sql(self, head: Optional[str] = None) -> Tuple[str, Tuple]:
+        '''
+        SQL statement and bind parameters of the query
+        '''
+        names = self.__names()
+        if head is None and (self.cols or self.joins):
+            head = ', '.join([names[x] for x in self.columns])
+        elif head is None:
+            head = '*'
+        args = tuple([arg for _, cond_args in self.conds
+                      for arg in cond_args])
+        where = ' AND '.join([f'({cond})' for cond, _ in self.conds]) or '1'
+        GET_ROWS = f'SELECT {head} FROM {self.__from()} WHERE {where}'
+        if self.order:
+            GET_ROWS += ' ORDER BY ' + ', '.join(
+                [names[col] + (' DESC' if desc else '')
+                 for col, desc in self.order])
+        if self._limit is not None or self._offset:
+            GET_ROWS += ' LIMIT ? OFFSET ?'
+            limit = -1 if self._limit is None else self._limit
+            args += (limit, self._offset)
+        return GET_ROWS, args
+
+    def __iter__(self) -> Iterator[tuple]:
+        GET_ROWS, args = self.sql()
+        return self.table._select(GET_ROWS, args)
+
+    def dicts(self) -> Iterator[Dict[str, Any]]:
+        '''
+        Rows as {column: value} dicts
+        '''
+        cols = self.columns
+        return (dict(zip(cols, row)) for row in self)
+
+    def first(self) -> Optional[tuple]:
+        '''
+        First row, None if there is none
+        '''
+        return next(iter(self.limit(1)), None)
+
+    def count(self) -> int:
+        '''
+        Number of rows the query returns, without fetching them
+        '''
+        if self._limit is None and not self._offset:
+            GET_COUNT, args = self.__copy(order=()).sql('COUNT(*)')
+        else:
+            GET_ROWS, args = self.__copy(order=()).sql('1')
+            GET_COUNT = f'SELECT COUNT(*) FROM ({GET_ROWS})'
+        return next(self.table._select(GET_COUNT, args))[0]
+
+    def exists(self) -> bool:
+        '''
+        Whether the query returns any row, stopping at the first one
+        '''
+        if self._limit == 0:
+            return False
+        GET_ROWS, args = self.__copy(order=()).limit(1).sql('1')
+        return next(self.table._select(f'SELECT EXISTS ({GET_ROWS})',
+                                       args))[0] == 1
+
+    def aggregate(self, sum: Union[str, List[str], None] = None,
+                  avg: Union[str, List[str], None] = None,
+                  min: Union[str, List[str], None] = None,
+                  max: Union[str, List[str], None] = None,
+                  count: Union[bool, str, List[str], None] = None,
+                  group_by: Union[str, List[str], None] = None,
+                  having: Optional[Dict] = None
+                  ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Reduce the matching rows in SQL.
+
+        Each reduction takes a column or a list of columns and is returned
+        as `<op>_<column>`. `count=True` counts rows as `count`, a column
+        counts its non-NULL values.
+
+        Args:
+            group_by (str | list): Group by these columns, returned as is.
+            having (dict): Filter expression on the groups, with `path`
+                naming a group column or a result like `sum_salary`.
+
+        Returns:
+            dict: The results, without `group_by`.
+            list[dict]: One dict per group ordered by the group columns.
+        """
+        specs = {'sum': sum, 'avg': avg, 'min': min, 'max': max}
+        refs = self.__names()
+        limited = self._limit is not None or self._offset
+        if limited:
+            # Reduce only the rows the limit keeps, named by a subquery
+            inner = ', '.join([f'{ref} AS {_quote(x)}'
+                               for x, ref in refs.items()])
+            refs = {x: _quote(x) for x in refs}
+        heads, names = [], []
+        if count is True:
+            heads.append('COUNT(*)')
+            names.append('count')
+        elif count:
+            specs['count'] = count
+        for op in AGGREGATES:
+            for col in _as_list(specs.get(op)):
+                self.__check([col])
+                heads.append(f'{op.upper()}({refs[col]})')
+                names.append(f'{op}_{col}')
+        groups = _as_list(group_by)
+        self.__check(groups)
+        if not heads and not groups:
+            raise ValueError('aggregate needs a reduction or group_by')
+        if len(set(names)) != len(names):
+            raise ValueError('Duplicate aggregate')
+        heads = [f'{refs[x]} AS {_quote(x)}' for x in groups]\
+            + [f'{x} AS {_quote(name)}' for x, name in zip(heads, names)]
+        query = self.__copy(cols=())
+        if not limited:
+            GET_ROWS, args = query.__copy(order=()).sql(', '.join(heads))
+        else:
+            GET_ROWS, args = query.sql(inner)
+            GET_ROWS = f'SELECT {", ".join(heads)} FROM ({GET_ROWS})'
+        if groups:
+            GET_ROWS += ' GROUP BY ' + ', '.join([refs[x] for x in groups])
+            if having is not None:
+                cond, having_args = _compile_filter(having,
+                                                    columns=groups + names)
+                GET_ROWS += f' HAVING {cond}'
+                args += tuple(having_args)
+            GET_ROWS += ' ORDER BY ' + ', '.join([_quote(x) for x in groups])
+        elif having is not None:
+            raise ValueError('having requires group_by')
+        names = groups + names
+        rows = [dict(zip(names, row))
+                for row in self.table._select(GET_ROWS, args)]
+        return rows if groups else rows[0]
+
+    def __repr__(self):
+        return f'TableQuery: {self.sql()[0]}'
@@ -1,15 +1,17 @@
 import datetime
+import json
 import logging
 import multiprocessing
 import sys
 import os
 import threading
-from typing import Any, Dict, Optional
+from itertools import islice
+from typing import Any, Dict, List, Optional, Union
 import click
 from daemonocle import Daemon
 import uvicorn
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
 
@@ -256,6 +258,9 @@ class StorageCreateRequest(BaseModel):
     """
     name: str
     storage_type: str = "json"
+    primary_key_dtype: str = "TEXT"
+    without_rowid: bool = False
+    strict: bool = False
 
 
 class ItemPayload(BaseModel):
@@ -272,6 +277,28 @@ class BulkItemsPayload(BaseModel):
     items: Dict[str, Any]
 
 
+class JoinSpec(BaseModel):
+    """
+    One joined table storage, see `TableQuery.join`.
+    """
+    storage: str
+    on: Optional[Union[str, Dict[str, str]]] = None
+    how: str = "inner"
+    alias: Optional[str] = None
+
+
+class JoinQueryRequest(BaseModel):
+    """
+    Request model for a read-only join of table storages.
+    """
+    joins: List[JoinSpec]
+    select: Optional[List[str]] = None
+    where: Optional[Dict[str, Any]] = None
+    order_by: Optional[List[str]] = None
+    limit: Optional[int] = None
+    offset: int = 0
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -464,11 +491,13 @@ def create_storage(db_name: str, request: StorageCreateRequest):
         log.warning(f"Storage '{request.name}' already exists in database '{db_name}'")
         raise HTTPException(status_code=409, detail=f"Storage '{request.name}' already exists")
 
+    options = {
+        "primary_key_dtype": request.primary_key_dtype,
+        "without_rowid": request.without_rowid,
+        "strict": request.strict,
+    }
     try:
-        if storage_type == "table":
-            db[request.name, "table"]
-        else:
-            db[request.name, "json"]
+        db[request.name, storage_type, options]
         log.info(f"Created {storage_type} storage '{request.name}' in database '{db_name}'")
         return {
             "status": "Success",
@@ -476,6 +505,9 @@ def create_storage(db_name: str, request: StorageCreateRequest):
             "storage": request.name,
             "storage_type": storage_type,
         }
+    except ValueError as exc:
+        log.warning(f"Invalid options for storage '{request.name}': {exc}")
+        raise HTTPException(status_code=400, detail=str(exc))
     except Exception as exc:
         log.error(f"Failed to create storage '{request.name}' in database '{db_name}': {exc}")
         raise HTTPException(status_code=500, detail="Failed to create storage")
@@ -570,6 +602,24 @@ def delete_storage(db_name: str, storage_name: str):
         raise HTTPException(status_code=500, detail="Failed to delete storage")
 
 
+def stream_raw_items(items, next_cursor: Optional[str] = None):
+    """
+    Streams `{"items": [[key, value], ...], "next_cursor": ...}` from
+    stored JSON text.
+
+    Args:
+        items (Iterable): (key, JSON text) pairs.
+        next_cursor (Optional[str]): Continuation token for the next page.
+
+    Yields:
+        str: Chunks of the response body.
+    """
+    yield '{"items": ['
+    for index, (key, text) in enumerate(items):
+        yield f'{", " if index else ""}[{json.dumps(key)}, {text}]'
+    yield f'], "next_cursor": {json.dumps(next_cursor)}}}'
+
+
 @app.get("/databases/{db_name}/storages/{storage_name}/items")
 def list_storage_items(
     db_name: str,
@@ -577,43 +627,70 @@ def list_storage_items(
     storage_type: Optional[str] = Query(None, description="Optional storage type override: json or table"),
     limit: Optional[int] = Query(None, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Continuation token from a previous page"),
 ):
     """
     Lists items in a storage with optional pagination.
 
+    Pages requested with `limit` and no `offset` use keyset pagination and
+    return a `next_cursor` to pass as `cursor` for the following page, so
+    every page costs the same.
+
     Args:
         db_name (str): The name of the database.
         storage_name (str): The name of the storage.
         storage_type (Optional[str]): Optional storage type override.
         limit (Optional[int]): Maximum number of items to return.
         offset (int): Number of items to skip.
+        cursor (Optional[str]): Continuation token from a previous page.
 
     Returns:
-        dict: List of items.
+        dict: List of items and the next cursor, None on the last page.
 
     Raises:
-        HTTPException: If the database or storage is not found.
+        HTTPException: If the database or storage is not found, or the
+            cursor is invalid.
     """
-    log.info(f"List items request for storage '{storage_name}' in database '{db_name}' (limit={limit} offset={offset})")
+    log.info(f"List items request for storage '{storage_name}' in database '{db_name}' (limit={limit} offset={offset} cursor={cursor})")
     db = get_database(db_name)
     storage = get_storage(db, storage_name, storage_type)
 
-    if isinstance(storage, JSONStorage):
-        items = list(storage.to_dict().items())
-    else:
-        items = []
-        for key in storage:
-            try:
-                items.append(table_row_as_dict(storage, key))
-            except KeyError:
-                continue
+    if cursor is not None and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset")
+    keyset = cursor is not None or (limit is not None and not offset)
+    next_cursor = None
+
+    try:
+        if isinstance(storage, JSONStorage):
+            if keyset:
+                items, next_cursor = storage.page_raw(limit, cursor)
+            else:
+                stop = offset + limit if limit is not None else None
+                items = islice(storage.iter_raw(), offset, stop)
+            return StreamingResponse(
+                stream_raw_items(items, next_cursor),
+                media_type="application/json"
+            )
+        if keyset:
+            rows, next_cursor = storage.page(limit, cursor)
+            cols = storage.columns
+            return {"items": [dict(zip(cols, row)) for _, row in rows], "next_cursor": next_cursor}
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    items = []
+    for key in storage:
+        try:
+            items.append(table_row_as_dict(storage, key))
+        except KeyError:
+            continue
 
     if limit is not None:
         items = items[offset : offset + limit]
     elif offset:
         items = items[offset:]
 
-    return {"items": items}
+    return {"items": items, "next_cursor": None}
 
 
 @app.get("/databases/{db_name}/storages/{storage_name}/items/{item_key}")
@@ -643,7 +720,12 @@ def get_storage_item(
     storage = get_storage(db, storage_name, storage_type)
 
     try:
-        if isinstance(storage, JSONStorage):
+        if isinstance(storage, JSONStorage) and "/" not in item_key:
+            # Splice the stored JSON, no decode and re-encode
+            body = f'{{"key": {json.dumps(item_key)}, "value": {storage.get_raw(item_key)}}}'
+            log.info(f"Fetched item '{item_key}' from storage '{storage_name}'")
+            return Response(content=body, media_type="application/json")
+        elif isinstance(storage, JSONStorage):
             result = {"key": item_key, "value": storage[item_key]}
         else:
             result = {"key": item_key, "value": table_row_as_dict(storage, item_key)}
@@ -824,6 +906,71 @@ def delete_storage_item(
         raise HTTPException(status_code=500, detail="Failed to delete item")
 
 
+def stream_rows(columns: List[str], rows):
+    """
+    Streams `{"columns": [...], "items": [{column: value}, ...]}`.
+
+    Args:
+        columns (List[str]): Names of the row values.
+        rows (Iterable): Row tuples.
+
+    Yields:
+        str: Chunks of the response body.
+    """
+    yield f'{{"columns": {json.dumps(columns)}, "items": ['
+    for index, row in enumerate(rows):
+        item = json.dumps(dict(zip(columns, row)))
+        yield f'{", " if index else ""}{item}'
+    yield ']}'
+
+
+@app.post("/databases/{db_name}/storages/{storage_name}/join")
+def join_storages(db_name: str, storage_name: str, request: JoinQueryRequest):
+    """
+    Joins table storages in one read-only SQL query.
+
+    Tables are matched on their declared foreign keys unless `on` is
+    given, and rows are streamed as the database produces them.
+
+    Args:
+        db_name (str): The name of the database.
+        storage_name (str): The name of the queried table storage.
+        request (JoinQueryRequest): Joined storages, selected columns,
+            filter expression, ordering and page.
+
+    Returns:
+        StreamingResponse: The columns and the rows as dicts.
+
+    Raises:
+        HTTPException: If a storage is not found or not a table, or the
+            query is invalid.
+    """
+    log.info(f"Join request for storage '{storage_name}' in database '{db_name}': {request.model_dump()}")
+    db = get_database(db_name)
+    tables = [get_storage(db, x) for x in
+              [storage_name] + [spec.storage for spec in request.joins]]
+    if not all(isinstance(x, Table) for x in tables):
+        log.warning(f"Join requested with non-table storages in database '{db_name}'")
+        raise HTTPException(status_code=400, detail="Joins are only supported for table storage")
+    try:
+        query = tables[0].where(request.where)
+        for spec, other in zip(request.joins, tables[1:]):
+            query = query.join(other, spec.on, spec.how, spec.alias)
+        if request.select:
+            query = query.select(*request.select)
+        if request.order_by:
+            query = query.order_by(*request.order_by)
+        if request.limit is not None or request.offset:
+            query = query.limit(request.limit, request.offset)
+    except (KeyError, TypeError, ValueError) as exc:
+        log.warning(f"Invalid join on storage '{storage_name}' in database '{db_name}': {exc}")
+        raise HTTPException(status_code=400, detail=str(exc))
+    return StreamingResponse(
+        stream_rows(query.columns, query),
+        media_type="application/json"
+    )
+
+
 @app.get("/databases/{db_name}/storages/{storage_name}/{query:path}")
 def query_storage_path(
     db_name: str,
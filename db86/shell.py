@@ -73,6 +73,38 @@ def items_from_json(storage):
     return storage.to_dict()
 
 
+def page_items(storage, limit, cursor):
+    items, next_cursor = storage.page(limit, cursor)
+    if isinstance(storage, Table):
+        cols = storage.columns
+        items = [dict(zip(cols, row)) for _, row in items]
+    return items, next_cursor
+
+
+def print_items(storage, limit, offset, cursor):
+    if cursor is not None and offset:
+        raise click.ClickException('Use either --cursor or --offset.')
+    if cursor is not None or (limit is not None and not offset):
+        try:
+            items, next_cursor = page_items(storage, limit, cursor)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+        pretty_print(items)
+        if next_cursor is not None:
+            click.echo(f'Next cursor: {next_cursor}')
+        return
+    if isinstance(storage, JSONStorage):
+        items = items_from_json(storage)
+        items = list(items.items())
+    else:
+        items = items_from_table(storage)
+    if offset:
+        items = items[offset:]
+    if limit is not None:
+        items = items[:limit]
+    pretty_print(items)
+
+
 def cleanup(ctx):
     click.echo("Autoclean...")
     if 'db_store' in ctx.obj:
@@ -141,8 +173,9 @@ def close_database(ctx, db):
 @click.argument('path', default='/', required=False)
 @click.option('--limit', type=int, default=None)
 @click.option('--offset', type=int, default=0)
+@click.option('--cursor', default=None, help='Continuation token printed with the previous page')
 @click.pass_context
-def list_contents(ctx, path, limit, offset):
+def list_contents(ctx, path, limit, offset, cursor):
     db_store = ensure_db_store(ctx)
     if path in ('/', ''):
         pretty_print(sorted(db_store.keys()))
@@ -157,16 +190,7 @@ def list_contents(ctx, path, limit, offset):
         db_name, storage_name = path
         db = get_db(ctx, db_name)
         storage = get_storage(db, storage_name)
-        if isinstance(storage, JSONStorage):
-            items = items_from_json(storage)
-            items = list(items.items())
-        else:
-            items = items_from_table(storage)
-        if offset:
-            items = items[offset:]
-        if limit is not None:
-            items = items[:limit]
-        pretty_print(items)
+        print_items(storage, limit, offset, cursor)
         return
     raise click.ClickException('Path must be /, <db>, or <db>/<storage>.')
 
@@ -228,20 +252,12 @@ def storage_info(ctx, db, storage):
 @click.argument('storage', required=True)
 @click.option('--limit', type=int, default=None)
 @click.option('--offset', type=int, default=0)
+@click.option('--cursor', default=None, help='Continuation token printed with the previous page')
 @click.pass_context
-def list_items(ctx, db, storage, limit, offset):
+def list_items(ctx, db, storage, limit, offset, cursor):
     db = get_db(ctx, db)
     storage_obj = get_storage(db, storage)
-    if isinstance(storage_obj, JSONStorage):
-        items = items_from_json(storage_obj)
-        items = list(items.items())
-    else:
-        items = items_from_table(storage_obj)
-    if offset:
-        items = items[offset:]
-    if limit is not None:
-        items = items[:limit]
-    pretty_print(items)
+    print_items(storage_obj, limit, offset, cursor)
 
 
 @cli.command('get', short_help='Query JSON storage path or get item by key')
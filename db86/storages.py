@@ -21,12 +21,467 @@ Classes:
         Allows dict-like querying of views, including slices, column
         selection, and filtering.
 """
-from typing import Any, Dict, Optional, Union, List
+import base64
+import io
+import json
+import math
+import re
+import sqlite3
+from array import array
+from itertools import count, islice
+from queue import Queue
+from typing import Any, Callable, Dict, Iterable, Optional, Union, List
 
 from .threads import SqliteMultiThread
+from .cache import DocumentCache, MISSING
+from .lazy import LazyDocument
+from .bloom import KeyFilter
+from .migrate import Migration
+from .codecs import Codec, CompressedCodec, META_TABLE, get_codec
 from collections import UserDict
 
 
+def _json_path_escapes() -> bool:
+    '''
+    Whether this SQLite reads backslash escapes in quoted JSON path labels
+    '''
+    conn = sqlite3.connect(':memory:')
+    try:
+        CHECK = 'SELECT json_extract(?1, ?2), json_extract(?1, ?3)'
+        found = conn.execute(CHECK, ('{"a\\"b": 1, "a\\\\b": 2}',
+                                     '$."a\\"b"', '$."a\\\\b"')).fetchone()
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return found == (1, 2)
+
+
+JSON_PATH_ESCAPES = _json_path_escapes()
+
+
+def _json_addressable(keys: List[str]) -> bool:
+    '''
+    Whether `_json_path` can address every key of `keys`
+    '''
+    return JSON_PATH_ESCAPES or not any(['"' in key for key in keys])
+
+
+def _json_path(keys: List[str]) -> str:
+    '''
+    SQLite JSON path addressing nested object keys, e.g. `$."a"."b"`
+    '''
+    if not _json_addressable(keys):
+        raise ValueError(
+            'Path segments cannot contain \'"\' with SQLite'
+            f' {sqlite3.sqlite_version}'
+        )
+    if JSON_PATH_ESCAPES:
+        keys = [key.replace('\\', '\\\\').replace('"', '\\"')
+                for key in keys]
+    return '$' + ''.join([f'."{key}"' for key in keys])
+
+
+def _json_parents_sql(column: str, keys: List[str]):
+    '''
+    SQL condition that holds when every parent of the path `keys`
+    is either an object or missing, with its bind parameters
+    '''
+    parents = tuple([_json_path(keys[:i]) for i in range(1, len(keys))])
+    cond = ' AND '.join(
+        [f"COALESCE(json_type({column}, ?), 'object') = 'object'"
+         for _ in parents]
+    )
+    return cond or '1', parents
+
+
+def _sql_string(text: str) -> str:
+    '''
+    Quote `text` as a SQL string literal
+    '''
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _sql_literal(value) -> str:
+    '''
+    `value` as a SQL literal, for statements that cannot take parameters
+    '''
+    if value is None:
+        return 'NULL'
+    if type(value) is bool:
+        return str(int(value))
+    if isinstance(value, float):
+        if math.isnan(value):
+            # SQLite stores NaN as NULL anyway
+            return 'NULL'
+        if math.isinf(value):
+            return '1e999' if value > 0 else '-1e999'
+        return repr(value)
+    if isinstance(value, int):
+        return repr(value)
+    if isinstance(value, bytes):
+        return f"X'{value.hex()}'"
+    return _sql_string(str(value))
+
+
+def _inline_args(cond: str, args) -> str:
+    '''
+    Replace the `?` placeholders of `cond` outside quotes by `args`
+    '''
+    args = iter(args)
+    out, quote = [], None
+    for char in cond:
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char == '?':
+            char = _sql_literal(next(args))
+        out.append(char)
+    return ''.join(out)
+
+
+def _prefix_stop(prefix: str) -> Optional[str]:
+    '''
+    Smallest string greater than every string starting with `prefix`,
+    None if there is none
+    '''
+    # UTF-8 keeps code point order, so BINARY collation agrees
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _text_affinity(dtype: str) -> bool:
+    '''
+    Whether a column declared as `dtype` compares keys as text, i.e. has
+    neither INTEGER, REAL nor NUMERIC affinity
+    '''
+    dtype = dtype.upper()
+    if 'INT' in dtype:
+        return False
+    if any([x in dtype for x in ('CHAR', 'CLOB', 'TEXT', 'BLOB')]):
+        return True
+    return not dtype
+
+
+def _array_typecode(dtype: str) -> Optional[str]:
+    '''
+    `array` typecode for a column declared as `dtype`, None when the
+    column is not numeric
+    '''
+    dtype = dtype.upper()
+    if 'INT' in dtype:
+        return 'q'
+    if any([x in dtype for x in ('REAL', 'FLOA', 'DOUB')]):
+        return 'd'
+    return None
+
+
+def _numpy(use_numpy: Optional[bool]):
+    '''
+    The numpy module, None if not wanted or, unless required, missing
+    '''
+    if use_numpy is False:
+        return None
+    try:
+        import numpy
+    except ImportError:
+        if use_numpy:
+            raise
+        return None
+    return numpy
+
+
+def _dump_sql(conn: SqliteMultiThread, name: str, fp, batch_rows: int,
+              order: str = 'rowid', extra: List[str] = ()) -> int:
+    '''
+    Write the schema of table `name`, its rows as multi-row INSERTs of
+    `batch_rows` rows, its indexes and the `extra` statements to `fp`.
+    Returns the number of rows written.
+
+    Every INSERT is read with its own `WHERE order > last ORDER BY order
+    LIMIT batch_rows` query on the unique column `order`, so only one
+    batch is held in memory.
+    '''
+    if batch_rows < 1:
+        raise ValueError('batch_rows must be positive')
+    GET_SQL = 'SELECT "type", "sql" FROM sqlite_master'\
+        + ' WHERE "tbl_name" = ? AND "sql" IS NOT NULL ORDER BY rowid'
+    schema = list(conn.select(GET_SQL, (name.replace('""', '"'),)))
+    for kind, sql in schema:
+        if kind == 'table':
+            sql = sql.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1)
+            fp.write(f'{sql};\n')
+    GET_ROWS = f'SELECT {order}, * FROM "{name}" WHERE {{}}'\
+        + f' ORDER BY {order} LIMIT ?'
+    count = 0
+    last = None
+    while True:
+        cond, args = ('1', ()) if last is None else (f'{order} > ?', (last,))
+        rows = list(conn.select(GET_ROWS.format(cond), args + (batch_rows,)))
+        if not rows:
+            break
+        last = rows[-1][0]
+        fp.write(f'INSERT INTO "{name}" VALUES\n')
+        fp.write(',\n'.join([
+            '(' + ', '.join([_sql_literal(x) for x in row[1:]]) + ')'
+            for row in rows
+        ]))
+        fp.write(';\n')
+        count += len(rows)
+        if len(rows) < batch_rows:
+            break
+    for kind, sql in schema:
+        if kind == 'index':
+            sql = sql.replace('INDEX', 'INDEX IF NOT EXISTS', 1)
+            fp.write(f'{sql};\n')
+    for sql in extra:
+        fp.write(f'{sql};\n')
+    return count
+
+
+def _load_sql(conn: SqliteMultiThread, name: str, fp,
+              batch_statements: int) -> int:
+    '''
+    Run the statements read from `fp`, `batch_statements` per transaction.
+    Returns the number of rows changed, summed from the statements
+    themselves so writes of other threads are not counted.
+    '''
+    from .transaction import Transaction
+
+    def statements():
+        buffer = ''
+        for line in fp:
+            buffer += line
+            if sqlite3.complete_statement(buffer):
+                yield buffer.strip()
+                buffer = ''
+        if buffer.strip():
+            raise ValueError('Incomplete SQL statement at the end of the dump')
+
+    count = 0
+    manage = conn.autocommit and conn.transaction_depth == 0
+    pending = iter(statements())
+    while True:
+        batch = list(islice(pending, batch_statements))
+        if not batch:
+            break
+        transaction = Transaction(name, conn)
+        if manage:
+            transaction.begin()
+        try:
+            for sql in batch:
+                # -1 for statements that change no rows, e.g. CREATE
+                count += max(conn.execute_count(sql), 0)
+        except BaseException:
+            if manage:
+                transaction.rollback()
+            raise
+        if manage:
+            transaction.commit()
+    return count
+
+
+def _enable_bloom(conn: SqliteMultiThread, name: str, column: str,
+                  **options) -> KeyFilter:
+    '''
+    Build a `KeyFilter` over `column` of `name` and share it through
+    the connection
+    '''
+    GET_COLS = f'PRAGMA TABLE_INFO("{name}")'
+    dtype = [x[2] for x in conn.select(GET_COLS) if x[1] == column][0]
+    bloom = KeyFilter(conn, name, column, _text_affinity(dtype), **options)
+    conn.blooms[name] = bloom
+    bloom.rebuild()
+    return bloom
+
+
+def _cursor_blob(value):
+    '''
+    JSON form of the BLOB values of a cursor
+    '''
+    if isinstance(value, bytes):
+        return {'blob': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f'Cannot page on {type(value).__name__} values')
+
+
+def _encode_cursor(by, value) -> str:
+    '''
+    Opaque continuation token for the row with `value` in ordering `by`
+    '''
+    data = json.dumps([by, value], separators=(',', ':'),
+                      default=_cursor_blob).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str, by):
+    '''
+    Last seen value stored in `cursor`, which must come from ordering `by`
+    '''
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_by, value = json.loads(
+            data, object_hook=lambda x: base64.b64decode(x['blob'])
+        )
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('Invalid cursor')
+    if cursor_by != by:
+        raise ValueError(f'Cursor was not made for ordering {by}')
+    return value
+
+
+STRICT_TYPES = ('INT', 'INTEGER', 'REAL', 'TEXT', 'BLOB', 'ANY')
+
+
+def _table_options_sql(column_types: List[str], without_rowid: bool,
+                       strict: bool) -> str:
+    '''
+    Table options following the column definitions of a CREATE TABLE
+    '''
+    for dtype in column_types:
+        # Type names go into the statement as is
+        if not re.fullmatch(r'[A-Za-z_][\w ]*(\([\d\s,+-]*\))?', dtype):
+            raise ValueError(f'Invalid column type: {dtype}')
+    if strict:
+        for dtype in column_types:
+            if dtype.upper() not in STRICT_TYPES:
+                raise ValueError(
+                    f'STRICT tables only allow {", ".join(STRICT_TYPES)},'
+                    f' got {dtype}'
+                )
+    options = ['STRICT'] if strict else []
+    if without_rowid:
+        options.append('WITHOUT ROWID')
+    return ', '.join(options)
+
+
+def _table_option(sql: str, option: str) -> bool:
+    '''
+    Whether the CREATE TABLE statement `sql` sets the table `option`
+    (STRICT or WITHOUT ROWID)
+    '''
+    option = r'\s+'.join(option.split())
+    return re.search(r'\)[\s,A-Z]*\b' + option + r'\b[\s,A-Z]*$', sql,
+                     re.IGNORECASE) is not None
+
+
+# Suffixes naming the SQL functions of callable backfills
+_BACKFILLS = count()
+
+
+def _key_range_sql(column: str, start=None, stop=None,
+                   prefix: Optional[str] = None):
+    '''
+    WHERE clause for `start <= column < stop` and `prefix`, as ranges the
+    primary key index can serve
+    '''
+    conds, args = [], []
+    if prefix is not None:
+        if type(prefix) is not str:
+            raise TypeError('prefix must be a string')
+        conds.append(f'{column} >= ?')
+        args.append(prefix)
+        prefix_stop = _prefix_stop(prefix)
+        if prefix_stop is not None:
+            conds.append(f'{column} < ?')
+            args.append(prefix_stop)
+    if start is not None:
+        conds.append(f'{column} >= ?')
+        args.append(start)
+    if stop is not None:
+        conds.append(f'{column} < ?')
+        args.append(stop)
+    return ' AND '.join(conds) or '1', tuple(args)
+
+
+def _compile_filter(expr: Dict, column: Optional[str] = None,
+                    columns: Optional[List[str]] = None,
+                    delimiter: str = "/"):
+    '''
+    Compile a `JSONStorage.query` filter expression into a SQL condition.
+
+    With `column` set, leaf paths address fields of the JSON document
+    stored in that column, otherwise they name one of `columns`, a list
+    of column names or a {name: SQL reference} dict.
+    Returns the condition and its bind parameters.
+    '''
+    if not isinstance(expr, dict):
+        raise TypeError(f"Filter expression must be a dict, got {type(expr)}")
+    for logic in ("and", "or"):
+        if logic in expr:
+            parts = [_compile_filter(sub, column, columns, delimiter)
+                     for sub in expr[logic]]
+            if not parts:
+                return ('1' if logic == "and" else '0'), []
+            cond = f' {logic.upper()} '.join([f'({x[0]})' for x in parts])
+            return cond, [arg for x in parts for arg in x[1]]
+    if "not" in expr:
+        cond, args = _compile_filter(expr["not"], column, columns, delimiter)
+        return f'NOT ({cond})', args
+
+    path = expr.get("path", "")
+    op = expr.get("op", "eq")
+    value = expr.get("value")
+    if column is not None:
+        keys = path.strip(delimiter).split(delimiter) if path else []
+        jpath = _sql_string(_json_path(keys))
+        field = f'json_extract({column}, {jpath})'
+        dtype = f'json_type({column}, {jpath})'
+    else:
+        if columns is not None and path not in columns:
+            raise KeyError(f'Unknown column: {path}')
+        if isinstance(columns, dict):
+            field = columns[path]
+        else:
+            field = '"' + path.replace('"', '""') + '"'
+        dtype = f'typeof({field})'
+    if isinstance(value, (dict, list)) and op not in ("in", "not_in"):
+        arg = 'json(?)'
+        value = json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+    else:
+        arg = '?'
+
+    if op == "eq":         return f'{field} IS {arg}', [value]
+    if op == "ne":         return f'{field} IS NOT {arg}', [value]
+    if op in ("gt", "gte", "lt", "lte"):
+        sign = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}[op]
+        return f'{field} IS NOT NULL AND {field} {sign} {arg}', [value]
+    if op in ("in", "not_in"):
+        values = [x for x in value if x is not None]
+        marks = ', '.join(['?' for _ in values])
+        has_none = len(values) != len(value)
+        if op == "in":
+            cond = f'{field} IS NOT NULL AND {field} IN ({marks})'
+            return (f'{field} IS NULL OR ({cond})' if has_none
+                    else cond), values
+        cond = f'{field} IS NULL OR {field} NOT IN ({marks})'
+        return (f'{field} IS NOT NULL AND {field} NOT IN ({marks})'
+                if has_none else cond), values
+    if op == "exists":
+        return f'{field} IS {"NOT " if value else ""}NULL', []
+    if op == "regex":      return f'{field} REGEXP ?', [value]
+    if op == "contains":
+        if column is None:
+            return f"{dtype} = 'text' AND instr({field}, ?) > 0", [value]
+        return (f"CASE {dtype} WHEN 'array' THEN EXISTS ("
+                f'SELECT 1 FROM json_each({column}, {jpath}) '
+                f'WHERE "value" IS {arg}) '
+                f"WHEN 'text' THEN instr({field}, ?) > 0 ELSE 0 END",
+                [value, value])
+    if op == "startswith":
+        return (f"{dtype} = 'text' AND substr({field}, 1, length(?)) = ?",
+                [value, value])
+    if op == "endswith":
+        return (f"{dtype} = 'text' AND "
+                f"(length(?) = 0 OR substr({field}, -length(?)) = ?)",
+                [value, value, value])
+
+    raise ValueError(f"Unknown filter operator: {op!r}")
+
+
 class Table(UserDict):
     """
     Connector Class for a SQLite Standard Table as UserDict
@@ -37,7 +492,8 @@ class Table(UserDict):
     """
 
     def __init__(self, name: str, connection: SqliteMultiThread, flag: str,
-                 primary_key_dtype: str = 'TEXT'):
+                 primary_key_dtype: str = 'TEXT',
+                 without_rowid: bool = False, strict: bool = False):
         self.__conn = connection
         self.flag = flag
         self.name = name.replace('"', '""')
@@ -45,17 +501,23 @@ class Table(UserDict):
         # Check for the table or create new with
         # two columns named key(Primary Key) and
         # col1
-        GET_ITEM = 'SELECT name FROM sqlite_master WHERE name = ?'
+        GET_ITEM = 'SELECT name, sql FROM sqlite_master WHERE name = ?'
         item = self.__conn.select_one(GET_ITEM, (name,))
         if item is None:
+            options = _table_options_sql([primary_key_dtype, 'TEXT'],
+                                         without_rowid, strict)
             MAKE_TABLE = f'''\
             CREATE TABLE IF NOT EXISTS "{self.name}" (
                 "key" {primary_key_dtype} PRIMARY KEY,
                 "col1" TEXT
-            )
+            ) {options}
             '''
             self.__conn.execute(MAKE_TABLE)
             self.__conn.commit()
+        else:
+            without_rowid = _table_option(item[1], 'WITHOUT ROWID')
+        # Row identity and order, the clustered key without rowid
+        self.__rowid = f'"{self.columns[0]}"' if without_rowid else 'rowid'
 
     def describe(self) -> str:
         GET_COLS = f'PRAGMA TABLE_INFO("{self.name}")'
@@ -121,15 +583,137 @@ class Table(UserDict):
                 data.append(key)
         else:
             raise TypeError("Incorrect value format, use tuple or dict")
+        bloom = self.__conn.blooms.get(self.name)
+        if bloom is not None:
+            bloom.add(key)
         self.__conn.execute(ADD_ITEM, tuple(data))
         if self.__conn.autocommit and self.__conn.transaction_depth == 0:
             self.commit()
 
+    def insert_many(self, rows: Union[Iterable, Dict[str, Any]],
+                    columns: Optional[List[str]] = None,
+                    on_conflict: str = 'replace',
+                    batch_size: int = 10000) -> int:
+        """
+        Insert rows in batches through one prepared statement.
+
+        Args:
+            rows: Iterable (or generator) of tuples or of dicts, or a
+                {column: sequence} dict of columns such as lists, arrays
+                or NumPy arrays.
+            columns (list): Columns of the tuples, every column of the
+                table by default. Dict rows default to the keys of the
+                first row, missing values are NULL.
+            on_conflict (str): 'replace' the existing row, 'ignore' the new
+                one, 'update' only the given columns of the existing row,
+                or 'abort'.
+            batch_size (int): Rows per `executemany` batch. One batch is
+                queued while the previous one runs.
+
+        Returns:
+            int: Number of rows written.
+
+        Without an open transaction the whole load runs in one, rolled back
+        if any batch fails.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+        if on_conflict not in ('replace', 'ignore', 'update', 'abort'):
+            raise ValueError(f'Unknown conflict resolution: {on_conflict}')
+        table_cols = self.columns
+        if isinstance(rows, dict):
+            if columns is None:
+                columns = list(rows)
+            batches = self.__column_batches(rows, columns, batch_size)
+        else:
+            rows = iter(rows)
+            first = next(rows, None)
+            if first is None:
+                return 0
+            if isinstance(first, dict):
+                if columns is None:
+                    columns = list(first)
+                cols = columns
+                rows = (tuple([x.get(c) for c in cols]) for x in rows)
+                first = tuple([first.get(c) for c in cols])
+            elif columns is None:
+                columns = table_cols
+            batches = self.__row_batches(first, rows, batch_size)
+        for col in columns:
+            if col not in table_cols:
+                raise KeyError(f'Unknown column: {col}')
+
+        names = ['"' + x.replace('"', '""') + '"' for x in columns]
+        refs = ', '.join(names)
+        marks = ', '.join(['?' for _ in columns])
+        verb = {'replace': 'INSERT OR REPLACE', 'ignore': 'INSERT OR IGNORE'}
+        ADD_ROWS = f'{verb.get(on_conflict, "INSERT")} INTO "{self.name}"'\
+            + f' ({refs}) VALUES ({marks})'
+        if on_conflict == 'update':
+            key = '"' + table_cols[0].replace('"', '""') + '"'
+            sets = ', '.join([f'{x} = excluded.{x}'
+                              for x in names if x != key])
+            # Nothing to update still has to name a column
+            sets = sets or f'{key} = {key}'
+            ADD_ROWS += f' ON CONFLICT ({key}) DO UPDATE SET {sets}'
+        bloom = self.__conn.blooms.get(self.name)
+        key_idx = columns.index(table_cols[0])\
+            if table_cols[0] in columns else None
+
+        def apply():
+            count = 0
+            pending = None
+            for batch in batches:
+                if bloom is not None and key_idx is not None:
+                    for row in batch:
+                        bloom.add(row[key_idx])
+                res = Queue()
+                self.__conn.executemany(ADD_ROWS, batch, res)
+                if pending is not None:
+                    # Wait for the previous batch, bounding memory
+                    count += pending.get()[0]
+                    self.__conn.check_raise_error()
+                pending = res
+            if pending is not None:
+                count += pending.get()[0]
+                self.__conn.check_raise_error()
+            return count
+
+        from .transaction import Transaction
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            with Transaction(self.name, self.__conn):
+                count = apply()
+            self.commit()
+            return count
+        return apply()
+
+    @staticmethod
+    def __row_batches(first, rows, batch_size):
+        batch = [first]
+        for row in rows:
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+            batch.append(row)
+        yield batch
+
+    @staticmethod
+    def __column_batches(data, columns, batch_size):
+        values = [data[x] for x in columns]
+        size = len(values[0]) if values else 0
+        for start in range(0, size, batch_size):
+            chunk = [x[start:start + batch_size] for x in values]
+            # NumPy scalars cannot be bound, tolist() gives Python values
+            chunk = [x.tolist() if hasattr(x, 'tolist') else x
+                     for x in chunk]
+            yield list(zip(*chunk))
+
     def get_idx(self, idx):
         '''
         Get a single value by `rowid`
         '''
-        GET_ITEM = f'SELECT "_rowid_", * FROM "{self.name}" WHERE "_rowid_" = ?'
+        GET_ITEM = f'SELECT {self.__rowid}, * FROM "{self.name}"'\
+            + f' WHERE {self.__rowid} = ?'
         item = self.__conn.select_one(GET_ITEM, (idx, ))
         if item is None:
             raise KeyError(idx)
@@ -140,7 +724,7 @@ class Table(UserDict):
         Get a range of values by range
         '''
         GET_ITEM = f'SELECT * FROM "{self.name}"'\
-            + f'WHERE "_rowid_" BETWEEN ? AND ?'
+            + f' WHERE {self.__rowid} BETWEEN ? AND ?'
         item = self.__conn.select(GET_ITEM, ((slc.start), (slc.stop-1)))
         if item is None:
             raise KeyError(slc[0])
@@ -148,15 +732,14 @@ class Table(UserDict):
 
     def get_col(self, col):
         GET_ITEM = f'SELECT "{col}" FROM "{self.name}"'\
-                 + 'ORDER BY rowid'
+                 + f' ORDER BY {self.__rowid}'
         item = self.__conn.select(GET_ITEM)
         return [x[0] for x in item]
 
     def get_col_sel(self, col, idx):
-        cols = ', '.join([x for x in col])
+        cols = ', '.join(['"' + x.replace('"', '""') + '"' for x in col])
         GET_ITEM = f'SELECT {cols} FROM "{self.name}"'\
-            + f'WHERE "{self.columns[0]}" = ?'\
-            + 'ORDER BY rowid'
+            + f' WHERE "{self.columns[0]}" = ?'
         item = self.__conn.select_one(GET_ITEM, (idx, ))
         if item is None:
             raise KeyError(idx)
@@ -164,30 +747,17 @@ class Table(UserDict):
 
     def get_col_filt(self, col, slc):
         """
-        Get data filtered by column
+        Get data filtered by column, `start <= col < stop`
+
+        The bounds are bound parameters, so an index on `col` serves the
+        range.
         """
-        if slc.stop is None:
-            GET_ITEM = f'SELECT * FROM "{self.name}" WHERE '\
-                     + f'"{col}" >= {slc.start} ORDER BY _rowid_'
-            item = self.__conn.select(GET_ITEM)
-            if item is None:
-                raise KeyError("No entry for given condition")
-            return [x for x in item][::slc.step]
-        elif slc.start is None:
-            GET_ITEM = f'SELECT * FROM "{self.name}" WHERE '\
-                     + f'"{col}" < {slc.stop} ORDER BY _rowid_'
-            item = self.__conn.select(GET_ITEM)
-            if item is None:
-                raise KeyError("No entry for given condition")
-            return [x for x in item][::slc.step]
-        else:
-            GET_ITEM = f'SELECT * FROM "{self.name}" WHERE '\
-                     + f'"{col}" BETWEEN {slc.start} '\
-                     + f'AND {slc.stop-1} ORDER BY _rowid_'
-            item = self.__conn.select(GET_ITEM)
-            if item is None:
-                raise KeyError("No entry for given condition")
-            return [x for x in item][::slc.step]
+        cond, args = _key_range_sql('"' + col.replace('"', '""') + '"',
+                                    slc.start, slc.stop)
+        GET_ITEM = f'SELECT * FROM "{self.name}" WHERE {cond}'\
+            + f' ORDER BY {self.__rowid}'
+        item = self.__conn.select(GET_ITEM, args)
+        return [x for x in item][::slc.step]
 
     def __getitem__(self, args):
         # args is key
@@ -199,7 +769,7 @@ class Table(UserDict):
             elif isinstance(args, str) and args in self.columns:
                 return self.get_col(args)
             elif isinstance(args, str) and args in self.keys():
-                GET_ITEM = f'SELECT * FROM "{self.name}" WHERE "{self.columns[0]}" = ? ORDER BY rowid'
+                GET_ITEM = f'SELECT * FROM "{self.name}" WHERE "{self.columns[0]}" = ?'
                 item = self.__conn.select_one(GET_ITEM, (args,))
                 if item is None:
                     raise KeyError(args)
@@ -221,9 +791,91 @@ class Table(UserDict):
                         raise KeyError("No Entry for given condition")
                     return [x for x in item]
 
+    def where(self, filter: Optional[Dict] = None, **equals: Any):
+        """
+        Lazy query on the rows matching `filter` and `column=value` pairs.
+
+        Returns a `TableQuery`, refined with `where`, `select`, `order_by`
+        and `limit` and only run when iterated or counted.
+
+        Usage:
+            tab.where(dept='eng').select('key', 'score')
+                .order_by('-score').limit(10)
+        """
+        from .query import TableQuery
+        return TableQuery(self).where(filter, **equals)
+
+    def join(self, other: 'Table',
+             on: Union[str, Dict[str, str], None] = None,
+             how: str = 'inner', alias: Optional[str] = None):
+        """
+        Lazy query joining `other`, run as one SQL join.
+
+        Returns a `TableQuery`, see `TableQuery.join` for the arguments.
+
+        Usage:
+            orders.join(customers, on='customer_id')
+                .select('key', 'customers.name').where(status='open')
+        """
+        from .query import TableQuery
+        return TableQuery(self).join(other, on, how, alias)
+
+    def aggregate(self, where: Optional[Dict] = None, **reductions):
+        """
+        Sums, averages, extrema and counts computed in one SELECT.
+
+        Usage:
+            tab.aggregate(sum='salary', count=True, group_by='dept',
+                          having={"path": "count", "op": "gt", "value": 10})
+            -> [{'dept': 'eng', 'sum_salary': ..., 'count': ...}, ...]
+
+        `where` restricts the rows first, see `TableQuery.aggregate` for
+        the reductions.
+        """
+        return self.where(where).aggregate(**reductions)
+
+    def _select(self, req: str, arg=None):
+        '''
+        Rows of a SELECT built by a `TableQuery`
+        '''
+        return self.__conn.select(req, arg)
+
     def __contains__(self, key):
+        bloom = self.__conn.blooms.get(self.name)
+        hit = bloom.lookup(key) if bloom is not None else None
+        if hit is False:
+            return False
         HAS_ITEM = f'SELECT 1 FROM "{self.name}" WHERE "{self.columns[0]}" = ?'
-        return self.__conn.select_one(HAS_ITEM, (key,)) is not None
+        found = self.__conn.select_one(HAS_ITEM, (key,)) is not None
+        if hit and not found:
+            bloom.false_positives += 1
+        return found
+
+    def enable_bloom(self, capacity: Optional[int] = None,
+                     error_rate: float = 0.01,
+                     check_interval: Optional[float] = None) -> KeyFilter:
+        """
+        Answer membership checks for missing keys from a Bloom filter.
+
+        The filter is shared by every handle on this table through the
+        connection and learns keys written through them. Keys written by
+        other connections are only seen after `bloom.rebuild()`, or
+        automatically when `check_interval` is set. See `KeyFilter`.
+        """
+        return _enable_bloom(self.__conn, self.name, self.columns[0],
+                             capacity=capacity, error_rate=error_rate,
+                             check_interval=check_interval)
+
+    def disable_bloom(self):
+        self.__conn.blooms.pop(self.name, None)
+
+    @property
+    def bloom_stats(self) -> Optional[Dict[str, Any]]:
+        '''
+        Lookup, negative and false positive counters, None without filter
+        '''
+        bloom = self.__conn.blooms.get(self.name)
+        return bloom.stats if bloom is not None else None
 
     def __delitem__(self, key):
         if self.flag == 'r':
@@ -235,16 +887,172 @@ class Table(UserDict):
         if self.__conn.autocommit and self.__conn.transaction_depth == 0:
             self.commit()
 
+    def update_where(self, filter: Dict, changes: Dict[str, Any]) -> int:
+        """
+        Update every row matching `filter` in one statement.
+
+        Args:
+            filter (dict): Filter expression in the `JSONStorage.query()`
+                grammar, with `path` naming a column.
+            changes (dict): Column -> new value.
+
+        Returns:
+            int: Number of rows updated.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+        if not changes:
+            return 0
+        cols = self.columns
+        for col in changes:
+            if col not in cols:
+                raise KeyError(f'Unknown column: {col}')
+        cond, args = _compile_filter(filter, columns=cols)
+        sets = ', '.join([f'"{x}" = ?' for x in changes])
+        UPDATE = f'UPDATE "{self.name}" SET {sets} WHERE {cond}'
+        count = self.__conn.execute_count(
+            UPDATE, tuple(list(changes.values()) + args)
+        )
+        bloom = self.__conn.blooms.get(self.name)
+        if bloom is not None and cols[0] in changes:
+            bloom.rebuild()
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
+        return count
+
+    def delete_where(self, filter: Dict) -> int:
+        """
+        Delete every row matching `filter` in one statement.
+
+        Args:
+            filter (dict): Filter expression in the `JSONStorage.query()`
+                grammar, with `path` naming a column.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to delete in read-only mode')
+        cond, args = _compile_filter(filter, columns=self.columns)
+        DELETE = f'DELETE FROM "{self.name}" WHERE {cond}'
+        count = self.__conn.execute_count(DELETE, tuple(args))
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
+        return count
+
     def rename(self):
         if self.flag == 'r':
             raise RuntimeError('Refusing to delete in read-only mode')
 
     def __iter__(self):
-        GET_KEYS = f'SELECT "{self.columns[0]}" FROM "{self.name}"\
-                     ORDER BY rowid'
+        GET_KEYS = f'SELECT "{self.columns[0]}" FROM "{self.name}"'\
+            + f' ORDER BY {self.__rowid}'
         for x in self.__conn.select(GET_KEYS):
             yield x[0]
 
+    def __scan(self, cols, start, stop, prefix, reverse, limit):
+        '''
+        Stream `cols` of the rows in the key range, in key order
+        '''
+        key = f'"{self.columns[0]}"'
+        cond, args = _key_range_sql(key, start, stop, prefix)
+        order = 'DESC' if reverse else 'ASC'
+        GET_RANGE = f'SELECT {cols} FROM "{self.name}" WHERE {cond}\
+         ORDER BY {key} {order}'
+        if limit is not None:
+            GET_RANGE += ' LIMIT ?'
+            args += (limit,)
+        return self.__conn.select(GET_RANGE, args)
+
+    def keys(self, start=None, stop=None, prefix: Optional[str] = None,
+             reverse: bool = False, limit: Optional[int] = None):
+        """
+        Keys in `[start, stop)` and starting with `prefix`.
+
+        Without arguments this is the usual keys view in rowid order,
+        otherwise a streaming iterator in key order served by the primary
+        key index.
+
+        Args:
+            start: Smallest key, inclusive.
+            stop: Largest key, exclusive.
+            prefix (str): Only keys starting with this string.
+            reverse (bool): Iterate in descending key order.
+            limit (int): Maximum number of keys.
+        """
+        if start is None and stop is None and prefix is None\
+                and not reverse and limit is None:
+            return super().keys()
+        key = f'"{self.columns[0]}"'
+        return (x[0] for x in
+                self.__scan(key, start, stop, prefix, reverse, limit))
+
+    def items(self, start=None, stop=None, prefix: Optional[str] = None,
+              reverse: bool = False, limit: Optional[int] = None):
+        """
+        (key, row) pairs for the range, see `keys` for the arguments.
+        """
+        if start is None and stop is None and prefix is None\
+                and not reverse and limit is None:
+            return super().items()
+        return ((x[0], x) for x in
+                self.__scan('*', start, stop, prefix, reverse, limit))
+
+    def page(self, limit: Optional[int], cursor: Optional[str] = None,
+             by: str = 'rowid'):
+        """
+        One page of (key, row) pairs using keyset pagination.
+
+        Every page is a `WHERE col > last ORDER BY col LIMIT n` index
+        seek, so deep pages cost the same as the first one.
+
+        Args:
+            limit (int): Page size, None for everything after `cursor`.
+            cursor (str): Token returned with the previous page.
+            by (str): 'rowid' for insertion order or 'key' for key order.
+
+        Returns:
+            tuple: (items, next cursor or None on the last page).
+        """
+        if by not in ('rowid', 'key'):
+            raise ValueError(f'Cannot page by {by}')
+        col = self.__rowid if by == 'rowid' else f'"{self.columns[0]}"'
+        cond, args = '1', ()
+        if cursor is not None:
+            cond, args = f'{col} > ?', (_decode_cursor(cursor, by),)
+        GET_PAGE = f'SELECT {col}, * FROM "{self.name}" WHERE {cond}\
+         ORDER BY {col}'
+        if limit is not None:
+            # One extra row tells whether there is a next page
+            GET_PAGE += ' LIMIT ?'
+            args += (limit + 1,)
+        rows = list(self.__conn.select(GET_PAGE, args))
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(by, rows[-1][0])
+        return [(x[1], x[1:]) for x in rows], next_cursor
+
+    def delete_range(self, start=None, stop=None,
+                     prefix: Optional[str] = None) -> int:
+        """
+        Delete the rows in the range, see `keys` for the arguments.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to delete in read-only mode')
+        if start is None and stop is None and prefix is None:
+            raise ValueError('delete_range needs start, stop or prefix')
+        cond, args = _key_range_sql(f'"{self.columns[0]}"',
+                                    start, stop, prefix)
+        DELETE = f'DELETE FROM "{self.name}" WHERE {cond}'
+        count = self.__conn.execute_count(DELETE, args)
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
+        return count
+
     def add_foreign_key(self, colname: str, references: str):
         if self.flag == 'r':
             raise RuntimeError('Refusing to delete in read-only mode')
@@ -255,30 +1063,350 @@ class Table(UserDict):
         if self.__conn.autocommit and self.__conn.transaction_depth == 0:
             self.commit()
 
-    def add_column(self, colname: str, dtype: str = 'TEXT'):
+    def create_index(self, cols: Union[str, List[str]],
+                     name: Optional[str] = None, unique: bool = False,
+                     where: Optional[Dict] = None,
+                     include: Optional[List[str]] = None) -> str:
+        """
+        Create an index on `cols`.
+
+        Args:
+            cols (str | list): Indexed column(s), in order.
+            name (str): Index name, `<table>_<cols>_idx` by default.
+            unique (bool): Reject rows repeating the indexed values.
+            where (dict): Filter expression in the `JSONStorage.query()`
+                grammar, with `path` naming a column. Only matching rows
+                are indexed (partial index), and only queries implying
+                the same condition can use it.
+            include (list): Extra columns stored after `cols`, so queries
+                reading only these columns never touch the table
+                (covering index).
+
+        Returns:
+            str: Index name.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+        cols = [cols] if isinstance(cols, str) else list(cols)
+        include = list(include or [])
+        if not cols:
+            raise ValueError('create_index needs at least one column')
+        table_cols = self.columns
+        for col in cols + include:
+            if col not in table_cols:
+                raise KeyError(f'Unknown column: {col}')
+        if name is None:
+            name = '_'.join([self.name.replace('""', '"')] + cols + ['idx'])
+        name = name.replace('"', '""')
+        refs = ', '.join(['"' + x.replace('"', '""') + '"'
+                          for x in cols + include])
+        MAKE_INDEX = f'CREATE {"UNIQUE " if unique else ""}INDEX "{name}"'\
+            + f' ON "{self.name}" ({refs})'
+        if where is not None:
+            # Partial index conditions cannot take parameters
+            cond, args = _compile_filter(where, columns=table_cols)
+            MAKE_INDEX += ' WHERE ' + _inline_args(cond, args)
+        self.__conn.execute(MAKE_INDEX)
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
+        return name.replace('""', '"')
+
+    def drop_index(self, name: str):
         '''
-        Simply add a new column
+        Drop an index of this table
         '''
         if self.flag == 'r':
             raise RuntimeError('Refusing to delete in read-only mode')
+        if name not in [x['name'] for x in self.indexes]:
+            raise KeyError(f'Unknown index: {name}')
+        quoted = name.replace('"', '""')
+        DROP_INDEX = f'DROP INDEX "{quoted}"'
+        self.__conn.execute(DROP_INDEX)
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
 
+    @property
+    def indexes(self) -> List[Dict[str, Any]]:
+        '''
+        Indexes of the table with their columns, uniqueness, whether they
+        are partial and their origin ('c' created, 'pk' or 'u' implicit)
+        '''
+        GET_INDEXES = f'PRAGMA INDEX_LIST("{self.name}")'
+        ret = []
+        for _, name, unique, origin, partial in\
+                self.__conn.select(GET_INDEXES):
+            quoted = name.replace('"', '""')
+            GET_INFO = f'PRAGMA INDEX_INFO("{quoted}")'
+            cols = [x[2] for x in sorted(self.__conn.select(GET_INFO))]
+            ret.append({
+                'name': name,
+                'columns': cols,
+                'unique': bool(unique),
+                'partial': bool(partial),
+                'origin': origin,
+            })
+        return ret
+
+    def add_column(self, colname: str, dtype: str = 'TEXT',
+                   backfill: Union[str, Callable, None] = None,
+                   chunk_rows: int = 10000, pause: float = 0.0,
+                   progress: Optional[Callable] = None,
+                   wait: bool = True) -> Optional[Migration]:
+        """
+        Add a new column, optionally filled from the existing rows.
+
+        Args:
+            colname (str): Column name.
+            dtype (str): Declared type.
+            backfill (str | callable): SQL expression over the other
+                columns, e.g. `'"price" * "qty"'`, or a function taking a
+                {column: value} dict and returning the new value. It runs
+                in the database thread and the SQL is used as is.
+            chunk_rows (int): Rows updated per transaction.
+            pause (float): Seconds to pause between chunks.
+            progress (callable): Called with the `Migration.stats` after
+                each chunk.
+            wait (bool): Return once filled, or return the migration
+                running in the background.
+
+        Returns:
+            Migration: The backfill, None without `backfill`.
+
+        Rows written during the backfill must set the column themselves
+        when they land before its position.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to delete in read-only mode')
+
+        table_cols = self.columns
         NEW_COL = f'ALTER TABLE "{self.name}" ADD COLUMN "{colname}" {dtype}'
         self.__conn.execute(NEW_COL)
         if self.__conn.autocommit and self.__conn.transaction_depth == 0:
             self.commit()
+        if backfill is None:
+            return None
+        if callable(backfill):
+            fname = f'db86_backfill_{next(_BACKFILLS)}'
+
+            def func(*values):
+                return backfill(dict(zip(table_cols, values)))
+
+            self.__conn.create_function(fname, len(table_cols), func,
+                                        deterministic=False)
+            refs = ', '.join(['"' + x.replace('"', '""') + '"'
+                              for x in table_cols])
+            expr = f'{fname}({refs})'
+        else:
+            expr = f'({backfill})'
+        FILL = f'UPDATE "{self.name}" SET "{colname}" = {expr} WHERE '
 
-    def drop_column(self, colname: str):
+        def apply(cond, args):
+            self.__conn.execute(FILL + cond, args)
+
+        migration = Migration(self.__conn, self.name, self.__rowid, apply,
+                              chunk_rows, pause, progress)
+        return migration.run() if wait else migration.start()
+
+    def drop_column(self, colname: str, chunk_rows: Optional[int] = None,
+                    **options) -> Optional[Migration]:
         '''
         Drop a Column
+
+        SQLite rewrites every row in one statement, with `chunk_rows` the
+        table is rebuilt online instead, see `rebuild` for the `options`
         '''
         if self.flag == 'r':
             raise RuntimeError('Refusing to delete in read-only mode')
+        if chunk_rows is not None:
+            return self.rebuild(drop=[colname], chunk_rows=chunk_rows,
+                                **options)
 
         DROP_COL = f'ALTER TABLE "{self.name}" DROP COLUMN "{colname}"'
         self.__conn.execute(DROP_COL)
         if self.__conn.autocommit and self.__conn.transaction_depth == 0:
             self.commit()
 
+    def rebuild(self, drop: Optional[List[str]] = None,
+                types: Optional[Dict[str, str]] = None,
+                without_rowid: Optional[bool] = None,
+                strict: Optional[bool] = None,
+                chunk_rows: int = 10000, pause: float = 0.0,
+                progress: Optional[Callable] = None,
+                wait: bool = True) -> Migration:
+        """
+        Copy the table into a new one, `chunk_rows` rows per transaction,
+        and swap them.
+
+        Writes made during the copy reach the new table through triggers.
+        The swap replaces the table in one short transaction and recreates
+        its indexes and triggers, dropping the indexes of dropped columns.
+
+        Args:
+            drop (list): Columns left out.
+            types (dict): New declared type of some columns.
+            without_rowid (bool): Cluster the new table on its key,
+                unchanged by default.
+            strict (bool): Make the new table STRICT, unchanged by default.
+            chunk_rows (int): Rows copied per transaction.
+            pause (float): Seconds to pause between chunks.
+            progress (callable): Called with the `Migration.stats` after
+                each chunk.
+            wait (bool): Return once swapped, or return the migration
+                running in the background.
+
+        Returns:
+            Migration: The copy, its table is dropped if it fails or is
+            cancelled.
+
+        Keys, NOT NULL, defaults, UNIQUE constraints and foreign keys are
+        kept, CHECK constraints and generated columns are not.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+        if self.__conn.transaction_depth:
+            raise RuntimeError('Cannot rebuild a table inside a transaction')
+        drop = list(drop or [])
+        types = dict(types or {})
+        GET_COLS = f'PRAGMA TABLE_INFO("{self.name}")'
+        info = list(self.__conn.select(GET_COLS))
+        for col in drop + list(types):
+            if col not in [x[1] for x in info]:
+                raise KeyError(f'Unknown column: {col}')
+        keys = [x[1] for x in sorted(info, key=lambda x: x[5]) if x[5]]
+        if set(keys) & set(drop):
+            raise ValueError('Cannot drop a primary key column')
+        GET_SQL = 'SELECT sql FROM sqlite_master WHERE name = ?'
+        sql = self.__conn.select_one(GET_SQL,
+                                     (self.name.replace('""', '"'),))[0]
+        had_rowid = not _table_option(sql, 'WITHOUT ROWID')
+        if without_rowid is None:
+            without_rowid = not had_rowid
+        if strict is None:
+            strict = _table_option(sql, 'STRICT')
+        if without_rowid and not keys:
+            raise ValueError('WITHOUT ROWID tables need a primary key')
+
+        def quote(col):
+            return '"' + col.replace('"', '""') + '"'
+
+        cols = [x for x in info if x[1] not in drop]
+        defs, dtypes = [], []
+        for _, col, dtype, notnull, default, pk in cols:
+            dtype = types.get(col, dtype)
+            defs.append(f'{quote(col)} {dtype}'.rstrip())
+            if dtype:
+                dtypes.append(dtype)
+            if notnull:
+                defs[-1] += ' NOT NULL'
+            if default is not None:
+                defs[-1] += f' DEFAULT ({default})'
+            if pk and len(keys) == 1:
+                defs[-1] += ' PRIMARY KEY'
+        if len(keys) > 1:
+            defs.append(f'PRIMARY KEY ({", ".join(map(quote, keys))})')
+        for index in self.indexes:
+            unique = index['columns']
+            if index['origin'] == 'u' and not set(unique) & set(drop):
+                defs.append(f'UNIQUE ({", ".join(map(quote, unique))})')
+        GET_FKS = f'PRAGMA FOREIGN_KEY_LIST("{self.name}")'
+        fks = {}
+        for fk_id, _, parent, src, dst, on_update, on_delete, _ in\
+                self.__conn.select(GET_FKS):
+            fks.setdefault(fk_id, (parent, [], [], on_update, on_delete))
+            fks[fk_id][1].append(src)
+            fks[fk_id][2].append(dst)
+        for parent, srcs, dsts, on_update, on_delete in fks.values():
+            if set(srcs) & set(drop):
+                continue
+            ref = f'FOREIGN KEY ({", ".join(map(quote, srcs))})'\
+                + f' REFERENCES {quote(parent)}'
+            if None not in dsts:
+                ref += f' ({", ".join(map(quote, dsts))})'
+            for action, rule in (('UPDATE', on_update),
+                                 ('DELETE', on_delete)):
+                if rule != 'NO ACTION':
+                    ref += f' ON {action} {rule}'
+            defs.append(ref)
+        options = _table_options_sql(dtypes, without_rowid, strict)
+
+        # rowids are kept unless one side has none or the key aliases it
+        aliased = len(keys) == 1 and\
+            types.get(keys[0], [x[2] for x in info if x[1] == keys[0]][0])\
+            .upper() == 'INTEGER'
+        copy_rowid = had_rowid and not without_rowid and not aliased
+        names = (['rowid'] if copy_rowid else [])\
+            + [quote(x[1]) for x in cols]
+        refs = ', '.join(names)
+        new_refs = ', '.join([f'NEW.{x}' for x in names])
+        if copy_rowid:
+            match = 'rowid = OLD.rowid'
+        else:
+            match = ' AND '.join([f'{quote(x)} = OLD.{quote(x)}'
+                                  for x in keys])
+        new = f'{self.name}__rebuild'
+        triggers = [f'"{new}_{x}"' for x in ('insert', 'update', 'delete')]
+        CLEANUP = ''.join([f'DROP TRIGGER IF EXISTS {x};\n'
+                           for x in triggers])\
+            + f'DROP TABLE IF EXISTS "{new}";\n'
+        self.__conn.executescript(CLEANUP)
+        self.__conn.executescript(f'''\
+            BEGIN;
+            CREATE TABLE "{new}" ({", ".join(defs)}) {options};
+            CREATE TRIGGER {triggers[0]} AFTER INSERT ON "{self.name}" BEGIN
+                INSERT OR REPLACE INTO "{new}" ({refs}) VALUES ({new_refs});
+            END;
+            CREATE TRIGGER {triggers[1]} AFTER UPDATE ON "{self.name}" BEGIN
+                DELETE FROM "{new}" WHERE {match};
+                INSERT OR REPLACE INTO "{new}" ({refs}) VALUES ({new_refs});
+            END;
+            CREATE TRIGGER {triggers[2]} AFTER DELETE ON "{self.name}" BEGIN
+                DELETE FROM "{new}" WHERE {match};
+            END;
+            COMMIT;
+        ''')
+        COPY = f'INSERT OR REPLACE INTO "{new}" ({refs})'\
+            + f' SELECT {refs} FROM "{self.name}" WHERE '
+
+        def apply(cond, args):
+            self.__conn.execute(COPY + cond, args)
+
+        def finish():
+            schema = []
+            GET_SCHEMA = 'SELECT type, name, sql FROM sqlite_master'\
+                + ' WHERE tbl_name = ? AND type IN ("index", "trigger")'\
+                + ' AND sql IS NOT NULL ORDER BY rowid'
+            dropped = set(drop)
+            for kind, name, sql in self.__conn.select(
+                    GET_SCHEMA, (self.name.replace('""', '"'),)):
+                if f'"{name}"' in triggers:
+                    continue
+                if kind == 'index':
+                    quoted = name.replace('"', '""')
+                    GET_INFO = f'PRAGMA INDEX_INFO("{quoted}")'
+                    if {x[2] for x in self.__conn.select(GET_INFO)} & dropped:
+                        continue
+                schema.append(f'{sql};\n')
+            try:
+                # Do not rewrite the views and triggers naming the table
+                self.__conn.executescript(
+                    'PRAGMA legacy_alter_table = ON;\nBEGIN;\n'
+                    + ''.join([f'DROP TRIGGER {x};\n' for x in triggers])
+                    + f'DROP TABLE "{self.name}";\n'
+                    + f'ALTER TABLE "{new}" RENAME TO "{self.name}";\n'
+                    + ''.join(schema) + 'COMMIT;'
+                )
+            finally:
+                self.__conn.select_one('PRAGMA legacy_alter_table = OFF')
+            self.__rowid = f'"{self.columns[0]}"' if without_rowid\
+                else 'rowid'
+
+        def abort():
+            self.__conn.executescript(CLEANUP)
+
+        migration = Migration(self.__conn, self.name, self.__rowid, apply,
+                              chunk_rows, pause, progress, finish, abort)
+        return migration.run() if wait else migration.start()
+
     def rename_column(self, colname: str, new_colname: str,
                       dtype: str = 'TEXT'):
         '''
@@ -290,6 +1418,9 @@ class Table(UserDict):
         REM_COL = f'ALTER TABLE "{self.name}"\
          RENAME COLUMN "{colname}" TO "{new_colname}"'
         self.__conn.execute(REM_COL)
+        bloom = self.__conn.blooms.get(self.name)
+        if bloom is not None and bloom.column == colname:
+            bloom.column = new_colname
         if self.__conn.autocommit and self.__conn.transaction_depth == 0:
             self.commit()
 
@@ -313,72 +1444,325 @@ class Table(UserDict):
         '''
         Return the Table is a dict
         otype: str - dict format to use
+            'column': {column: [values]}
+            'list': {table name: [{column: value}]}
+            'dict': {key: {column: value}}, without the key column
+
+        Every mode reads the table in rowid order through `iter_dict`.
         '''
-        cols = self.columns
-        ret_dict = {}
-        # Much faster
         if otype == 'column':
-            for x in cols:
-                ret_dict[x] = self[x]
+            ret_dict = {x: [] for x in self.columns}
+            for chunk in self.iter_dict('column'):
+                for col, values in chunk.items():
+                    ret_dict[col].extend(values)
             return ret_dict
         elif otype == 'list':
-            ret_dict[self.name] = []
-            temp_dict = {}
-            for x in cols:
-                temp_dict[x] = self[x]
-            for x in range(0, len(temp_dict[cols[0]])):
-                _add_temp = {}
-                for y in cols:
-                    _add_temp[y] = temp_dict[y][x]
-                ret_dict[self.name].append(_add_temp)
-            return ret_dict
-        # Very VERY Slow
-        # But true dict
+            return {self.name: list(self.iter_dict('list'))}
         elif otype == 'dict':
-            for x in self:
-                ret_dict[x] = {
-                    k: v for k, v in zip(cols[1:], self[x][1:])
-                }
-            return ret_dict
+            return dict(self.iter_dict('dict'))
         else:
             raise TypeError(
                 'Please use \'column\', \'list\' or \'dict\' as otype'
             )
 
+    def iter_dict(self, otype: str = 'dict', chunk_size: int = 10000):
+        '''
+        Stream the table in the shapes of `to_dict`
+        otype: str
+            'dict': (key, {column: value}) pairs
+            'list': {column: value} rows
+            'column': {column: [values]} chunks of `chunk_size` rows
+
+        Every mode reads the table with one bounded keyset query per
+        `chunk_size` rows, so memory stays flat on large tables.
+        '''
+        if otype not in ('column', 'list', 'dict'):
+            raise TypeError(
+                'Please use \'column\', \'list\' or \'dict\' as otype'
+            )
+        cols = self.columns
+        chunks = self.__chunks('*', chunk_size)
+        if otype == 'dict':
+            values = cols[1:]
+            return ((row[0], dict(zip(values, row[1:])))
+                    for rows in chunks for row in rows)
+        if otype == 'list':
+            return (dict(zip(cols, row)) for rows in chunks for row in rows)
+        return (dict(zip(cols, map(list, zip(*rows)))) for rows in chunks)
+
+    def __chunks(self, cols, chunk_size):
+        '''
+        Lists of at most `chunk_size` rows of `cols` in rowid order.
+
+        Each list is a bounded `WHERE rowid > last ORDER BY rowid LIMIT n`
+        query, the writer thread never holds more than one of them.
+        '''
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive')
+        order = self.__rowid
+        GET_CHUNK = f'SELECT {order}, {cols} FROM "{self.name}" WHERE {{}}'\
+            + f' ORDER BY {order} LIMIT ?'
+        last = None
+        while True:
+            cond, args = ('1', ()) if last is None\
+                else (f'{order} > ?', (last,))
+            rows = list(self.__conn.select(GET_CHUNK.format(cond),
+                                           args + (chunk_size,)))
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [x[1:] for x in rows]
+            if len(rows) < chunk_size:
+                return
+
+    def iter_arrays(self, cols: Union[str, List[str], None] = None,
+                    dtype: Union[str, Dict[str, str], None] = None,
+                    chunk_size: int = 65536,
+                    use_numpy: Optional[bool] = None):
+        '''
+        Stream columns as {column: array} chunks of `chunk_size` rows,
+        see `to_arrays`
+        '''
+        cols, codes = self.__typecodes(cols, dtype)
+        np = _numpy(use_numpy)
+        refs = ', '.join(['"' + x.replace('"', '""') + '"' for x in cols])
+        for chunk in self.__chunks(refs, chunk_size):
+            arrays = self.__fill_arrays(cols, codes, chunk)
+            yield self.__to_numpy(arrays, np) if np is not None else arrays
+
+    def to_arrays(self, cols: Union[str, List[str], None] = None,
+                  dtype: Union[str, Dict[str, str], None] = None,
+                  use_numpy: Optional[bool] = None, record: bool = False,
+                  chunk_size: int = 65536):
+        '''
+        Read columns into compact arrays, in rowid order
+
+        cols: column or list of columns, every column by default
+        dtype: `array` typecode ('q', 'd', 'f'...) for every column or
+            {column: typecode}. By default INTEGER columns are 'q', REAL
+            ones 'd' and the others plain lists. NULLs become NaN in float
+            arrays and raise ValueError in integer ones.
+        use_numpy: return NumPy arrays, by default when NumPy is installed
+        record: return one NumPy structured array instead of a dict
+
+        Rows are read with one bounded query per `chunk_size` rows and
+        appended to the arrays, NumPy arrays then share their buffers
+        without a copy.
+        '''
+        cols, codes = self.__typecodes(cols, dtype)
+        np = _numpy(True if record else use_numpy)
+        arrays = {col: array(code) if code else []
+                  for col, code in zip(cols, codes)}
+        for chunk in self.iter_arrays(cols, dict(zip(cols, codes)),
+                                      chunk_size, use_numpy=False):
+            for col, values in chunk.items():
+                arrays[col].extend(values)
+        if np is None:
+            return arrays
+        arrays = self.__to_numpy(arrays, np)
+        if not record:
+            return arrays
+        out = np.empty(len(arrays[cols[0]]),
+                       dtype=[(col, arrays[col].dtype) for col in cols])
+        for col in cols:
+            out[col] = arrays[col]
+        return out
+
+    def __typecodes(self, cols, dtype):
+        '''
+        Requested columns and their `array` typecodes
+        '''
+        GET_COLS = f'PRAGMA TABLE_INFO("{self.name}")'
+        declared = {x[1]: x[2] for x in self.__conn.select(GET_COLS)}
+        if cols is None:
+            cols = list(declared)
+        elif isinstance(cols, str):
+            cols = [cols]
+        codes = []
+        for col in cols:
+            if col not in declared:
+                raise KeyError(f'Unknown column: {col}')
+            if isinstance(dtype, dict):
+                code = dtype.get(col, _array_typecode(declared[col]))
+            else:
+                code = dtype or _array_typecode(declared[col])
+            codes.append(code)
+        return list(cols), codes
+
+    @staticmethod
+    def __fill_arrays(cols, codes, rows):
+        arrays = {}
+        for i, (col, code) in enumerate(zip(cols, codes)):
+            values = [row[i] for row in rows]
+            if code is None:
+                arrays[col] = values
+                continue
+            if None in values:
+                if code not in ('f', 'd'):
+                    raise ValueError(
+                        f'Column {col} has NULL values, use a float dtype'
+                    )
+                values = [math.nan if x is None else x for x in values]
+            arrays[col] = array(code, values)
+        return arrays
+
+    @staticmethod
+    def __to_numpy(arrays, np):
+        ret = {}
+        for col, values in arrays.items():
+            if isinstance(values, list):
+                ret[col] = np.array(values, dtype=object)
+            elif len(values):
+                ret[col] = np.frombuffer(values, dtype=values.typecode)
+            else:
+                ret[col] = np.empty(0, dtype=values.typecode)
+        return ret
+
     def to_sql(self) -> str:
         '''
-        Returns the table in SQLite Syntax
+        Returns the table in SQLite Syntax, see `dump`
         '''
-        GET_SQL = f'SELECT sql FROM sqlite_master WHERE "name" = "{self.name}"'
-        CREATE = self.__conn.select_one(GET_SQL)[0]
-        if CREATE.find('IF NOT EXISTS') == -1:
-            idx = CREATE.find("TABLE")
-            CREATE = CREATE[:idx+5] + ' IF NOT EXISTS ' + CREATE[idx+5:]
-        VALUES = ',\n'.join([str(self[x]) for x in self.keys()])
-        INSERT = f'INSERT INTO "{self.name}" VALUES\n' + VALUES
-        return f'{CREATE};\n{INSERT};'
+        out = io.StringIO()
+        self.dump(out)
+        return out.getvalue()
+
+    def dump(self, fp, batch_rows: int = 500) -> int:
+        '''
+        Stream the table as SQL to the text file `fp`: its schema,
+        INSERTs of `batch_rows` rows and its indexes. Returns the number
+        of rows written.
+        '''
+        return _dump_sql(self.__conn, self.name, fp, batch_rows,
+                         self.__rowid)
+
+    def load(self, fp, batch_statements: int = 100) -> int:
+        '''
+        Run a `dump` of this table read from `fp`, `batch_statements`
+        statements per transaction. Returns the number of rows written.
+
+        The dump is executed as is, only load trusted files.
+        '''
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+        count = _load_sql(self.__conn, self.name, fp, batch_statements)
+        bloom = self.__conn.blooms.get(self.name)
+        if bloom is not None:
+            bloom.rebuild()
+        return count
 
 
 class JSONStorage(UserDict):
+    """
+    Connector Class for a SQLite JSON Document Storage as UserDict
+
+    `codec`, `compression`, `threshold` and `dictionary` only apply when
+    the storage is created, they are recorded and reused by later handles.
+    See `db86.codecs` for the codecs and compression options.
+
+    `without_rowid` clusters the documents on their key and `strict`
+    makes SQLite enforce the column types, both also only apply at
+    creation and are detected when the storage is reopened.
+
+    `lazy` makes this handle return read-only `LazyDocument`s instead of
+    dicts: True (or 'decode') fetches the stored value and decodes it on
+    first access, 'fields' fetches nothing and pulls the first few
+    accessed fields with `json_extract`.
+
+    Usage:
+        db = Database()
+        docs = db['some_docs', 'json']
+        big = db.storage('big_docs', compression='zlib', threshold=4096)
+    """
+
     def __init__(self, name: str, connection: SqliteMultiThread, flag: str,
-                 primary_key_dtype: str = 'TEXT'):
+                 primary_key_dtype: str = 'TEXT',
+                 codec: Union[str, Codec, None] = None,
+                 compression: Optional[str] = None,
+                 threshold: int = 1024,
+                 dictionary: Optional[bytes] = None,
+                 lazy: Union[bool, str] = False,
+                 without_rowid: bool = False, strict: bool = False):
         self.__conn = connection
         self.flag = flag
         self.name = name.replace('"', '""')
         # Check for the table or create new with
         # two columns named key(Primary Key) and
         # object
-        GET_ITEM = 'SELECT name FROM sqlite_master WHERE name = ?'
-        item = self.__conn.select_one(GET_ITEM, (name,))
-        if item is None:
+        GET_ITEM = 'SELECT name, sql FROM sqlite_master WHERE name IN (?, ?)'
+        found = dict(self.__conn.select(GET_ITEM, (name, META_TABLE)))
+        if name not in found:
+            base = get_codec(codec)
+            codec = base
+            if compression is not None:
+                codec = CompressedCodec(base, compression, threshold,
+                                        dictionary)
+            column_type = codec.column_type
+            if strict and column_type != base.column_type:
+                # Documents under the compression threshold keep the type
+                # of the inner codec, STRICT must accept both
+                column_type = 'ANY'
+            options = _table_options_sql(
+                [primary_key_dtype, column_type], without_rowid, strict
+            )
             MAKE_TABLE = f'''\
             CREATE TABLE IF NOT EXISTS "{self.name}" (
                 "key" {primary_key_dtype} PRIMARY KEY,
-                "object" TEXT
-            )
+                "object" {column_type}
+            ) {options}
             '''
             self.__conn.execute(MAKE_TABLE)
+            if codec.name != 'json':
+                # Storages without a record are plain JSON
+                MAKE_META = f'''\
+                CREATE TABLE IF NOT EXISTS "{META_TABLE}" (
+                    "name" TEXT PRIMARY KEY,
+                    "codec" TEXT NOT NULL,
+                    "compression" TEXT,
+                    "threshold" INTEGER,
+                    "dictionary" BLOB
+                )
+                '''
+                SET_META = f'REPLACE INTO "{META_TABLE}" ("name", "codec",\
+                 "compression", "threshold", "dictionary")\
+                 VALUES (?, ?, ?, ?, ?)'
+                self.__conn.execute(MAKE_META)
+                self.__conn.execute(SET_META, (
+                    name, base.name, compression,
+                    threshold if compression else None,
+                    dictionary if compression else None
+                ))
             self.__conn.commit()
+        else:
+            without_rowid = _table_option(found[name], 'WITHOUT ROWID')
+            recorded = ('json', None, None, None)
+            if META_TABLE in found:
+                GET_META = f'SELECT "codec", "compression", "threshold",\
+                 "dictionary" FROM "{META_TABLE}" WHERE "name" = ?'
+                recorded = self.__conn.select_one(GET_META, (name,))\
+                    or recorded
+            if codec is not None and (
+                    codec if isinstance(codec, str) else codec.name
+            ) != recorded[0]:
+                raise ValueError(
+                    f'Storage {name} is encoded with codec {recorded[0]}'
+                )
+            if compression is not None and compression != recorded[1]:
+                raise ValueError(
+                    f'Storage {name} is compressed with {recorded[1]}'
+                )
+            codec = get_codec(codec if codec is not None else recorded[0])
+            if recorded[1] is not None:
+                codec = CompressedCodec(codec, *recorded[1:])
+        if lazy not in (False, True, 'decode', 'fields'):
+            raise ValueError(f'Unknown lazy mode: {lazy}')
+        self.lazy = lazy
+        self.codec = codec
+        # Row identity and order, the clustered key without rowid
+        self.__rowid = '"key"' if without_rowid else 'rowid'
+        for fname, func in codec.functions.items():
+            self.__conn.create_function(fname, 1, func)
+        # The document as JSON functions see it
+        self.__doc = codec.document_sql('"object"')
 
     def describe(self):
         GET_COLS = f'PRAGMA TABLE_INFO("{self.name}")'
@@ -410,19 +1794,155 @@ class JSONStorage(UserDict):
         return f'JSON Storage: {self.name}'
 
     def __len__(self):
-        GET_LEN = f'SELECT COUNT(rowid) FROM "{self.name}"'
+        GET_LEN = f'SELECT COUNT(*) FROM "{self.name}"'
         rows = self.__conn.select_one(GET_LEN)[0]
         return rows if rows is not None else 0
 
     def __contains__(self, key):
+        bloom = self.__conn.blooms.get(self.name)
+        hit = bloom.lookup(key) if bloom is not None else None
+        if hit is False:
+            return False
         HAS_ITEM = f'SELECT 1 FROM "{self.name}" WHERE "key" = ?'
-        return self.__conn.select_one(HAS_ITEM, (key,)) is not None
+        found = self.__conn.select_one(HAS_ITEM, (key,)) is not None
+        if hit and not found:
+            bloom.false_positives += 1
+        return found
 
     def __iter__(self):
-        GET_KEYS = f'SELECT "key" FROM "{self.name}" ORDER BY rowid'
+        GET_KEYS = f'SELECT "key" FROM "{self.name}"'\
+            + f' ORDER BY {self.__rowid}'
         for x in self.__conn.select(GET_KEYS):
             yield x[0]
 
+    def __scan(self, cols, start, stop, prefix, reverse, limit):
+        '''
+        Stream `cols` of the documents in the key range, in key order
+        '''
+        cond, args = _key_range_sql('"key"', start, stop, prefix)
+        order = 'DESC' if reverse else 'ASC'
+        GET_RANGE = f'SELECT {cols} FROM "{self.name}" WHERE {cond}\
+         ORDER BY "key" {order}'
+        if limit is not None:
+            GET_RANGE += ' LIMIT ?'
+            args += (limit,)
+        return self.__conn.select(GET_RANGE, args)
+
+    def keys(self, start=None, stop=None, prefix: Optional[str] = None,
+             reverse: bool = False, limit: Optional[int] = None):
+        """
+        Keys in `[start, stop)` and starting with `prefix`.
+
+        Without arguments this is the usual keys view in rowid order,
+        otherwise a streaming iterator in key order served by the primary
+        key index.
+
+        Args:
+            start: Smallest key, inclusive.
+            stop: Largest key, exclusive.
+            prefix (str): Only keys starting with this string.
+            reverse (bool): Iterate in descending key order.
+            limit (int): Maximum number of keys.
+        """
+        if start is None and stop is None and prefix is None\
+                and not reverse and limit is None:
+            return super().keys()
+        return (x[0] for x in
+                self.__scan('"key"', start, stop, prefix, reverse, limit))
+
+    def items(self, start=None, stop=None, prefix: Optional[str] = None,
+              reverse: bool = False, limit: Optional[int] = None):
+        """
+        (key, document) pairs for the range, see `keys` for the arguments.
+        Documents are decoded as they stream, or wrapped when `lazy`.
+        """
+        if start is None and stop is None and prefix is None\
+                and not reverse and limit is None:
+            return super().items()
+        column = self.codec.column_sql('"object"')
+        cols = f'"key", {column}'
+        rows = self.__scan(cols, start, stop, prefix, reverse, limit)
+        if self.lazy:
+            return ((x[0], LazyDocument(self, x[0], x[1])) for x in rows)
+        return ((x[0], self.codec.decode(x[1])) for x in rows)
+
+    def __page(self, cols, limit, cursor, by):
+        '''
+        `cols` of one page of documents, and the next cursor
+        '''
+        if by not in ('rowid', 'key'):
+            raise ValueError(f'Cannot page by {by}')
+        col = self.__rowid if by == 'rowid' else '"key"'
+        cond, args = '1', ()
+        if cursor is not None:
+            cond, args = f'{col} > ?', (_decode_cursor(cursor, by),)
+        GET_PAGE = f'SELECT {col}, {cols} FROM "{self.name}" WHERE {cond}\
+         ORDER BY {col}'
+        if limit is not None:
+            # One extra row tells whether there is a next page
+            GET_PAGE += ' LIMIT ?'
+            args += (limit + 1,)
+        rows = list(self.__conn.select(GET_PAGE, args))
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(by, rows[-1][0])
+        return [x[1:] for x in rows], next_cursor
+
+    def page(self, limit: Optional[int], cursor: Optional[str] = None,
+             by: str = 'rowid'):
+        """
+        One page of (key, document) pairs using keyset pagination.
+
+        Every page is a `WHERE col > last ORDER BY col LIMIT n` index
+        seek, so deep pages cost the same as the first one.
+
+        Args:
+            limit (int): Page size, None for everything after `cursor`.
+            cursor (str): Token returned with the previous page.
+            by (str): 'rowid' for insertion order or 'key' for key order.
+
+        Returns:
+            tuple: (items, next cursor or None on the last page).
+        """
+        column = self.codec.column_sql('"object"')
+        rows, next_cursor = self.__page(f'"key", {column}', limit, cursor,
+                                        by)
+        if self.lazy:
+            return [(x[0], LazyDocument(self, x[0], x[1]))
+                    for x in rows], next_cursor
+        return [(x[0], self.codec.decode(x[1])) for x in rows], next_cursor
+
+    def page_raw(self, limit: Optional[int], cursor: Optional[str] = None,
+                 by: str = 'rowid'):
+        """
+        `page` returning (key, JSON text) pairs, see `get_raw`.
+        """
+        column = self.codec.column_sql('"object"')
+        rows, next_cursor = self.__page(f'"key", {column}', limit, cursor,
+                                        by)
+        return [(x[0], self.codec.text(x[1])) for x in rows], next_cursor
+
+    def delete_range(self, start=None, stop=None,
+                     prefix: Optional[str] = None) -> int:
+        """
+        Delete the documents in the range, see `keys` for the arguments.
+
+        Returns:
+            int: Number of documents deleted.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to delete in read-only mode')
+        if start is None and stop is None and prefix is None:
+            raise ValueError('delete_range needs start, stop or prefix')
+        cond, args = _key_range_sql('"key"', start, stop, prefix)
+        DELETE = f'DELETE FROM "{self.name}" WHERE {cond}'
+        count = self.__conn.execute_count(DELETE, args)
+        self.__invalidate()
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
+        return count
+
     def __setitem__(self, key, value: dict):
         if self.flag == 'r':
             raise RuntimeError('Refusing to write in read-only mode')
@@ -432,30 +1952,73 @@ class JSONStorage(UserDict):
             return
 
         if type(value) == dict:
-            import json
+            bind = self.codec.bind_sql()
             if key not in self:
-                data = (key, json.dumps(value))
+                data = (key, self.codec.encode(value))
                 ADD_ITEM = f'REPLACE INTO "{self.name}"\
-                 ("key", "object") VALUES (?, ?)'
+                 ("key", "object") VALUES (?, {bind})'
             else:
-                data = (json.dumps(value), key)
+                data = (self.codec.encode(value), key)
                 ADD_ITEM = f'UPDATE "{self.name}"\
-                 SET "object" = ? WHERE "key" = ?'
+                 SET "object" = {bind} WHERE "key" = ?'
         else:
             raise TypeError("Incorrect value format, use dict")
+        bloom = self.__conn.blooms.get(self.name)
+        if bloom is not None:
+            bloom.add(key)
         self.__conn.execute(ADD_ITEM, data)
+        self.__invalidate(key)
         if self.__conn.autocommit and self.__conn.transaction_depth == 0:
             self.commit()
 
     def __getitem__(self, key):
-        import json
         if "/" in key:
             return [value for value in self.get_path(key)][0]
-        GET_ITEM = f'SELECT "object" FROM "{self.name}" WHERE "key" = ?'
+        cache = self.__conn.caches.get(self.name)
+        if cache is not None:
+            value = cache.get(key)
+            if value is not MISSING:
+                return value
+            generation = cache.generation
+        if self.lazy == 'fields':
+            if key not in self:
+                raise KeyError(key)
+            return LazyDocument(self, key)
+        data = self._get_encoded(key)
+        if self.lazy:
+            return LazyDocument(self, key, data)
+        value = self.codec.decode(data)
+        if cache is not None:
+            cache.put(key, value, len(data), generation)
+        return value
+
+    def _get_encoded(self, key):
+        '''
+        Stored value at `key`, as `codec.decode` takes it
+        '''
+        column = self.codec.column_sql('"object"')
+        GET_ITEM = f'SELECT {column} FROM "{self.name}" WHERE "key" = ?'
         item = self.__conn.select_one(GET_ITEM, (key,))
         if item is None:
             raise KeyError(key)
-        return json.loads(item[0])
+        return item[0]
+
+    def _get_field(self, key, field: str) -> Any:
+        '''
+        Top level `field` of the document at `key`, MISSING if absent
+        '''
+        # Two paths make json_extract return JSON, keeping booleans
+        GET_FIELD = f'SELECT json_extract({self.__doc}, ?1, ?1),\
+         json_type({self.__doc}, ?1) FROM "{self.name}" WHERE "key" = ?2'
+        if not _json_addressable([field]):
+            document = self.codec.decode(self._get_encoded(key))
+            return document.get(field, MISSING)
+        item = self.__conn.select_one(GET_FIELD, (_json_path([field]), key))
+        if item is None:
+            raise KeyError(key)
+        if item[1] is None:
+            return MISSING
+        return json.loads(item[0])[0]
 
     def __delitem__(self, key):
         if self.flag == 'r':
@@ -464,72 +2027,183 @@ class JSONStorage(UserDict):
             raise KeyError(key)
         DEL_ITEM = f'DELETE FROM "{self.name}" WHERE "key" = ?'
         self.__conn.execute(DEL_ITEM, (key,))
+        self.__invalidate(key)
         if self.__conn.autocommit and self.__conn.transaction_depth == 0:
             self.commit()
 
+    def enable_cache(self, max_entries: int = 1024,
+                     max_bytes: Optional[int] = 64 * 1024 * 1024,
+                     check_interval: float = 1.0,
+                     copy: bool = True) -> DocumentCache:
+        """
+        Cache decoded documents of this storage in an LRU.
+
+        The cache is shared by every handle on this storage through the
+        connection. Writes through the storage invalidate it at once,
+        writes by other connections or processes are picked up from
+        `PRAGMA data_version` at most `check_interval` seconds late.
+        Until then hits may return their stale documents. Checking costs
+        a blocking request to the writer thread, so `check_interval=0`
+        makes every hit wait behind queued writes; keep the default
+        unless other writers must be seen immediately. See
+        `DocumentCache` for the options.
+        """
+        cache = DocumentCache(self.__conn, max_entries, max_bytes,
+                              check_interval, copy)
+        self.__conn.caches[self.name] = cache
+        return cache
+
+    def disable_cache(self):
+        self.__conn.caches.pop(self.name, None)
+
+    def enable_bloom(self, capacity: Optional[int] = None,
+                     error_rate: float = 0.01,
+                     check_interval: Optional[float] = None) -> KeyFilter:
+        """
+        Answer membership checks for missing keys from a Bloom filter.
+
+        Shared through the connection like the document cache, see
+        `Table.enable_bloom` and `KeyFilter`.
+        """
+        return _enable_bloom(self.__conn, self.name, 'key',
+                             capacity=capacity, error_rate=error_rate,
+                             check_interval=check_interval)
+
+    def disable_bloom(self):
+        self.__conn.blooms.pop(self.name, None)
+
+    @property
+    def bloom_stats(self) -> Optional[Dict[str, Any]]:
+        '''
+        Lookup, negative and false positive counters, None without filter
+        '''
+        bloom = self.__conn.blooms.get(self.name)
+        return bloom.stats if bloom is not None else None
+
+    @property
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        '''
+        Hit, miss, eviction and size counters, None when not cached
+        '''
+        cache = self.__conn.caches.get(self.name)
+        return cache.stats if cache is not None else None
+
+    def __invalidate(self, key=None):
+        '''
+        Drop `key` from the document cache, or everything if None, and
+        count the write for the query cache
+        '''
+        writes = self.__conn.writes
+        writes[self.name] = writes.get(self.name, 0) + 1
+        cache = self.__conn.caches.get(self.name)
+        if cache is None:
+            return
+        if key is None:
+            cache.clear()
+        else:
+            cache.discard(key)
+
     def get_path(self, path, default=None, delimiter="/"):
         """
         Retrieve a value from nested dict-like storage using a path expression.
         Supports wildcards (*) and skips entries where keys are missing.
 
+        The path is compiled to `json_each` joins, so SQLite walks the
+        documents and only the matched values are transferred and decoded.
+
         Args:
             path (str): Delimited path string (e.g., "team/members/*/name").
             default (Any): Value to return if path is not found.
             delimiter (str): Delimiter used to split the path.
 
         Returns:
-            Any: Value(s) at the path or default if not found.
+            Generator: {full_path: value} for every matched path.
         """
+        path = path.strip(delimiter)
+        keys = path.split(delimiter)
+        return self.__resolve_path(keys, default, delimiter)
 
-        def resolve(current,
-                    keys,
-                    default=None,
-                    path_prefix= None,
-                    delimiter: str = "/"):
-            """
-            Lazily yield (full_path, value) for every matched path, even if value == default.
-
-            - '*' matches all keys or list indices at this level.
-            - Supports dict, UserDict, and list traversal.
-            - Always yields exactly once for each path implied by keys sequence.
-            """
-            if path_prefix is None:
-                path_prefix = []
-
-            if not keys:
-                # End of path expression — yield whatever we have (or default if missing)
-                yield {delimiter.join(path_prefix): current}
-                return
+    def __resolve_path(self, keys, default, delimiter):
+        '''
+        Lazily yield {full_path: value} for a path split into `keys`.
 
-            key = keys[0]
-            rest = keys[1:]
+        - '*' matches all keys or list indices at this level, and stops
+          the walk on anything that is not a dict or list.
+        - Missing keys yield `default` at the full path.
+        '''
+        CONTAINER = "('object', 'array')"
 
-            if key == "*":
-                if isinstance(current, (dict, UserDict)):
-                    for subkey, subval in current.items():
-                        yield from resolve(subval, rest, default, path_prefix + [str(subkey)], delimiter)
-                elif isinstance(current, list):
-                    for idx, item in enumerate(current):
-                        yield from resolve(item, rest, default, path_prefix + [str(idx)], delimiter)
-                else:
-                    # Can't expand '*' — just propagate without keys.
-                    yield from resolve(current, [], default, path_prefix, delimiter)
+        def value_sql(dtype, expr):
+            # json_extract hands booleans back as 1/0
+            return f"CASE {dtype} WHEN 'true' THEN 'true'"\
+                f" WHEN 'false' THEN 'false' ELSE json_quote({expr}) END"
 
+        key, runs = keys[0], [[]]
+        for k in keys[1:]:
+            if k == "*":
+                runs.append([])
             else:
-                if isinstance(current, (dict, UserDict)):
-                    if key in current:
-                        yield from resolve(current[key], rest, default, path_prefix + [key], delimiter)
-                    else:
-                        # Key missing — substitute default and still yield
-                        yield from resolve(default, rest, default, path_prefix + [key], delimiter)
-                else:
-                    # Not a mapping — treat as missing
-                    yield from resolve(default, rest, default, path_prefix + [key], delimiter)
-
+                runs[-1].append(k)
+        stars = len(runs) - 1
 
-        path = path.strip(delimiter)
-        keys = path.split(delimiter)
-        return resolve(self, keys, default, delimiter=delimiter)
+        joins, conds, order, nodes = [], [], ['t.' + self.__rowid], []
+        for i, run in enumerate(runs):
+            if i == 0:
+                src = self.codec.document_sql('t."object"')
+            else:
+                src = f'CASE WHEN e{i}.type IN {CONTAINER}'\
+                    + f' THEN e{i}.value END'
+            if i and not run:
+                jpath, dtype = "'$'", f'e{i}.type'
+                nodes.append((dtype, value_sql(dtype, f'e{i}.value')))
+            else:
+                jpath = _sql_string(_json_path(run))
+                dtype = f'json_type({src}, {jpath})'
+                nodes.append((dtype, value_sql(
+                    dtype, f'json_extract({src}, {jpath})')))
+            if i < stars:
+                alias = f'e{i + 1}'
+                joins.append(
+                    f'LEFT JOIN json_each(CASE WHEN {dtype} IN {CONTAINER}'
+                    f' THEN {src} END, {jpath}) AS {alias}'
+                )
+                conds.append(f'({alias}.id IS NOT NULL OR {dtype} IS NULL'
+                             f' OR {dtype} NOT IN {CONTAINER})')
+                order.append(f'{alias}.id')
+
+        # Value of the node the walk stopped at, or the final node
+        dtype, value = nodes[-1]
+        if stars:
+            stops = [f'WHEN e{i + 1}.id IS NULL THEN' for i in range(stars)]
+            dtype = ' '.join(['CASE'] + [f'{x} {n[0]}' for x, n
+                                         in zip(stops, nodes)]
+                             + [f'ELSE {dtype} END'])
+            value = ' '.join(['CASE'] + [f'{x} {n[1]}' for x, n
+                                         in zip(stops, nodes)]
+                             + [f'ELSE {value} END'])
+        cols = ', '.join([f'e{i + 1}.key' for i in range(stars)] +
+                         [value, f'({dtype}) IS NULL'])
+        if key != "*":
+            conds.append('t."key" = ?')
+        GET_PATH = f'SELECT t."key", {cols} FROM "{self.name}" AS t '\
+            + ' '.join(joins)\
+            + (f' WHERE {" AND ".join(conds)}' if conds else '')\
+            + f' ORDER BY {", ".join(order)}'
+
+        found = False
+        for row in self.__conn.select(GET_PATH,
+                                      (key,) if key != "*" else None):
+            found = True
+            parts = [row[0]] + runs[0]
+            for i in range(stars):
+                if row[1 + i] is None:
+                    break
+                parts += [str(row[1 + i])] + runs[i + 1]
+            value = default if row[-1] else json.loads(row[-2])
+            yield {delimiter.join(parts): value}
+        if not found and key != "*":
+            # Missing key, substitute default and still yield
+            yield {delimiter.join([key] + runs[0]): default}
     
     def set_path(self, path: str, value: Any, delimiter: str = "/"):
         """
@@ -546,6 +2220,8 @@ class JSONStorage(UserDict):
         def assign(current, keys, value):
             if not keys:
                 return value
+            if isinstance(current, LazyDocument):
+                current = current.to_dict()
 
             key = keys[0]
             rest = keys[1:]
@@ -564,7 +2240,7 @@ class JSONStorage(UserDict):
 
             else:
                 if isinstance(current, (dict, UserDict)):
-                    if key not in current or not isinstance(current[key], (dict, list, UserDict)):
+                    if key not in current or not isinstance(current[key], (dict, list, UserDict, LazyDocument)):
                         # Create intermediate dict if missing
                         current[key] = {} if rest else None
                     current[key] = assign(current[key], rest, value)
@@ -584,77 +2260,301 @@ class JSONStorage(UserDict):
 
         path = path.strip(delimiter)
         keys = path.split(delimiter)
-        assign(self, keys, value)
+        key, rest = keys[0], keys[1:]
+        if not rest or "*" in rest or not _json_addressable(rest):
+            assign(self, keys, value)
+            return
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+
+        # In-database json_set when every parent is an object (or missing),
+        # anything else (lists, scalars, new keys) keeps the Python semantics
+        parents, args = _json_parents_sql(self.__doc, rest)
+        new = self.codec.store_sql(f'json_set({self.__doc}, ?, json(?))')
+        if key == "*":
+            SET_PATH = f'UPDATE "{self.name}"\
+             SET "object" = {new} WHERE {parents}'
+            self.__conn.execute(
+                SET_PATH, (_json_path(rest), json.dumps(value)) + args
+            )
+            self.__invalidate()
+            if len(rest) > 1:
+                GET_KEYS = f'SELECT "key" FROM "{self.name}"\
+                 WHERE NOT ({parents}) ORDER BY {self.__rowid}'
+                for x in list(self.__conn.select(GET_KEYS, args)):
+                    self[x[0]] = assign(self[x[0]], rest, value)
+        else:
+            SET_PATH = f'UPDATE "{self.name}"\
+             SET "object" = {new} WHERE "key" = ? AND {parents} RETURNING 1'
+            item = self.__conn.select_one(
+                SET_PATH, (_json_path(rest), json.dumps(value), key) + args
+            )
+            self.__invalidate(key)
+            if item is None:
+                assign(self, keys, value)
+                return
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
 
     def get_path_value(self, key, path, default=None, delimiter="/"):
         """Get a single value at the given path for the specified key."""
-        if key not in self:
+        try:
+            return self.get_fields(key, [path], default, delimiter)[path]
+        except KeyError:
             return default
-        obj = self[key]
-        keys = path.split(delimiter)
-        current = obj
-        for k in keys:
-            if isinstance(current, dict) and k in current:
+
+    def __walk_fields(self, key, paths, default, delimiter):
+        '''
+        `get_fields` on the decoded document, for paths that `_json_path`
+        cannot address with this SQLite
+        '''
+        document = self.codec.decode(self._get_encoded(key))
+        ret = {}
+        for path in paths:
+            current = document
+            for k in path.split(delimiter):
+                if not isinstance(current, dict) or k not in current:
+                    current = default
+                    break
                 current = current[k]
-            else:
-                return default
-        return current
+            ret[path] = current
+        return ret
 
-    def _set_path(self, key, path, value, delimiter="/"):
-        """Set a value at the given path for the specified key."""
-        if key not in self:
-            raise KeyError(f"Key {key} not found")
-        obj = self[key]
+    def __fields_sql(self, paths, delimiter):
+        '''
+        Select list extracting `paths` from a document, with bind parameters
+        '''
+        jpaths = tuple([_json_path(x.split(delimiter)) for x in paths])
+        if len(jpaths) == 1:
+            # json_extract only wraps the values in an array for 2+ paths
+            jpaths = jpaths * 2
+        types = ', '.join([f'json_type({self.__doc}, ?)' for _ in paths])
+        marks = ', '.join(['?' for _ in jpaths])
+        return f'json_extract({self.__doc}, {marks}), {types}',\
+            jpaths + jpaths[:len(paths)]
+
+    def get_fields(self, key, paths: List[str], default=None,
+                   delimiter="/") -> Dict[str, Any]:
+        """
+        Fetch only the values at `paths` from the document at `key`.
+
+        The values are extracted with `json_extract` in one query, so the
+        rest of the document is never transferred or decoded.
+
+        Args:
+            key (str): Document key.
+            paths (list[str]): Delimited paths, e.g. `["a/b", "c"]`.
+            default (Any): Value for paths that are not found.
+            delimiter (str): Delimiter used to split the paths.
+
+        Returns:
+            dict: path -> value.
+
+        Raises:
+            KeyError: If `key` is not in the storage.
+        """
+        if not paths:
+            if key not in self:
+                raise KeyError(key)
+            return {}
+        if not all([_json_addressable(x.split(delimiter)) for x in paths]):
+            return self.__walk_fields(key, paths, default, delimiter)
+        cols, args = self.__fields_sql(paths, delimiter)
+        GET_FIELDS = f'SELECT {cols} FROM "{self.name}" WHERE "key" = ?'
+        item = self.__conn.select_one(GET_FIELDS, args + (key,))
+        if item is None:
+            raise KeyError(key)
+        values = json.loads(item[0])
+        return {
+            path: default if dtype is None else value
+            for path, value, dtype in zip(paths, values, item[1:])
+        }
+
+    def get_fields_many(self, keys: List[str], paths: List[str],
+                        default=None, delimiter="/"
+                        ) -> Dict[str, Dict[str, Any]]:
+        """
+        Multi-key variant of `get_fields`.
+
+        Returns:
+            dict: key -> {path -> value}, keys that are not in the storage
+            are left out.
+        """
+        keys = list(keys)
+        if not paths:
+            return {x: {} for x in keys if x in self}
+        if not all([_json_addressable(x.split(delimiter)) for x in paths]):
+            return {x: self.__walk_fields(x, paths, default, delimiter)
+                    for x in keys if x in self}
+        cols, args = self.__fields_sql(paths, delimiter)
+        ret = {}
+        # Stay well under SQLITE_MAX_VARIABLE_NUMBER
+        for i in range(0, len(keys), 500):
+            chunk = tuple(keys[i:i + 500])
+            marks = ', '.join(['?' for _ in chunk])
+            GET_FIELDS = f'SELECT "key", {cols} FROM "{self.name}"\
+             WHERE "key" IN ({marks})'
+            for item in self.__conn.select(GET_FIELDS, args + chunk):
+                values = json.loads(item[1])
+                ret[item[0]] = {
+                    path: default if dtype is None else value
+                    for path, value, dtype in zip(paths, values, item[2:])
+                }
+        return {x: ret[x] for x in keys if x in ret}
+
+    def _set_path(self, key, path, value, delimiter="/", blocking=True):
+        """
+        Set a value at the given path for the specified key.
+
+        The document is updated in place with `json_set`, creating missing
+        intermediate dicts. With `blocking=False` the statement is queued
+        and missing keys or non-dict parents are silently ignored.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
         keys = path.split(delimiter)
-        current = obj
-        for k in keys[:-1]:
-            if not isinstance(current, dict):
-                raise TypeError(f"Cannot set path {path}: {k} is not a dict")
-            if k not in current:
-                current[k] = {}
-            current = current[k]
-        current[keys[-1]] = value
-        self[key] = obj
+        if not _json_addressable(keys):
+            self.__edit_path(key, keys, path, 'set', value, blocking)
+            return
+        parents, args = _json_parents_sql(self.__doc, keys)
+        new = self.codec.store_sql(f'json_set({self.__doc}, ?, json(?))')
+        SET_PATH = f'UPDATE "{self.name}" SET "object" = {new}\
+         WHERE "key" = ? AND {parents}'
+        data = (_json_path(keys), json.dumps(value), key) + args
+        if not blocking:
+            self.__conn.execute(SET_PATH, data)
+            self.__invalidate(key)
+            if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+                self.commit(blocking=False)
+            return
+        item = self.__conn.select_one(SET_PATH + ' RETURNING 1', data)
+        self.__invalidate(key)
+        if item is None:
+            self.__raise_path_error(key, keys, path, 'set')
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
 
-    def del_path(self, key, path, delimiter="/"):
-        """Delete the value at the given path for the specified key."""
-        if key not in self:
-            raise KeyError(f"Key {key} not found")
-        obj = self[key]
+    def del_path(self, key, path, delimiter="/", blocking=True):
+        """
+        Delete the value at the given path for the specified key.
+
+        The value is removed in place with `json_remove`. With
+        `blocking=False` the statement is queued and missing keys or paths
+        are silently ignored.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to delete in read-only mode')
         keys = path.split(delimiter)
-        current = obj
-        for k in keys[:-1]:
-            if not isinstance(current, dict) or k not in current:
-                raise KeyError(f"Path {path} not found")
-            current = current[k]
-        if not isinstance(current, dict) or keys[-1] not in current:
+        if not _json_addressable(keys):
+            self.__edit_path(key, keys, path, 'delete', None, blocking)
+            return
+        new = self.codec.store_sql(f'json_remove({self.__doc}, ?1)')
+        DEL_PATH = f'UPDATE "{self.name}" SET "object" = {new}\
+         WHERE "key" = ?2 AND json_type({self.__doc}, ?1) IS NOT NULL'
+        data = (_json_path(keys), key)
+        if not blocking:
+            self.__conn.execute(DEL_PATH, data)
+            self.__invalidate(key)
+            if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+                self.commit(blocking=False)
+            return
+        item = self.__conn.select_one(DEL_PATH + ' RETURNING 1', data)
+        self.__invalidate(key)
+        if item is None:
+            if key not in self:
+                raise KeyError(f"Key {key} not found")
             raise KeyError(f"Path {path} not found")
-        del current[keys[-1]]
-        self[key] = obj
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
 
-    def add_path(self, key, path, value, delimiter="/"):
-        """Add value at path: set if not exists, append if list."""
-        if key not in self:
-            raise KeyError(f"Key {key} not found")
-        obj = self[key]
+    def add_path(self, key, path, value, delimiter="/", blocking=True):
+        """
+        Add value at path: set if not exists, append if list.
+
+        Lists are appended to in place with `json_set` on `[#]`, anything
+        else is set or overwritten. With `blocking=False` the statement is
+        queued and missing keys or non-dict parents are silently ignored.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
         keys = path.split(delimiter)
-        current = obj
-        for k in keys[:-1]:
-            if not isinstance(current, dict):
-                raise TypeError(f"Cannot add to path {path}: {k} is not a dict")
-            if k not in current:
-                current[k] = {}
-            current = current[k]
-        last_key = keys[-1]
-        if last_key not in current:
-            current[last_key] = value
-        else:
-            if isinstance(current[last_key], list):
-                current[last_key].append(value)
+        if not _json_addressable(keys):
+            self.__edit_path(key, keys, path, 'add to', value, blocking)
+            return
+        parents, args = _json_parents_sql(self.__doc, keys)
+        target = _json_path(keys)
+        new = self.codec.store_sql(f'json_set({self.__doc},\
+            CASE WHEN json_type({self.__doc}, ?) = \'array\'\
+            THEN ? ELSE ? END, json(?))')
+        ADD_PATH = f'UPDATE "{self.name}" SET "object" = {new}\
+         WHERE "key" = ? AND {parents}'
+        data = (target, target + '[#]', target, json.dumps(value), key) + args
+        if not blocking:
+            self.__conn.execute(ADD_PATH, data)
+            self.__invalidate(key)
+            if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+                self.commit(blocking=False)
+            return
+        item = self.__conn.select_one(ADD_PATH + ' RETURNING 1', data)
+        self.__invalidate(key)
+        if item is None:
+            self.__raise_path_error(key, keys, path, 'add to')
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
+
+    def __edit_path(self, key, keys, path, action, value, blocking):
+        '''
+        Read-modify-write fallback of the path mutators, for paths that
+        `_json_path` cannot address with this SQLite
+        '''
+        try:
+            if key not in self:
+                raise KeyError(f"Key {key} not found")
+            obj = self.codec.decode(self._get_encoded(key))
+            current = obj
+            for k in keys[:-1]:
+                if action == 'delete' and k not in current:
+                    raise KeyError(f"Path {path} not found")
+                current = current.setdefault(k, {})
+                if isinstance(current, dict):
+                    continue
+                if action == 'delete':
+                    raise KeyError(f"Path {path} not found")
+                raise TypeError(
+                    f"Cannot {action} path {path}: {k} is not a dict"
+                )
+            last = keys[-1]
+            if action == 'delete':
+                if last not in current:
+                    raise KeyError(f"Path {path} not found")
+                del current[last]
+            elif action == 'add to' and isinstance(current.get(last), list):
+                current[last].append(value)
             else:
-                current[last_key] = value  # overwrite
+                current[last] = value
+        except (KeyError, TypeError):
+            if blocking:
+                raise
+            return
         self[key] = obj
 
+    def __raise_path_error(self, key, keys, path, action):
+        '''
+        Explain why an in-database path update matched no row
+        '''
+        if key not in self:
+            raise KeyError(f"Key {key} not found")
+        cols = ', '.join([f'json_type({self.__doc}, ?)'
+                          for _ in keys[:-1]])
+        GET_TYPES = f'SELECT {cols} FROM "{self.name}" WHERE "key" = ?'
+        parents = [_json_path(keys[:i]) for i in range(1, len(keys))]
+        types = self.__conn.select_one(GET_TYPES, tuple(parents) + (key,))
+        for k, dtype in zip(keys, types):
+            if dtype not in (None, 'object'):
+                raise TypeError(
+                    f"Cannot {action} path {path}: {k} is not a dict"
+                )
+
     @property
     def columns(self) -> list:
         '''
@@ -678,12 +2578,60 @@ class JSONStorage(UserDict):
     def to_dict(self):
         ret_dict = {}
         for x in self.keys():
-            ret_dict[x] = self[x]
+            ret_dict[x] = self.__document(x)
         return ret_dict
 
+    def __document(self, key):
+        '''
+        Decoded document at `key`, also when this handle is lazy
+        '''
+        value = self[key]
+        if isinstance(value, LazyDocument):
+            return value.to_dict()
+        return value
+
     def to_json(self):
-        import json
-        return json.dumps(self.to_dict())
+        # Splice the stored JSON text instead of decoding and re-encoding,
+        # keys are converted to strings as json.dumps does
+        return '{' + ', '.join([
+            json.dumps(key if type(key) is str else json.dumps(key))
+            + f': {text}' for key, text in self.iter_raw()
+        ]) + '}'
+
+    def get_raw(self, key) -> str:
+        '''
+        JSON text of the document at `key`, the stored value itself for
+        the default codec
+        '''
+        return self.codec.text(self._get_encoded(key))
+
+    def get_raw_many(self, keys: List[str]) -> Dict[str, str]:
+        '''
+        Multi-key variant of `get_raw`, keys that are not in the storage
+        are left out
+        '''
+        keys = list(keys)
+        column = self.codec.column_sql('"object"')
+        ret = {}
+        # Stay well under SQLITE_MAX_VARIABLE_NUMBER
+        for i in range(0, len(keys), 500):
+            chunk = tuple(keys[i:i + 500])
+            marks = ', '.join(['?' for _ in chunk])
+            GET_ITEMS = f'SELECT "key", {column} FROM "{self.name}"\
+             WHERE "key" IN ({marks})'
+            for item in self.__conn.select(GET_ITEMS, chunk):
+                ret[item[0]] = self.codec.text(item[1])
+        return {x: ret[x] for x in keys if x in ret}
+
+    def iter_raw(self):
+        '''
+        Yield (key, JSON text) for every document in rowid order
+        '''
+        column = self.codec.column_sql('"object"')
+        GET_ITEMS = f'SELECT "key", {column} FROM "{self.name}"\
+         ORDER BY {self.__rowid}'
+        for item in self.__conn.select(GET_ITEMS):
+            yield item[0], self.codec.text(item[1])
     
     def query(self, recipe: Dict[str, Any], delimiter: str = "/") -> Union[List[Dict], Dict, Any]:
         """
@@ -772,8 +2720,29 @@ class JSONStorage(UserDict):
             },
             "sort": [{"field": "dept", "order": "asc"}],
         })
+
+        Results are reused between writes when the database has a query
+        cache, see `Database.enable_query_cache`.
         """
  
+        query_cache = self.__conn.query_cache
+        if query_cache is not None:
+            cache_key = query_cache.make_key(self.name, recipe, delimiter)
+            if cache_key is not None:
+                writes = self.__conn.writes.get(self.name, 0)
+                generation = query_cache.generation
+                result = query_cache.get(cache_key, writes)
+                if result is MISSING:
+                    result = self.__query(recipe, delimiter)
+                    query_cache.put(cache_key, result, writes, generation)
+                return result
+        return self.__query(recipe, delimiter)
+
+    def __query(self, recipe: Dict[str, Any], delimiter: str):
+        '''
+        Evaluate a `query` recipe
+        '''
+
         # ------------------------------------------------------------------ #
         #  Internal helpers                                                  #
         # ------------------------------------------------------------------ #
@@ -881,7 +2850,7 @@ class JSONStorage(UserDict):
         rows: List[Dict] = []
         for key in self:
             try:
-                item = self[key]
+                item = self.__document(key)
             except Exception:
                 continue
  
@@ -973,9 +2942,68 @@ class JSONStorage(UserDict):
             ret[key] = r
         return ret
     
+    def update_where(self, filter: Dict, changes: Dict[str, Any],
+                     delimiter: str = "/") -> int:
+        """
+        Set paths on every document matching `filter` in one statement.
+
+        Args:
+            filter (dict): Filter expression, same grammar as `query()`.
+            changes (dict): Delimited path -> value to set. Missing
+                intermediate dicts are created, non-dict parents are left
+                untouched.
+            delimiter (str): Delimiter used to split the paths.
+
+        Returns:
+            int: Number of documents updated.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+        if not changes:
+            return 0
+        cond, args = _compile_filter(filter, self.__doc, delimiter=delimiter)
+        sets = ', '.join(['?, json(?)' for _ in changes])
+        data = []
+        for path, value in changes.items():
+            data += [_json_path(path.strip(delimiter).split(delimiter)),
+                     json.dumps(value)]
+        new = self.codec.store_sql(f'json_set({self.__doc}, {sets})')
+        UPDATE = f'UPDATE "{self.name}" SET "object" = {new} WHERE {cond}'
+        count = self.__conn.execute_count(UPDATE, tuple(data + args))
+        self.__invalidate()
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
+        return count
+
+    def delete_where(self, filter: Dict, delimiter: str = "/") -> int:
+        """
+        Delete every document matching `filter` in one statement.
+
+        Args:
+            filter (dict): Filter expression, same grammar as `query()`.
+            delimiter (str): Delimiter used to split the paths.
+
+        Returns:
+            int: Number of documents deleted.
+        """
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to delete in read-only mode')
+        cond, args = _compile_filter(filter, self.__doc, delimiter=delimiter)
+        DELETE = f'DELETE FROM "{self.name}" WHERE {cond}'
+        count = self.__conn.execute_count(DELETE, tuple(args))
+        self.__invalidate()
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            self.commit()
+        return count
+
     def merge(self, dict2: dict):
         '''
         Update the Storage
+
+        Only the keys in `dict2` are read and written, in one transaction.
+        Patches without `None` values are applied in SQL with `json_patch`,
+        the rest are merged in Python since `json_patch` treats `null` as
+        a deletion.
         '''
         def dict_merge(a, b):
             '''
@@ -992,19 +3020,115 @@ class JSONStorage(UserDict):
                     result[k] = deepcopy(v)
             return result
 
-        res_dict = dict_merge(self.to_dict(), dict2)
-        for x in res_dict.keys():
-            self[x] = res_dict[x]
+        def has_none(value):
+            if isinstance(value, dict):
+                return any(has_none(x) for x in value.values())
+            if isinstance(value, list):
+                return any(has_none(x) for x in value)
+            return value is None
+
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+        for key, value in dict2.items():
+            if "/" not in key and type(value) != dict:
+                raise TypeError("Incorrect value format, use dict")
+
+        from .transaction import Transaction
+        bind = self.codec.bind_sql()
+        excluded = self.codec.document_sql('excluded."object"')
+        patched = self.codec.store_sql(
+            f'json_patch({self.__doc}, {excluded})'
+        )
+        PATCH_ITEM = f'INSERT INTO "{self.name}" ("key", "object")\
+         VALUES (?, {bind}) ON CONFLICT ("key") DO UPDATE\
+         SET "object" = {patched}'
+        column = self.codec.column_sql('"object"')
+        GET_ITEM = f'SELECT {column} FROM "{self.name}" WHERE "key" = ?'
+        SET_ITEM = f'UPDATE "{self.name}"\
+         SET "object" = {bind} WHERE "key" = ?'
+        ADD_ITEM = f'INSERT INTO "{self.name}"\
+         ("object", "key") VALUES ({bind}, ?)'
+
+        bloom = self.__conn.blooms.get(self.name)
+
+        def apply():
+            for key, value in dict2.items():
+                if "/" in key:
+                    self.set_path(key, value)
+                    continue
+                if bloom is not None:
+                    bloom.add(key)
+                if not has_none(value):
+                    self.__conn.execute(PATCH_ITEM,
+                                        (key, self.codec.encode(value)))
+                    self.__invalidate(key)
+                else:
+                    item = self.__conn.select_one(GET_ITEM, (key,))
+                    if item is None:
+                        self.__conn.execute(ADD_ITEM,
+                                            (self.codec.encode(value), key))
+                    else:
+                        value = dict_merge(self.codec.decode(item[0]), value)
+                        self.__conn.execute(SET_ITEM,
+                                            (self.codec.encode(value), key))
+                    self.__invalidate(key)
+
+        if self.__conn.autocommit and self.__conn.transaction_depth == 0:
+            with Transaction(self.name, self.__conn):
+                apply()
+            self.commit()
+        else:
+            apply()
 
     def to_sql(self):
         '''
-        Returns the table in SQLite Syntax
+        Returns the table in SQLite Syntax, see `dump`
         '''
-        GET_SQL = f'SELECT sql FROM sqlite_master WHERE "name" = "{self.name}"'
-        CREATE = self.__conn.select_one(GET_SQL)[0]
-        VALUES = ',\n'.join([str((x, self[x])) for x in self])
-        INSERT = f'INSERT INTO "{self.name}" VALUES\n' + VALUES
-        return f'{CREATE};\n{INSERT};'
+        out = io.StringIO()
+        self.dump(out)
+        return out.getvalue()
+
+    def dump(self, fp, batch_rows: int = 500) -> int:
+        '''
+        Stream the storage as SQL to the text file `fp`: its schema,
+        INSERTs of `batch_rows` stored documents and its codec record.
+        Returns the number of documents written.
+        '''
+        extra = []
+        if META_TABLE in [x[0] for x in self.__conn.select(
+                'SELECT name FROM sqlite_master WHERE name = ?',
+                (META_TABLE,))]:
+            GET_META = f'SELECT * FROM "{META_TABLE}" WHERE "name" = ?'
+            meta = self.__conn.select_one(GET_META,
+                                          (self.name.replace('""', '"'),))
+            if meta is not None:
+                GET_SQL = 'SELECT sql FROM sqlite_master WHERE name = ?'
+                MAKE_META = self.__conn.select_one(GET_SQL, (META_TABLE,))[0]
+                values = ', '.join([_sql_literal(x) for x in meta])
+                extra = [
+                    MAKE_META.replace('CREATE TABLE',
+                                      'CREATE TABLE IF NOT EXISTS', 1),
+                    f'REPLACE INTO "{META_TABLE}" VALUES ({values})',
+                ]
+        return _dump_sql(self.__conn, self.name, fp, batch_rows,
+                         self.__rowid, extra)
+
+    def load(self, fp, batch_statements: int = 100) -> int:
+        '''
+        Run a `dump` of this storage read from `fp`, `batch_statements`
+        statements per transaction. Returns the number of rows written.
+
+        Documents are restored as stored, this handle must use the codec
+        of the dump. The dump is executed as is, only load trusted files.
+        '''
+        if self.flag == 'r':
+            raise RuntimeError('Refusing to write in read-only mode')
+        count = _load_sql(self.__conn, self.name, fp, batch_statements)
+        self.__invalidate()
+        bloom = self.__conn.blooms.get(self.name)
+        if bloom is not None:
+            bloom.rebuild()
+        return count
 
 
 class TableView(UserDict):
@@ -1092,6 +3216,68 @@ class TableView(UserDict):
         for x in self.__conn.select(GET_KEYS):
             yield x[0]
 
+    def page(self, limit: Optional[int], cursor: Optional[str] = None,
+             order_by: Optional[List[str]] = None):
+        """
+        One page of rows using keyset pagination on `order_by`.
+
+        Views have no rowid, rows are ordered by `order_by` (all columns
+        by default) and the cursor holds the values of the last row, so
+        `order_by` should identify a row uniquely. NULLs sort first, as
+        in SQLite, and BLOBs are kept base64 encoded in the cursor.
+
+        Args:
+            limit (int): Page size, None for everything after `cursor`.
+            cursor (str): Token returned with the previous page.
+            order_by (list[str]): Columns to order and page by.
+
+        Returns:
+            tuple: (rows, next cursor or None on the last page).
+        """
+        cols = self.columns
+        order_by = list(order_by or cols)
+        for col in order_by:
+            if col not in cols:
+                raise KeyError(f'Unknown column: {col}')
+        keys = ', '.join(['"' + x.replace('"', '""') + '"'
+                          for x in order_by])
+        cond, args = '1', ()
+        if cursor is not None:
+            cond, args = self.__after_sql(
+                order_by, _decode_cursor(cursor, order_by)
+            )
+        GET_PAGE = f'SELECT {keys}, * FROM "{self.name}" WHERE {cond}\
+         ORDER BY {keys}'
+        if limit is not None:
+            # One extra row tells whether there is a next page
+            GET_PAGE += ' LIMIT ?'
+            args += (limit + 1,)
+        rows = list(self.__conn.select(GET_PAGE, args))
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(order_by,
+                                         list(rows[-1][:len(order_by)]))
+        return [x[len(order_by):] for x in rows], next_cursor
+
+    @staticmethod
+    def __after_sql(order_by, last):
+        '''
+        Condition matching the rows after `last` in `ORDER BY order_by`.
+
+        A row value comparison drops every row with a NULL in `order_by`,
+        so it is expanded column by column with NULL sorting first.
+        '''
+        terms, args = [], []
+        for i, (col, value) in enumerate(zip(order_by, last)):
+            ref = '"' + col.replace('"', '""') + '"'
+            same = [('"' + x.replace('"', '""') + '" IS ?')
+                    for x in order_by[:i]]
+            after = f'{ref} IS NOT NULL' if value is None else f'{ref} > ?'
+            terms.append('(' + ' AND '.join(same + [after]) + ')')
+            args += list(last[:i]) + ([] if value is None else [value])
+        return ' OR '.join(terms), tuple(args)
+
     def __iter__(self):
         return self.keys()
 
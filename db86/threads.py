@@ -214,6 +214,7 @@ from threading import Thread
 from queue import Queue
 import traceback
 import sys
+import re
 
 
 def reraise(tp, value, tb=None):
@@ -224,6 +225,15 @@ def reraise(tp, value, tb=None):
     raise value
 
 
+def regexp(pattern, value):
+    """
+    SQL `REGEXP` operator, `re.search` on the string form of `value`.
+    """
+    if value is None:
+        return 0
+    return re.search(pattern, str(value)) is not None
+
+
 class SqliteMultiThread(Thread):
     """
     Wrap sqlite connection in a way that allows concurrent requests from
@@ -246,6 +256,17 @@ class SqliteMultiThread(Thread):
         self._sqlitedict_thread_initialized = None
         self.timeout = timeout
         self.transaction_depth = 0
+        # storage name -> DocumentCache, shared by all handles on this
+        # connection
+        self.caches = {}
+        # storage name -> KeyFilter, shared the same way
+        self.blooms = {}
+        # storage name -> number of writes through storage handles, and
+        # the QueryCache validated against it
+        self.writes = {}
+        self.query_cache = None
+        # names of SQL functions registered through create_function
+        self.functions = set()
         self.log = logging.getLogger('db86.SqliteMultithread')
         self.start()
 
@@ -272,6 +293,7 @@ class SqliteMultiThread(Thread):
         try:
             conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
             conn.text_factory = str
+            conn.create_function('REGEXP', 2, regexp, deterministic=True)
             cursor = conn.cursor()
             conn.commit()
             cursor.execute('PRAGMA synchronous=OFF')
@@ -292,9 +314,26 @@ class SqliteMultiThread(Thread):
                 conn.commit()
                 if res:
                     res.put('--no more--')
+            elif req == '--function--':
+                conn.create_function(*arg[:3], deterministic=arg[3])
+                if res:
+                    res.put('--no more--')
             else:
                 try:
-                    cursor.execute(req, arg)
+                    if req == '--many--':
+                        cursor.executemany(*arg)
+                    elif req == '--rowcount--':
+                        cursor.execute(*arg)
+                    elif req == '--script--':
+                        try:
+                            cursor.executescript(arg[0])
+                        except Exception:
+                            # Do not leave the script's BEGIN open
+                            if conn.in_transaction:
+                                conn.rollback()
+                            raise
+                    else:
+                        cursor.execute(req, arg)
                 except Exception:
                     self.exception = (e_type, e_value, e_tb) = sys.exc_info()
                     inner_stack = traceback.extract_stack()
@@ -323,8 +362,11 @@ class SqliteMultiThread(Thread):
                     self.log.error('Exception will be re-raised at next call.')
 
                 if res:
-                    for rec in cursor:
-                        res.put(rec)
+                    if req in ('--rowcount--', '--many--'):
+                        res.put((cursor.rowcount,))
+                    else:
+                        for rec in cursor:
+                            res.put(rec)
                     res.put('--no more--')
 
                 if self.autocommit and self.transaction_depth == 0:
@@ -376,11 +418,31 @@ class SqliteMultiThread(Thread):
         stack = traceback.extract_stack()[:-1]
         self.reqs.put((req, arg or tuple(), res, stack))
 
-    def executemany(self, req, items):
-        for item in items:
-            self.execute(req, item)
+    def executemany(self, req, items, res=None):
+        """
+        Queue `items` as a single `executemany`, non-blocking unless waiting
+        on `res`, which then receives the number of rows changed as a
+        one-item tuple.
+        """
+        self.execute('--many--', (req, list(items)), res)
         self.check_raise_error()
 
+    def executescript(self, script):
+        """
+        Run the SQL statements of `script` back to back, blocking. No other
+        request runs in between, and a transaction the script opened is
+        rolled back if it fails.
+        """
+        self.select_one('--script--', (script,))
+
+    def execute_count(self, req, arg=None):
+        """
+        Run one INSERT, UPDATE or DELETE, blocking, and return the number of
+        rows it changed. The count is read by the writer thread right after
+        the statement, so requests queued by other threads cannot skew it.
+        """
+        return self.select_one('--rowcount--', (req, arg or tuple()))[0]
+
     def select(self, req, arg=None):
         """
         Unlike sqlite's native select, this select doesn't handle iteration efficiently.
@@ -416,6 +478,15 @@ class SqliteMultiThread(Thread):
             # otherwise, we fire and forget as usual.
             self.execute('--commit--')
 
+    def create_function(self, name, narg, func, deterministic=True):
+        """
+        Register a Python SQL function on the connection, blocking.
+        """
+        if name in self.functions:
+            return
+        self.select_one('--function--', (name, narg, func, deterministic))
+        self.functions.add(name)
+
     def close(self, force=False):
         if force:
             # If a SqliteDict is being killed or garbage-collected, then select_one()
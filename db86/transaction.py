@@ -17,7 +17,9 @@ class Transaction:
     def commit(self):
         if not self.active:
             raise RuntimeError("No active transaction")
-        self.conn.execute("COMMIT;")
+        # Block until COMMIT ran, the writer thread reads the depth to
+        # decide whether to autocommit and must not see it reset early
+        self.conn.select_one("COMMIT;")
         self.conn.transaction_depth = 0
         self.active = False
     
@@ -27,12 +29,21 @@ class Transaction:
         self.conn.execute(f'SAVEPOINT "{sp_name}";')
 
     def rollback(self):
-        self.conn.execute(f'ROLLBACK;')
+        self.conn.select_one('ROLLBACK;')
         self.conn.transaction_depth = 0
+        # Cached documents may have been read inside the transaction
+        for cache in self.conn.caches.values():
+            cache.clear()
+        if self.conn.query_cache is not None:
+            self.conn.query_cache.clear()
         self.active = False
     
     def rollback_to(self, to: str):
         self.conn.execute(f'ROLLBACK TO SAVEPOINT "{to}";')
+        for cache in self.conn.caches.values():
+            cache.clear()
+        if self.conn.query_cache is not None:
+            self.conn.query_cache.clear()
         self.conn.transaction_depth = max(0, self.conn.transaction_depth - 1)
 
     def release(self, from_: str = ""):
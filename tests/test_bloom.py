@@ -0,0 +1,111 @@
+from typing import Generator
+import pytest
+from db86 import Database
+
+
+@pytest.fixture
+def mem_db() -> Generator[Database, None, None]:
+    """In-memory xdbx Database, closed after each test."""
+    db = Database(":memory:", autocommit=True, journal_mode="WAL")
+    yield db
+    db.close(do_log=False, force=True)
+
+
+@pytest.mark.unit
+class TestKeyFilter:
+    """Bloom filter membership checks, maintenance and counters."""
+
+    def test_stats_none_when_disabled(self, mem_db):
+        assert mem_db["plain", "json"].bloom_stats is None
+        assert mem_db["plain_tab"].bloom_stats is None
+
+    def test_missing_keys_answered_by_filter(self, mem_db):
+        storage = mem_db["items", "json"]
+        for i in range(100):
+            storage[f"k{i}"] = {"v": i}
+        storage.enable_bloom()
+        assert all(f"k{i}" in storage for i in range(100))
+        misses = sum([f"x{i}" in storage for i in range(1000)])
+        assert misses == 0
+        stats = storage.bloom_stats
+        assert stats["lookups"] == 1100
+        assert stats["negatives"] + stats["false_positives"] == 1000
+        assert stats["negatives"] > 950
+        assert stats["entries"] == 100
+
+    def test_writes_update_filter(self, mem_db):
+        storage = mem_db["items", "json"]
+        storage.enable_bloom()
+        storage["a"] = {"v": 1}
+        storage.merge({"b": {"v": 2}, "c": {"v": None}})
+        assert "a" in storage and "b" in storage and "c" in storage
+        # Other handles share the filter through the connection
+        assert "a" in mem_db["items", "json"]
+        assert mem_db["items", "json"].bloom_stats["entries"] == 3
+
+    def test_deleted_keys_counted_as_false_positives(self, mem_db):
+        storage = mem_db["items", "json"]
+        storage["a"] = {"v": 1}
+        storage.enable_bloom()
+        del storage["a"]
+        assert "a" not in storage
+        assert storage.bloom_stats["false_positives"] == 1
+
+    def test_table_keys(self, mem_db):
+        table = mem_db["tab", "table"]
+        table["a"] = ("x",)
+        table.enable_bloom()
+        table["b"] = {"col1": "y"}
+        assert "a" in table and "b" in table and "c" not in table
+        # Inserting "b" checked for it too
+        assert table.bloom_stats["negatives"] == 2
+        table.update_where({"path": "key", "value": "a"}, {"key": "z"})
+        assert "z" in table and "a" not in table
+        table.rename_column("key", "id")
+        assert "z" in table
+        table["n"] = ("w",)
+        assert "n" in table
+
+    def test_int_keys_match_text_column(self, mem_db):
+        storage = mem_db["items", "json"]
+        storage["1"] = {"v": 1}
+        storage.enable_bloom()
+        assert 1 in storage and "1" in storage
+        assert 2 not in storage
+
+    def test_numeric_column_bypasses_str_keys(self, mem_db):
+        table = mem_db.storage("nums", "table", primary_key_dtype="INTEGER")
+        table[5] = ("x",)
+        table.enable_bloom()
+        assert 5 in table and "5" in table and 5.0 in table
+        assert 6 not in table
+        assert table.bloom_stats["lookups"] == 2
+
+    def test_grows_past_capacity(self, mem_db):
+        storage = mem_db["items", "json"]
+        bloom = storage.enable_bloom(capacity=16)
+        for i in range(40):
+            storage[f"k{i}"] = {"v": i}
+        assert bloom.capacity >= 40
+        assert bloom.rebuilds > 1
+        assert all(f"k{i}" in storage for i in range(40))
+
+    def test_other_connection_seen_with_check_interval(self, tmp_path):
+        filename = str(tmp_path / "shared.db")
+        db1 = Database(filename, autocommit=True, journal_mode="WAL")
+        db2 = Database(filename, autocommit=True, journal_mode="WAL")
+        try:
+            storage = db1["items", "json"]
+            storage.enable_bloom(check_interval=0)
+            assert "k" not in storage
+            db2["items", "json"]["k"] = {"v": 2}
+            assert "k" in storage
+            assert storage.bloom_stats["rebuilds"] == 2
+        finally:
+            db2.close(do_log=False)
+            db1.close(do_log=False)
+
+    def test_dropped_with_storage(self, mem_db):
+        mem_db["items", "json"].enable_bloom()
+        del mem_db["items"]
+        assert mem_db["items", "json"].bloom_stats is None
@@ -0,0 +1,179 @@
+from typing import Generator
+import pytest
+from db86 import Database
+from db86.storages import JSONStorage
+
+
+@pytest.fixture
+def mem_db() -> Generator[Database, None, None]:
+    """In-memory xdbx Database, closed after each test."""
+    db = Database(":memory:", autocommit=True, journal_mode="WAL")
+    yield db
+    db.close(do_log=False, force=True)
+
+
+@pytest.fixture
+def cached(mem_db: Database) -> JSONStorage:
+    """JSONStorage with a two-entry document cache."""
+    storage = mem_db["items", "json"]
+    storage.enable_cache(max_entries=2)
+    return storage
+
+
+@pytest.mark.unit
+class TestDocumentCache:
+    """LRU document cache, invalidation and counters."""
+
+    def test_stats_none_when_disabled(self, mem_db):
+        assert mem_db["plain", "json"].cache_stats is None
+
+    def test_repeated_read_hits(self, cached):
+        cached["k"] = {"v": 1}
+        assert cached["k"] == {"v": 1}
+        assert cached["k"] == {"v": 1}
+        stats = cached.cache_stats
+        assert stats["hits"] == 1 and stats["misses"] == 1
+
+    def test_cache_shared_between_handles(self, mem_db, cached):
+        cached["k"] = {"v": 1}
+        _ = cached["k"]
+        mem_db["items", "json"]["k"] = {"v": 2}
+        assert cached["k"] == {"v": 2}
+
+    def test_returned_documents_are_copies(self, cached):
+        cached["k"] = {"v": [1]}
+        cached["k"]["v"].append(2)
+        assert cached["k"] == {"v": [1]}
+
+    def test_lru_eviction(self, cached):
+        for key in ("a", "b", "c"):
+            cached[key] = {"v": key}
+            _ = cached[key]
+        stats = cached.cache_stats
+        assert stats["entries"] == 2 and stats["evictions"] == 1
+
+    def test_path_mutators_invalidate(self, cached):
+        cached["k"] = {"v": 1, "l": []}
+        _ = cached["k"]
+        cached._set_path("k", "v", 2)
+        cached.add_path("k", "l", 3)
+        assert cached["k"] == {"v": 2, "l": [3]}
+        cached.del_path("k", "v")
+        assert cached["k"] == {"l": [3]}
+        del cached["k"]
+        with pytest.raises(KeyError):
+            _ = cached["k"]
+
+    def test_other_connection_detected_by_data_version(self, tmp_path):
+        filename = str(tmp_path / "shared.db")
+        db1 = Database(filename, autocommit=True, journal_mode="WAL")
+        db2 = Database(filename, autocommit=True, journal_mode="WAL")
+        try:
+            storage = db1["items", "json"]
+            storage.enable_cache(check_interval=0)
+            storage["k"] = {"v": 1}
+            _ = storage["k"]
+            db2["items", "json"]["k"] = {"v": 2}
+            assert storage["k"] == {"v": 2}
+        finally:
+            db2.close(do_log=False)
+            db1.close(do_log=False)
+
+    def test_other_connection_seen_after_check_interval(self, tmp_path):
+        filename = str(tmp_path / "shared.db")
+        db1 = Database(filename, autocommit=True, journal_mode="WAL")
+        db2 = Database(filename, autocommit=True, journal_mode="WAL")
+        try:
+            storage = db1["items", "json"]
+            cache = storage.enable_cache(check_interval=60)
+            storage["k"] = {"v": 1}
+            _ = storage["k"]
+            db2["items", "json"]["k"] = {"v": 2}
+            assert storage["k"] == {"v": 1}
+            cache.check_interval = 0
+            assert storage["k"] == {"v": 2}
+        finally:
+            db2.close(do_log=False)
+            db1.close(do_log=False)
+
+
+GROUP_AVG = {
+    "aggregate": {"op": "group_by", "by": "dept",
+                  "field": "salary", "sub_op": "avg"},
+}
+
+
+@pytest.fixture
+def staff(mem_db: Database) -> JSONStorage:
+    """Storage of three employees with the query cache enabled."""
+    mem_db.enable_query_cache(max_entries=2)
+    storage = mem_db["staff", "json"]
+    storage["a"] = {"dept": "eng", "salary": 10}
+    storage["b"] = {"dept": "eng", "salary": 20}
+    storage["c"] = {"dept": "ops", "salary": 5}
+    return storage
+
+
+@pytest.mark.unit
+class TestQueryCache:
+    """Query result reuse, invalidation by writes and counters."""
+
+    def test_stats_none_when_disabled(self, mem_db):
+        assert mem_db.query_cache_stats is None
+
+    def test_identical_query_hits(self, mem_db, staff):
+        assert staff.query(GROUP_AVG) == {"eng": 15, "ops": 5}
+        # Key order in the recipe does not matter
+        recipe = {"aggregate": dict(reversed(GROUP_AVG["aggregate"].items()))}
+        assert mem_db["staff", "json"].query(recipe) == {"eng": 15, "ops": 5}
+        stats = mem_db.query_cache_stats
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    def test_results_are_copies(self, staff):
+        staff.query({})["a"]["salary"] = 0
+        assert staff.query({})["a"]["salary"] == 10
+
+    def test_writes_invalidate(self, mem_db, staff):
+        assert staff.query(GROUP_AVG)["ops"] == 5
+        staff.set_path("c/salary", 7)
+        assert staff.query(GROUP_AVG)["ops"] == 7
+        staff.merge({"d": {"dept": "ops", "salary": 9}})
+        assert staff.query(GROUP_AVG)["ops"] == 8
+        assert mem_db.query_cache_stats["invalidations"] == 2
+
+    def test_other_storage_writes_keep_results(self, mem_db, staff):
+        staff.query(GROUP_AVG)
+        mem_db["other", "json"]["x"] = {"v": 1}
+        staff.query(GROUP_AVG)
+        assert mem_db.query_cache_stats["hits"] == 1
+
+    def test_lru_eviction(self, mem_db, staff):
+        for n in (1, 2, 3):
+            staff.query({"limit": n})
+        assert mem_db.query_cache_stats["evictions"] == 1
+        staff.query({"limit": 1})
+        assert mem_db.query_cache_stats["hits"] == 0
+
+    def test_rollback_clears(self, mem_db, staff):
+        from db86.transaction import Transaction
+        tx = Transaction("staff", mem_db.conn)
+        tx.begin()
+        staff["c"] = {"dept": "ops", "salary": 50}
+        assert staff.query(GROUP_AVG)["ops"] == 50
+        tx.rollback()
+        assert staff.query(GROUP_AVG)["ops"] == 5
+
+    def test_other_connection_detected_by_data_version(self, tmp_path):
+        filename = str(tmp_path / "shared.db")
+        db1 = Database(filename, autocommit=True, journal_mode="WAL")
+        db2 = Database(filename, autocommit=True, journal_mode="WAL")
+        try:
+            db1.enable_query_cache()
+            storage = db1["items", "json"]
+            storage["k"] = {"v": 1}
+            assert storage.query({"aggregate": {"op": "count"}}) == 1
+            db2["items", "json"]["j"] = {"v": 2}
+            assert storage.query({"aggregate": {"op": "count"}}) == 2
+        finally:
+            db2.close(do_log=False)
+            db1.close(do_log=False)
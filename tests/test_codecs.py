@@ -0,0 +1,174 @@
+import json
+import sqlite3
+import zlib
+from typing import Generator
+import pytest
+from db86 import Database
+from db86.codecs import (Codec, CompressedCodec, JSONCodec, get_codec,
+                         register_codec, train_dictionary)
+
+
+class ZlibJSONCodec(Codec):
+    """Non-native codec, stored as compressed BLOBs."""
+    name = 'test_zjson'
+
+    def encode(self, value):
+        return zlib.compress(json.dumps(value).encode())
+
+    def decode(self, data):
+        return json.loads(zlib.decompress(data))
+
+
+register_codec(ZlibJSONCodec())
+register_codec(JSONCodec(dumps=lambda v: json.dumps(v).encode(),
+                         name='test_bytes_json'))
+
+
+@pytest.fixture
+def mem_db() -> Generator[Database, None, None]:
+    """In-memory xdbx Database, closed after each test."""
+    db = Database(":memory:", autocommit=True, journal_mode="WAL")
+    yield db
+    db.close(do_log=False, force=True)
+
+
+@pytest.mark.unit
+class TestCodecs:
+    """Codec selection, metadata and SQL pushdowns on encoded documents."""
+
+    def test_default_codec_is_json(self, mem_db):
+        storage = mem_db["items", "json"]
+        assert storage.codec.name == "json"
+        assert "_db86_meta" not in mem_db
+
+    def test_codec_recorded_for_new_handles(self, mem_db):
+        mem_db.storage("items", codec="test_zjson")["k"] = {"v": 1}
+        storage = mem_db["items", "json"]
+        assert storage.codec.name == "test_zjson"
+        assert storage["k"] == {"v": 1}
+        assert mem_db.storages == ["items"]
+        assert len(mem_db) == 1
+
+    def test_codec_mismatch_raises(self, mem_db):
+        mem_db.storage("items", codec="test_zjson")
+        with pytest.raises(ValueError):
+            mem_db.storage("items", codec="json")
+
+    def test_unknown_codec_raises(self, mem_db):
+        with pytest.raises(KeyError):
+            mem_db.storage("items", codec="nope")
+
+    def test_invalid_codec_name_raises(self):
+        codec = JSONCodec(name="bad-name")
+        with pytest.raises(ValueError):
+            register_codec(codec)
+
+    @pytest.mark.parametrize("codec", ["test_zjson", "test_bytes_json"])
+    def test_pushdowns_on_encoded_documents(self, mem_db, codec):
+        storage = mem_db.storage("items", codec=codec)
+        storage["a"] = {"x": 1, "l": [1], "d": {"e": 2}}
+        storage["b"] = {"x": 2}
+        storage._set_path("a", "d/f", 3)
+        storage.add_path("a", "l", 2)
+        storage.del_path("a", "x")
+        storage.set_path("*/y", 0)
+        assert storage["a"] == {"l": [1, 2], "d": {"e": 2, "f": 3}, "y": 0}
+        assert storage.get_fields("a", ["d/e", "l"]) == {"d/e": 2, "l": [1, 2]}
+        assert list(storage.get_path("a/d/*")) == [{"a/d/e": 2}, {"a/d/f": 3}]
+        assert storage.update_where(
+            {"path": "x", "op": "eq", "value": 2}, {"z": True}) == 1
+        storage.merge({"b": {"w": 1}})
+        assert storage["b"] == {"x": 2, "y": 0, "z": True, "w": 1}
+        assert storage.delete_where({"path": "z", "op": "exists",
+                                     "value": True}) == 1
+        assert list(storage) == ["a"]
+
+    def test_stored_value_is_encoded(self, mem_db):
+        storage = mem_db.storage("items", codec="test_zjson")
+        storage["k"] = {"v": 1}
+        item = mem_db.conn.select_one('SELECT typeof("object") FROM "items"')
+        assert item[0] == "blob"
+
+    def test_drop_removes_record(self, mem_db):
+        mem_db.storage("items", codec="test_zjson")
+        del mem_db["items"]
+        assert mem_db["items", "json"].codec.name == "json"
+
+    @pytest.mark.skipif(sqlite3.sqlite_version_info >= (3, 45, 0),
+                        reason="JSONB available")
+    def test_jsonb_requires_sqlite_345(self):
+        with pytest.raises(RuntimeError):
+            get_codec("jsonb")
+
+
+def _document(i, padding):
+    return {"name": f"user{i}", "city": "NYC", "notes": "x" * padding}
+
+
+@pytest.mark.unit
+class TestCompression:
+    """Compressed storages, per-row flags and recorded settings."""
+
+    @pytest.mark.parametrize("method", ["zlib", "lzma"])
+    def test_round_trip(self, mem_db, method):
+        storage = mem_db.storage("items", compression=method, threshold=256)
+        docs = {str(i): _document(i, i * 100) for i in range(6)}
+        for key, value in docs.items():
+            storage[key] = value
+        assert storage.to_dict() == docs
+
+    def test_small_documents_stay_uncompressed(self, mem_db):
+        storage = mem_db.storage("items", compression="zlib", threshold=256)
+        storage["small"] = _document(0, 0)
+        storage["large"] = _document(1, 5000)
+        GET_TYPES = 'SELECT "key", typeof("object"), length("object")\
+         FROM "items" ORDER BY rowid'
+        rows = list(mem_db.conn.select(GET_TYPES))
+        assert rows[0][:2] == ("small", "text")
+        assert rows[1][:2] == ("large", "blob") and rows[1][2] < 500
+
+    def test_settings_recorded_for_new_handles(self, mem_db):
+        mem_db.storage("items", compression="zlib", threshold=10)
+        storage = mem_db["items", "json"]
+        assert storage.codec.method == "zlib"
+        assert storage.codec.threshold == 10
+        with pytest.raises(ValueError):
+            mem_db.storage("items", compression="lzma")
+
+    def test_pushdowns_on_compressed_documents(self, mem_db):
+        storage = mem_db.storage("items", compression="zlib", threshold=64)
+        storage["a"] = _document(0, 500)
+        storage["b"] = _document(1, 0)
+        assert storage.get_fields("a", ["city"]) == {"city": "NYC"}
+        assert storage.update_where(
+            {"path": "city", "op": "eq", "value": "NYC"},
+            {"notes": "y" * 1000}) == 2
+        storage.merge({"b": {"zip": "10001"}})
+        storage._set_path("a", "zip", "10002")
+        assert storage["a"]["notes"] == "y" * 1000
+        assert storage["b"]["zip"] == "10001"
+        assert list(storage.get_path("*/zip")) == [
+            {"a/zip": "10002"}, {"b/zip": "10001"}
+        ]
+
+    def test_raw_reads_return_json_text(self, mem_db):
+        storage = mem_db.storage("items", compression="zlib", threshold=64)
+        storage["a"] = _document(0, 500)
+        storage["b"] = _document(1, 0)
+        assert json.loads(storage.get_raw("a")) == _document(0, 500)
+        assert json.loads(storage.to_json()) == storage.to_dict()
+
+    def test_trained_dictionary(self, mem_db):
+        docs = [_document(i, 0) for i in range(20)]
+        dictionary = train_dictionary(docs)
+        assert b'"city"' in dictionary
+        storage = mem_db.storage("items", compression="zlib", threshold=10,
+                                 dictionary=dictionary)
+        storage["k"] = docs[0]
+        assert mem_db["items", "json"]["k"] == docs[0]
+
+    def test_invalid_settings_raise(self):
+        with pytest.raises(ValueError):
+            CompressedCodec(get_codec("json"), "snappy")
+        with pytest.raises(ValueError):
+            CompressedCodec(get_codec("json"), "lzma", dictionary=b"x")
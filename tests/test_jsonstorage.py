@@ -1,6 +1,6 @@
 from typing import Generator
 import pytest
-from db86 import Database
+from db86 import Database, Transaction
 from db86.storages import JSONStorage
 import json
 
@@ -120,7 +120,44 @@ class TestJSONStorage:
         result = json_storage.get_path("*/k")
         assert isinstance(result, types.GeneratorType)
  
+    def test_get_path_nested_wildcards(self, json_storage):
+        json_storage["t1"] = {"members": [{"name": "a"}, {"name": "b"}]}
+        json_storage["t2"] = {"members": []}
+        json_storage["t3"] = {"members": "none"}
+        results = list(json_storage.get_path("*/members/*/name"))
+        assert results == [{"t1/members/0/name": "a"},
+                           {"t1/members/1/name": "b"},
+                           {"t3/members": "none"}]
+
+    def test_get_path_missing_key_yields_default(self, json_storage):
+        results = list(json_storage.get_path("nobody/a/*/b", default=0))
+        assert results == [{"nobody/a": 0}]
+
     # ── serialisation helpers ─────────────────────────────────────────────────
+
+    def test_dump_writes_sql_literals(self, json_storage):
+        import io
+        json_storage["it's"] = {"s": "a'b"}
+        out = io.StringIO()
+        assert json_storage.dump(out) == 1
+        assert """('it''s', '{"s": "a''b"}')""" in out.getvalue()
+
+    def test_dump_load_keeps_codec(self, mem_db):
+        import io
+        storage = mem_db.storage("zipped", compression="zlib", threshold=16)
+        storage["big"] = {"text": "x" * 100}
+        storage["small"] = {"v": 1}
+        out = io.StringIO()
+        storage.dump(out)
+        restored = Database(":memory:", autocommit=True)
+        try:
+            out.seek(0)
+            restored.load(out)
+            copy = restored["zipped", "json"]
+            assert copy["big"] == {"text": "x" * 100}
+            assert copy.get_raw("small") == '{"v": 1}'
+        finally:
+            restored.close(do_log=False, force=True)
  
     def test_to_dict(self, json_storage):
         json_storage["p"] = {"val": 1}
@@ -134,6 +171,27 @@ class TestJSONStorage:
         parsed = json.loads(payload)
         assert parsed == {"r": {"x": 99}}
  
+    def test_to_json_matches_json_dumps(self, json_storage):
+        json_storage["r"] = {"x": [1, {"y": None}]}
+        json_storage["s"] = {"z": "\u00e9"}
+        assert json_storage.to_json() == json.dumps(json_storage.to_dict())
+
+    def test_get_raw_returns_stored_text(self, json_storage):
+        json_storage["r"] = {"x": 99}
+        assert json_storage.get_raw("r") == '{"x": 99}'
+        with pytest.raises(KeyError):
+            json_storage.get_raw("missing")
+
+    def test_get_raw_many_and_iter_raw(self, json_storage):
+        json_storage["a"] = {"v": 1}
+        json_storage["b"] = {"v": 2}
+        assert json_storage.get_raw_many(["b", "nope", "a"]) == {
+            "b": '{"v": 2}', "a": '{"v": 1}'
+        }
+        assert list(json_storage.iter_raw()) == [
+            ("a", '{"v": 1}'), ("b", '{"v": 2}')
+        ]
+
     def test_to_sql_contains_create_and_insert(self, json_storage):
         json_storage["s"] = {"data": "hello"}
         sql = json_storage.to_sql()
@@ -153,7 +211,31 @@ class TestJSONStorage:
         assert result["nested"]["x"] == 1    # preserved
         assert result["nested"]["y"] == 99   # updated
         assert result["nested"]["z"] == 3    # added
-    
+
+    def test_merge_keeps_none_values(self, json_storage):
+        json_storage["rec"] = {"a": 1, "b": 2}
+        json_storage.merge({"rec": {"b": None}})
+        assert json_storage["rec"] == {"a": 1, "b": None}
+
+    def test_merge_leaves_other_keys_untouched(self, json_storage):
+        json_storage["keep"] = {"v": 1}
+        json_storage["rec"] = {"list": [1, 2]}
+        json_storage.merge({"rec": {"list": [3]}})
+        assert json_storage["rec"] == {"list": [3]}
+        assert json_storage["keep"] == {"v": 1}
+        assert list(json_storage) == ["keep", "rec"]
+
+    def test_merge_non_dict_value_raises(self, json_storage):
+        json_storage["rec"] = {"a": 1}
+        with pytest.raises(TypeError, match="use dict"):
+            json_storage.merge({"new": {"b": 1}, "rec": 5})
+        assert "new" not in json_storage
+
+    def test_merge_path_keys_accept_scalars(self, json_storage):
+        json_storage["k"] = {"a": 1, "b": {"c": 2}}
+        json_storage.merge({"k/a": 5, "k/b/c": [3]})
+        assert json_storage["k"] == {"a": 5, "b": {"c": [3]}}
+
     def test_len_empty_storage_is_zero(self, json_storage):
         assert len(json_storage) == 0
  
@@ -265,4 +347,251 @@ class TestJSONStorage:
             "offset": 1,
         })
         # Sorted names: Alice, Bob, Cara, Dan → offset 1, limit 2 → Bob, Cara
-        assert [r["name"] for r in result.values()] == ["Bob", "Cara"]
\ No newline at end of file
+        assert [r["name"] for r in result.values()] == ["Bob", "Cara"]
+
+    def test_set_path_value_nested(self, json_storage):
+        json_storage["k"] = {"a": {"b": 1}, "c": 2}
+        json_storage._set_path("k", "a/d/e", 5)
+        assert json_storage["k"] == {"a": {"b": 1, "d": {"e": 5}}, "c": 2}
+
+    def test_set_path_value_non_dict_parent_raises(self, json_storage):
+        json_storage["k"] = {"a": 1}
+        with pytest.raises(TypeError, match="a is not a dict"):
+            json_storage._set_path("k", "a/b", 2)
+        assert json_storage["k"] == {"a": 1}
+
+    def test_set_path_value_missing_key_raises(self, json_storage):
+        with pytest.raises(KeyError):
+            json_storage._set_path("nobody", "a", 1)
+
+    def test_del_path_removes_field(self, json_storage):
+        json_storage["k"] = {"a": {"b": 1, "c": 2}}
+        json_storage.del_path("k", "a/b")
+        assert json_storage["k"] == {"a": {"c": 2}}
+
+    def test_del_path_missing_path_raises(self, json_storage):
+        json_storage["k"] = {"a": {}}
+        with pytest.raises(KeyError, match="Path a/b not found"):
+            json_storage.del_path("k", "a/b")
+
+    def test_add_path_appends_to_list_and_sets_others(self, json_storage):
+        json_storage["k"] = {"tags": ["x"], "n": 1}
+        json_storage.add_path("k", "tags", "y")
+        json_storage.add_path("k", "n", 2)
+        json_storage.add_path("k", "new", {"z": True})
+        assert json_storage["k"] == {"tags": ["x", "y"], "n": 2,
+                                     "new": {"z": True}}
+
+    def test_path_mutator_non_blocking(self, json_storage):
+        json_storage["k"] = {"a": 1}
+        json_storage._set_path("k", "a", 2, blocking=False)
+        json_storage._set_path("missing", "a", 2, blocking=False)
+        assert json_storage["k"] == {"a": 2}
+        assert "missing" not in json_storage
+
+    def test_non_blocking_mutators_keep_transaction_open(self, json_storage,
+                                                         mem_db):
+        json_storage["k"] = {"a": 1, "b": 1, "l": []}
+        tx = Transaction("txn", mem_db.conn)
+        tx.begin()
+        json_storage._set_path("k", "a", 2, blocking=False)
+        json_storage.add_path("k", "l", 3, blocking=False)
+        json_storage.del_path("k", "b", blocking=False)
+        tx.rollback()
+        assert json_storage["k"] == {"a": 1, "b": 1, "l": []}
+
+    def test_path_mutators_quoted_keys(self, json_storage):
+        json_storage["k"] = {'say "hi"': {"n": 1}, "x": 0}
+        json_storage._set_path("k", 'say "hi"/n', 2)
+        json_storage.add_path("k", 'a"b', 3)
+        json_storage.add_path("k", 'a"b', 4)
+        json_storage.set_path('k/q"/r', 5)
+        json_storage.del_path("k", "x")
+        assert json_storage["k"] == {
+            'say "hi"': {"n": 2}, 'a"b': 4, 'q"': {"r": 5}
+        }
+        with pytest.raises(KeyError):
+            json_storage.del_path("k", 'no"pe')
+        with pytest.raises(TypeError):
+            json_storage._set_path("k", 'a"b/c', 1)
+
+    def test_set_path_wildcard_all_records(self, json_storage):
+        json_storage["a"] = {"meta": {"v": 1}}
+        json_storage["b"] = {"meta": 7}
+        json_storage.set_path("*/meta/v", 2)
+        assert json_storage["a"] == {"meta": {"v": 2}}
+        assert json_storage["b"] == {"meta": {"v": 2}}
+
+    def test_set_path_through_list_index(self, json_storage):
+        json_storage["t"] = {"members": [{"name": "a"}]}
+        json_storage.set_path("t/members/0/name", "b")
+        assert json_storage["t"] == {"members": [{"name": "b"}]}
+
+    # ── set-based update / delete ───────────────────────────────────────────
+    def test_update_where_sets_paths_on_matches(self, populate_storage):
+        count = populate_storage.update_where(
+            {"path": "dept", "op": "eq", "value": "hr"},
+            {"salary": 0, "meta/archived": True},
+        )
+        assert count == 2
+        assert populate_storage["u3"]["salary"] == 0
+        assert populate_storage["u4"]["meta"] == {"archived": True}
+        assert "meta" not in populate_storage["u1"]
+
+    def test_delete_where_compound_filter(self, populate_storage):
+        count = populate_storage.delete_where({
+            "or": [
+                {"path": "age", "op": "lt", "value": 25},
+                {"path": "name", "op": "startswith", "value": "Al"},
+            ]
+        })
+        assert count == 2
+        assert sorted(populate_storage) == ["u2", "u3"]
+
+    def test_where_matches_query_filter(self, populate_storage):
+        expr = {"not": {"path": "dept", "op": "in", "value": ["eng"]}}
+        expected = set(populate_storage.query({"filter": expr}))
+        populate_storage.delete_where(expr)
+        assert expected.isdisjoint(populate_storage)
+
+    # ── key ranges ──────────────────────────────────────────────────────────
+
+    def test_keys_prefix_and_range(self, json_storage):
+        for key in ("t:10:a", "t:1:b", "t:1:a", "t:2:a", "t;"):
+            json_storage[key] = {"k": key}
+        assert list(json_storage.keys(prefix="t:1:")) == ["t:1:a", "t:1:b"]
+        assert list(json_storage.keys(start="t:1:", stop="t:2")) == \
+            ["t:1:a", "t:1:b"]
+        assert list(json_storage.keys(prefix="t:", reverse=True,
+                                      limit=1)) == ["t:2:a"]
+
+    def test_keys_without_arguments_is_view(self, json_storage):
+        json_storage["b"] = {}
+        json_storage["a"] = {}
+        assert list(json_storage.keys()) == ["b", "a"]
+        assert "a" in json_storage.keys()
+
+    def test_items_range_decodes(self, json_storage):
+        json_storage["x:1"] = {"v": 1}
+        json_storage["y:1"] = {"v": 2}
+        assert list(json_storage.items(prefix="x:")) == [("x:1", {"v": 1})]
+
+    def test_delete_range(self, json_storage):
+        for key in ("x:1", "x:2", "y:1"):
+            json_storage[key] = {}
+        assert json_storage.delete_range(prefix="x:") == 2
+        assert list(json_storage) == ["y:1"]
+
+    def test_delete_range_count_ignores_other_threads(self, json_storage,
+                                                      mem_db):
+        import threading
+        other = mem_db["other", "json"]
+        stop = threading.Event()
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                other[f"k{i}"] = {}
+                i += 1
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(50):
+                json_storage["x:1"] = {}
+                assert json_storage.delete_range(prefix="x:") == 1
+        finally:
+            stop.set()
+            writer.join()
+
+    # ── keyset pages ────────────────────────────────────────────────────────
+
+    def test_page_cursor_walks_all_documents(self, json_storage):
+        for i in range(5):
+            json_storage[f"k{4 - i}"] = {"i": i}
+        seen, cursor = [], None
+        while True:
+            items, cursor = json_storage.page(2, cursor)
+            seen += items
+            if cursor is None:
+                break
+        assert seen == [(f"k{4 - i}", {"i": i}) for i in range(5)]
+
+    def test_page_raw_by_key(self, json_storage):
+        json_storage["b"] = {"v": 2}
+        json_storage["a"] = {"v": 1}
+        assert json_storage.page_raw(1, by="key") == (
+            [("a", '{"v": 1}')], json_storage.page(1, by="key")[1]
+        )
+
+    def test_page_rejects_foreign_cursor(self, json_storage):
+        json_storage["a"] = {}
+        json_storage["b"] = {}
+        _, cursor = json_storage.page(1)
+        with pytest.raises(ValueError):
+            json_storage.page(1, cursor, by="key")
+        with pytest.raises(ValueError):
+            json_storage.page(1, "not a cursor")
+
+    # ── field projection ────────────────────────────────────────────────────
+    def test_get_fields_returns_requested_paths(self, json_storage):
+        json_storage["k"] = {"a": {"b": [1, 2]}, "c": False, "d": None}
+        assert json_storage.get_fields("k", ["a/b", "c", "d", "e"], "x") == {
+            "a/b": [1, 2], "c": False, "d": None, "e": "x"
+        }
+
+    def test_get_fields_missing_key_raises(self, json_storage):
+        with pytest.raises(KeyError):
+            json_storage.get_fields("nobody", ["a"])
+
+    def test_get_fields_many_skips_missing_keys(self, populate_storage):
+        result = populate_storage.get_fields_many(["u3", "zz", "u1"],
+                                                  ["name"])
+        assert result == {"u3": {"name": "Cara"}, "u1": {"name": "Alice"}}
+
+    def test_get_path_value(self, json_storage):
+        json_storage["k"] = {"a": {"b": 1}}
+        assert json_storage.get_path_value("k", "a/b") == 1
+        assert json_storage.get_path_value("k", "a/z", 7) == 7
+        assert json_storage.get_path_value("nobody", "a", 7) == 7
+
+    def test_get_fields_quoted_keys(self, json_storage):
+        json_storage["k"] = {'a"b': {"c": 1}, "d": 2}
+        assert json_storage.get_path_value("k", 'a"b/c') == 1
+        assert json_storage.get_path_value("k", 'a"b/z', 7) == 7
+        assert json_storage.get_fields("k", ['a"b', "d", 'x"']) == {
+            'a"b': {"c": 1}, "d": 2, 'x"': None
+        }
+        assert json_storage.get_fields_many(["k", "nope"], ['a"b/c']) == {
+            "k": {'a"b/c': 1}
+        }
+        with pytest.raises(KeyError):
+            json_storage.get_fields("nope", ['a"b'])
+
+    # ── storage layouts ─────────────────────────────────────────────────────
+
+    def test_without_rowid_storage(self, mem_db):
+        storage = mem_db["docs", "json", {"without_rowid": True,
+                                          "strict": True}]
+        for key in ("z", "x", "y"):
+            storage[key] = {"v": key}
+        assert list(storage) == ["x", "y", "z"]
+        assert len(storage) == 3
+        assert storage["y"] == {"v": "y"}
+        assert [k for k, _ in storage.page(2)[0]] == ["x", "y"]
+        assert [k for k, _ in storage.iter_raw()] == ["x", "y", "z"]
+        reopened = mem_db["docs", "json"]
+        reopened["a"] = {"v": "a"}
+        assert list(reopened)[0] == "a"
+        sql = mem_db.conn.select_one(
+            "SELECT sql FROM sqlite_master WHERE name = 'docs'")[0]
+        assert "STRICT" in sql and "WITHOUT ROWID" in sql
+
+    def test_strict_binary_codec(self, mem_db):
+        storage = mem_db.storage("packed", compression="zlib", strict=True)
+        storage["k"] = {"v": "x" * 5000}
+        storage["small"] = {"v": 1}
+        storage.set_path("small/w", 2)
+        storage.merge({"small": {"x": 3}})
+        assert storage["k"] == {"v": "x" * 5000}
+        assert storage["small"] == {"v": 1, "w": 2, "x": 3}
@@ -0,0 +1,84 @@
+from typing import Generator
+import pytest
+from db86 import Database
+from db86.lazy import LazyDocument
+
+DOC = {"status": "ok", "active": True, "meta": {"n": 1}, "tags": [1, 2]}
+
+
+@pytest.fixture
+def mem_db() -> Generator[Database, None, None]:
+    """In-memory xdbx Database, closed after each test."""
+    db = Database(":memory:", autocommit=True, journal_mode="WAL")
+    yield db
+    db.close(do_log=False, force=True)
+
+
+@pytest.mark.unit
+class TestLazyDocument:
+    """Lazy reads in decode and field modes."""
+
+    @pytest.mark.parametrize("mode", [True, "fields"])
+    def test_reads_match_document(self, mem_db, mode):
+        storage = mem_db.storage("items", lazy=mode)
+        storage["k"] = DOC
+        doc = storage["k"]
+        assert isinstance(doc, LazyDocument)
+        assert doc["status"] == "ok" and doc["active"] is True
+        assert doc.get("missing", 0) == 0
+        assert doc == DOC
+        assert doc.to_dict() == DOC
+
+    def test_decode_mode_defers_decoding(self, mem_db):
+        storage = mem_db.storage("items", lazy=True)
+        storage["k"] = DOC
+        doc = storage["k"]
+        assert not doc.loaded
+        _ = doc["status"]
+        assert doc.loaded
+
+    def test_fields_mode_fetches_few_fields(self, mem_db):
+        storage = mem_db.storage("items", lazy="fields")
+        storage["k"] = DOC
+        doc = storage["k"]
+        assert doc["meta"] == {"n": 1}
+        assert not doc.loaded
+        for field in ("status", "active", "tags", "meta"):
+            _ = doc[field]
+        assert not doc.loaded
+        assert len(doc) == 4 and doc.loaded
+
+    def test_missing_key_raises(self, mem_db):
+        storage = mem_db.storage("items", lazy="fields")
+        with pytest.raises(KeyError):
+            _ = storage["nope"]
+
+    def test_read_only(self, mem_db):
+        storage = mem_db.storage("items", lazy=True)
+        storage["k"] = DOC
+        with pytest.raises(TypeError):
+            storage["k"]["status"] = "bad"
+
+    def test_invalid_mode_raises(self, mem_db):
+        with pytest.raises(ValueError):
+            mem_db.storage("items", lazy="eager")
+
+    @pytest.mark.parametrize("mode", [True, "fields"])
+    def test_writes_see_whole_document(self, mem_db, mode):
+        storage = mem_db.storage("items", lazy=mode)
+        storage["k"] = {"list": [{"x": 0}], "keep": 1}
+        storage.set_path("k/list/0/x", 5)
+        storage.merge({"k/meta": {"n": 2}})
+        assert storage["k"].to_dict() == {
+            "list": [{"x": 5}], "keep": 1, "meta": {"n": 2}
+        }
+        assert type(storage.to_dict()["k"]) is dict
+
+    @pytest.mark.parametrize("mode", [True, "fields"])
+    def test_filtered_query(self, mem_db, mode):
+        storage = mem_db.storage("items", lazy=mode)
+        storage["a"] = {"meta": {"n": 1}}
+        storage["b"] = {"meta": {"n": 2}}
+        result = storage.query({"filter": {"path": "meta/n", "op": "gt",
+                                           "value": 1}})
+        assert result == {"b": {"meta": {"n": 2}}}
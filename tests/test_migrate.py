@@ -0,0 +1,148 @@
+from typing import Generator
+import sqlite3
+import pytest
+from db86 import Database, Transaction
+from db86.migrate import Migration
+from db86.storages import Table
+
+
+@pytest.fixture
+def mem_db() -> Generator[Database, None, None]:
+    """In-memory xdbx Database, closed after each test."""
+    db = Database(":memory:", autocommit=True, journal_mode="WAL")
+    yield db
+    db.close(do_log=False, force=True)
+
+
+@pytest.fixture
+def orders(mem_db: Database) -> Table:
+    """Table of 100 orders: key, price, qty, note (UNIQUE)."""
+    mem_db.conn.execute(
+        'CREATE TABLE "orders" ("key" TEXT PRIMARY KEY, "price" REAL,'
+        ' "qty" INTEGER, "note" TEXT UNIQUE)'
+    )
+    table = mem_db["orders", "table"]
+    table.insert_many([(f"k{i:03}", float(i), 2, f"n{i}")
+                       for i in range(100)])
+    return table
+
+
+def table_sql(db: Database, name: str) -> str:
+    GET_SQL = "SELECT sql FROM sqlite_master WHERE name = ?"
+    return db.conn.select_one(GET_SQL, (name,))[0]
+
+
+def triggers(db: Database) -> list:
+    GET_TRIGGERS = "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    return list(db.conn.select(GET_TRIGGERS))
+
+
+@pytest.mark.unit
+class TestMigration:
+    """Chunked backfills and online table rebuilds."""
+
+    # ── backfill ─────────────────────────────────────────────────────────────
+
+    def test_add_column_without_backfill(self, orders):
+        assert orders.add_column("extra") is None
+        assert orders["k001"][-1] is None
+
+    def test_sql_backfill_in_chunks(self, orders):
+        seen = []
+        migration = orders.add_column("total", "REAL",
+                                      backfill='"price" * "qty"',
+                                      chunk_rows=30, progress=seen.append)
+        assert isinstance(migration, Migration)
+        assert migration.state == "done"
+        assert [x["done"] for x in seen] == [30, 60, 90, 100]
+        assert migration.stats["total"] == 100
+        assert migration.stats["chunks"] == 4
+        assert orders["k010"][-1] == 20.0
+
+    def test_callable_backfill(self, orders):
+        orders.add_column("label", backfill=lambda row: row["note"].upper(),
+                          chunk_rows=40)
+        assert orders["k007"][-1] == "N7"
+
+    def test_backfill_error_raises(self, orders):
+        def fail(row):
+            raise RuntimeError("no")
+
+        with pytest.raises(sqlite3.OperationalError):
+            orders.add_column("bad", backfill=fail)
+
+    def test_background_backfill_and_cancel(self, orders):
+        migration = orders.add_column("total", backfill='"qty"',
+                                      chunk_rows=10, pause=0.05, wait=False)
+        migration.cancel()
+        migration.join()
+        assert migration.state == "cancelled"
+        assert migration.stats["done"] < 100
+        migration = orders.add_column("half", backfill='"qty" / 2.0',
+                                      chunk_rows=25, pause=0.001,
+                                      wait=False).join()
+        assert migration.state == "done"
+        assert migration.stats["paused"] == pytest.approx(0.004)
+
+    def test_invalid_chunk_rows(self, orders):
+        with pytest.raises(ValueError):
+            orders.add_column("x", backfill="1", chunk_rows=0)
+
+    # ── rebuild ──────────────────────────────────────────────────────────────
+
+    def test_drop_column_online(self, mem_db, orders):
+        orders.create_index("qty")
+        migration = orders.drop_column("note", chunk_rows=30)
+        assert migration.state == "done"
+        assert orders.columns == ["key", "price", "qty"]
+        assert len(orders) == 100
+        assert [x["columns"] for x in orders.indexes
+                if x["origin"] == "c"] == [["qty"]]
+        assert mem_db.storages == ["orders"]
+
+    def test_rebuild_keeps_rowids_and_constraints(self, mem_db, orders):
+        rowids = list(mem_db.conn.select('SELECT rowid FROM "orders"'))
+        orders.rebuild(types={"qty": "REAL"}, chunk_rows=30)
+        assert list(mem_db.conn.select('SELECT rowid FROM "orders"')) == \
+            rowids
+        sql = table_sql(mem_db, "orders")
+        assert '"qty" REAL' in sql and 'UNIQUE ("note")' in sql
+        assert orders["k003"] == ("k003", 3.0, 2.0, "n3")
+
+    def test_writes_during_copy_reach_new_table(self, orders):
+        def write(stats):
+            if stats["chunks"] == 1:
+                orders["k000"] = (1.0, 1, "changed")
+                del orders["k001"]
+                orders["k099"] = (5.0, 5, "later")
+                orders["new"] = (7.0, 7, "added")
+
+        orders.rebuild(drop=["qty"], chunk_rows=30, progress=write)
+        assert len(orders) == 100
+        assert orders["k000"] == ("k000", 1.0, "changed")
+        assert orders["k099"] == ("k099", 5.0, "later")
+        assert orders["new"] == ("new", 7.0, "added")
+        assert "k001" not in orders
+
+    def test_rebuild_changes_layout(self, mem_db, orders):
+        orders.rebuild(without_rowid=True, strict=True, chunk_rows=40)
+        assert table_sql(mem_db, "orders").endswith("STRICT, WITHOUT ROWID")
+        orders["a"] = (1.0, 1, "first")
+        assert list(orders)[0] == "a"
+
+    def test_failed_rebuild_is_cleaned_up(self, mem_db, orders):
+        orders["bad"] = (1.0, "text", "x")
+        with pytest.raises(sqlite3.IntegrityError):
+            orders.rebuild(strict=True)
+        assert mem_db.storages == ["orders"]
+        assert not triggers(mem_db)
+        assert len(orders) == 101
+
+    def test_rebuild_validation(self, mem_db, orders):
+        with pytest.raises(ValueError):
+            orders.rebuild(drop=["key"])
+        with pytest.raises(KeyError):
+            orders.rebuild(drop=["nope"])
+        with Transaction("txn", mem_db.conn):
+            with pytest.raises(RuntimeError):
+                orders.rebuild()
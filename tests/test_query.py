@@ -0,0 +1,199 @@
+from typing import Generator
+import pytest
+from db86 import Database
+from db86.query import TableQuery
+from db86.storages import Table
+
+
+@pytest.fixture
+def mem_db() -> Generator[Database, None, None]:
+    """In-memory xdbx Database, closed after each test."""
+    db = Database(":memory:", autocommit=True, journal_mode="WAL")
+    yield db
+    db.close(do_log=False, force=True)
+
+
+@pytest.fixture
+def staff(mem_db: Database) -> Table:
+    """Table of five employees: key, dept, score."""
+    mem_db.conn.execute(
+        'CREATE TABLE "staff" '
+        '("key" TEXT PRIMARY KEY, "dept" TEXT, "score" INTEGER)'
+    )
+    table = mem_db["staff", "table"]
+    for key, dept, score in [("ann", "eng", 70), ("bob", "eng", 40),
+                             ("cid", "ops", 90), ("dan", "eng", 85),
+                             ("eve", None, 10)]:
+        table[key] = (dept, score)
+    return table
+
+
+@pytest.fixture
+def shop(mem_db: Database):
+    """Customers and their orders, linked by a declared foreign key."""
+    customers = mem_db["customers", "table"]
+    customers.add_column("city")
+    for key, name, city in [("c1", "Ann", "Oslo"), ("c2", "Bob", "Rome"),
+                            ("c3", "Cid", "Oslo")]:
+        customers[key] = (name, city)
+    orders = mem_db["orders", "table"]
+    orders.add_foreign_key("customer_id", "customers")
+    orders.add_column("total", "REAL")
+    for key, customer, total in [("o1", "c1", 10), ("o2", "c1", 5),
+                                 ("o3", "c2", 7), ("o4", None, 1)]:
+        orders[key] = ("x", customer, total)
+    return orders, customers
+
+
+@pytest.mark.unit
+class TestTableQuery:
+    """Lazy Table queries: composition, execution and counting."""
+
+    def test_where_returns_lazy_query(self, staff):
+        query = staff.where(dept="eng")
+        assert isinstance(query, TableQuery)
+        assert len(list(query)) == 3
+
+    def test_combined_predicates(self, staff):
+        query = staff.where(dept="eng")\
+            .where({"path": "score", "op": "gte", "value": 50})
+        assert sorted([row[0] for row in query]) == ["ann", "dan"]
+
+    def test_select_order_limit(self, staff):
+        query = staff.where().select("key", "score")\
+            .order_by("-score").limit(2)
+        assert list(query) == [("cid", 90), ("dan", 85)]
+        assert list(query.limit(2, offset=2)) == [("ann", 70), ("bob", 40)]
+
+    def test_refining_does_not_change_original(self, staff):
+        query = staff.where(dept="eng")
+        query.where(key="ann").limit(0)
+        assert query.count() == 3
+
+    def test_equality_matches_none(self, staff):
+        assert [row[0] for row in staff.where(dept=None)] == ["eve"]
+
+    def test_count_and_exists(self, staff):
+        assert staff.where(dept="eng").count() == 3
+        assert staff.where(dept="eng").limit(2).count() == 2
+        assert staff.where(dept="eng").limit(5, offset=2).count() == 1
+        assert staff.where(dept="ops").exists()
+        assert not staff.where(dept="hr").exists()
+        assert not staff.where().limit(0).exists()
+
+    def test_first_and_dicts(self, staff):
+        query = staff.where(dept="eng").select("key").order_by("score")
+        assert query.first() == ("bob",)
+        assert staff.where(dept="hr").first() is None
+        assert list(query.dicts())[0] == {"key": "bob"}
+
+    def test_unknown_column_raises(self, staff):
+        with pytest.raises(KeyError):
+            staff.where(nope=1)
+        with pytest.raises(KeyError):
+            staff.where().order_by("-nope")
+
+    def test_values_are_bound(self, staff):
+        sql, args = staff.where(dept="x' OR 1 --").sql()
+        assert "x'" not in sql and args == ("x' OR 1 --",)
+        assert staff.where(dept="x' OR 1 --").count() == 0
+
+    # ── aggregate ────────────────────────────────────────────────────────────
+
+    def test_scalar_aggregates(self, staff):
+        result = staff.aggregate(sum="score", avg="score", min="score",
+                                 max="score", count=True)
+        assert result == {"count": 5, "sum_score": 295, "avg_score": 59.0,
+                          "min_score": 10, "max_score": 90}
+
+    def test_count_column_skips_null(self, staff):
+        assert staff.aggregate(count="dept") == {"count_dept": 4}
+
+    def test_group_by_returns_one_row_per_group(self, staff):
+        rows = staff.aggregate(sum="score", count=True, group_by="dept")
+        assert rows == [
+            {"dept": None, "count": 1, "sum_score": 10},
+            {"dept": "eng", "count": 3, "sum_score": 195},
+            {"dept": "ops", "count": 1, "sum_score": 90},
+        ]
+
+    def test_having_and_where(self, staff):
+        rows = staff.aggregate(
+            where={"path": "score", "op": "gte", "value": 50},
+            max="score", count=True, group_by="dept",
+            having={"path": "count", "op": "gt", "value": 1})
+        assert rows == [{"dept": "eng", "count": 2, "max_score": 85}]
+
+    def test_aggregate_on_query_respects_limit(self, staff):
+        query = staff.where().order_by("-score").limit(2)
+        assert query.aggregate(sum="score") == {"sum_score": 175}
+        assert staff.where(dept="eng").aggregate(min="score") == \
+            {"min_score": 40}
+
+    def test_aggregate_validation(self, staff):
+        with pytest.raises(ValueError):
+            staff.aggregate()
+        with pytest.raises(ValueError):
+            staff.aggregate(count=True,
+                            having={"path": "count", "op": "gt", "value": 1})
+        with pytest.raises(KeyError):
+            staff.aggregate(sum="nope")
+
+    # ── join ─────────────────────────────────────────────────────────────────
+
+    def test_join_on_foreign_key(self, shop):
+        orders, customers = shop
+        query = orders.join(customers, on="customer_id")
+        assert "JOIN" in query.sql()[0]
+        assert query.columns[4:] == ["customers.key", "customers.col1",
+                                     "customers.city"]
+        assert [(row[0], row[5]) for row in query] == \
+            [("o1", "Ann"), ("o2", "Ann"), ("o3", "Bob")]
+
+    def test_join_found_without_on(self, shop):
+        orders, customers = shop
+        assert orders.join(customers).count() == 3
+        assert customers.join(orders).count() == 3
+        assert orders.join(customers, how="left").count() == 4
+
+    def test_join_select_where_order(self, shop):
+        orders, customers = shop
+        query = orders.join(customers).select("key", "customers.col1", "city")\
+            .where(city="Oslo").order_by("-total")
+        assert list(query.dicts()) == [
+            {"key": "o1", "customers.col1": "Ann", "city": "Oslo"},
+            {"key": "o2", "customers.col1": "Ann", "city": "Oslo"},
+        ]
+
+    def test_conditions_before_join_stay_on_their_table(self, shop):
+        orders, customers = shop
+        query = orders.where(col1="x", total=5).join(customers)
+        assert query.select("key", "customers.key").first() == ("o2", "c1")
+
+    def test_join_aggregate(self, shop):
+        orders, customers = shop
+        rows = orders.join(customers).aggregate(sum="total", count=True,
+                                                group_by="city")
+        assert rows == [{"city": "Oslo", "count": 2, "sum_total": 15.0},
+                        {"city": "Rome", "count": 1, "sum_total": 7.0}]
+        query = customers.join(orders).order_by("orders.key").limit(2)
+        assert query.aggregate(count=True, group_by="customers.key") == \
+            [{"customers.key": "c1", "count": 2}]
+
+    def test_explicit_columns_and_alias(self, shop):
+        orders, customers = shop
+        query = orders.join(customers, on={"customer_id": "key"})\
+            .join(customers, alias="again", on={"customers.key": "key"})
+        assert [row[0] for row in query.select("again.key")] == \
+            ["c1", "c1", "c2"]
+
+    def test_join_errors(self, shop, mem_db):
+        orders, customers = shop
+        with pytest.raises(ValueError):
+            orders.join(customers).join(customers)
+        with pytest.raises(ValueError):
+            orders.join(mem_db["other", "table"], on="customer_id")
+        with pytest.raises(ValueError):
+            orders.join(customers, how="outer")
+        with pytest.raises(KeyError):
+            orders.join(customers).select("customers.nope")
@@ -167,6 +167,41 @@ class TestRESTService:
         assert response.status_code == 201
         assert response.json()["storage_type"] == "table"
     
+    def test_create_storage_with_layout(self, client, setup_db):
+        """Test creating a strict, clustered storage."""
+        payload = {"name": "typed", "storage_type": "table",
+                   "primary_key_dtype": "INTEGER",
+                   "without_rowid": True, "strict": True}
+        response = client.post("/databases/test_db/storages", json=payload)
+        assert response.status_code == 201
+        payload = {"name": "bad", "primary_key_dtype": "VARCHAR(8)",
+                   "strict": True}
+        response = client.post("/databases/test_db/storages", json=payload)
+        assert response.status_code == 400
+    
+    def test_join_storages(self, client, setup_db):
+        """Test joining table storages on a declared foreign key."""
+        db = store["test_db"]
+        customers = db["customers", "table"]
+        customers["c1"] = ("Ann",)
+        orders = db["orders", "table"]
+        orders.add_foreign_key("customer_id", "customers")
+        orders["o1"] = ("x", "c1")
+        orders["o2"] = ("y", None)
+        payload = {"joins": [{"storage": "customers"}],
+                   "select": ["key", "customers.col1"]}
+        response = client.post("/databases/test_db/storages/orders/join",
+                               json=payload)
+        assert response.status_code == 200
+        assert response.json() == {
+            "columns": ["key", "customers.col1"],
+            "items": [{"key": "o1", "customers.col1": "Ann"}],
+        }
+        payload["select"] = ["nope"]
+        response = client.post("/databases/test_db/storages/orders/join",
+                               json=payload)
+        assert response.status_code == 400
+    
     def test_create_duplicate_storage(self, client, setup_db):
         """Test that creating duplicate storage returns error."""
         payload = {"name": "dup_store"}
@@ -234,6 +269,17 @@ class TestRESTService:
         assert data["key"] == "item1"
         assert data["value"]["name"] == "test"
     
+    def test_get_item_preserves_document(self, client, setup_storage):
+        """Test the spliced response body round-trips the stored document."""
+        value = {"name": "caf\u00e9", "tags": [1, None, True], "nested": {"x": 1.5}}
+        client.put(
+            "/databases/test_db/storages/test_store/items/item1",
+            json={"value": value}
+        )
+        response = client.get("/databases/test_db/storages/test_store/items/item1")
+        assert response.status_code == 200
+        assert response.json() == {"key": "item1", "value": value}
+    
     def test_get_nonexistent_item(self, client, setup_storage):
         """Test getting nonexistent item."""
         response = client.get("/databases/test_db/storages/test_store/items/nonexistent")
@@ -295,6 +341,29 @@ class TestRESTService:
         assert response.status_code == 200
         data = response.json()
         assert len(data["items"]) == 2
+        assert data["items"] == [["item1", {"id": 1}], ["item2", {"id": 2}]]
+
+    def test_list_items_with_cursor(self, client, setup_storage):
+        """Test walking all pages with continuation cursors."""
+        for i in range(5):
+            client.put(
+                f"/databases/test_db/storages/test_store/items/item{i}",
+                json={"value": {"id": i}}
+            )
+        url = "/databases/test_db/storages/test_store/items?limit=2"
+        data = client.get(url).json()
+        keys = [key for key, _ in data["items"]]
+        while data["next_cursor"] is not None:
+            data = client.get(f"{url}&cursor={data['next_cursor']}").json()
+            keys += [key for key, _ in data["items"]]
+        assert keys == [f"item{i}" for i in range(5)]
+
+    def test_list_items_invalid_cursor(self, client, setup_storage):
+        """Test a malformed cursor is rejected."""
+        response = client.get(
+            "/databases/test_db/storages/test_store/items?cursor=bogus"
+        )
+        assert response.status_code == 400
 
 
     """Tests for error handling."""
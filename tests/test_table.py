@@ -1,6 +1,7 @@
+import sqlite3
 import pytest
 from typing import Generator
-from db86 import Database
+from db86 import Database, Transaction
 from db86.storages import Table
 
 
@@ -246,6 +247,58 @@ class TestTable:
         rows = int_table["score", 0::2]
         assert isinstance(rows, list)
     
+    def test_col_filt_open_both_ends_returns_all(self, int_table):
+        assert len(int_table["score", :]) == 3
+
+    def test_col_filt_text_bounds_are_parameters(self, int_table):
+        rows = int_table["col1", "a'":"c"]
+        assert [r[1] for r in rows] == ["b"]
+
+    # ── indexes ───────────────────────────────────────────────────────────────
+
+    def test_create_index_listed(self, int_table):
+        name = int_table.create_index("score")
+        assert name == "scores_score_idx"
+        index = [x for x in int_table.indexes if x["name"] == name][0]
+        assert index["columns"] == ["score"]
+        assert not index["unique"] and not index["partial"]
+
+    def test_column_lookups_use_index(self, mem_db, int_table):
+        int_table.create_index("score")
+        plan = mem_db.conn.select(
+            'EXPLAIN QUERY PLAN SELECT * FROM "scores" WHERE "score" >= ?'
+            ' AND "score" < ? ORDER BY _rowid_', (10, 90))
+        assert any("scores_score_idx" in x[3] for x in plan)
+        assert [r[0] for r in int_table["score", 10:90]] == ["low", "mid"]
+        assert [r[0] for r in int_table["score", 90]] == ["high"]
+
+    def test_unique_index_rejects_duplicates(self, mem_db, int_table):
+        int_table.create_index(["col1"], unique=True)
+        with pytest.raises(Exception):
+            mem_db.conn.select_one(
+                'INSERT INTO "scores" VALUES (?, ?, ?)', ("dup", "a", 1))
+
+    def test_partial_covering_index(self, mem_db, int_table):
+        name = int_table.create_index(
+            "col1", name="top", include=["score"],
+            where={"path": "score", "op": "gte", "value": 50})
+        index = [x for x in int_table.indexes if x["name"] == name][0]
+        assert index["partial"] and index["columns"] == ["col1", "score"]
+        sql = mem_db.conn.select_one(
+            'SELECT sql FROM sqlite_master WHERE name = ?', (name,))[0]
+        assert sql.endswith('WHERE "score" IS NOT NULL AND "score" >= 50')
+
+    def test_drop_index(self, int_table):
+        name = int_table.create_index("score")
+        int_table.drop_index(name)
+        assert name not in [x["name"] for x in int_table.indexes]
+        with pytest.raises(KeyError):
+            int_table.drop_index(name)
+
+    def test_create_index_unknown_column_raises(self, int_table):
+        with pytest.raises(KeyError):
+            int_table.create_index("nope")
+
     # ── add_column ────────────────────────────────────────────────────────────
  
     def test_add_column_appears_in_columns(self, table):
@@ -372,6 +425,94 @@ class TestTable:
     def test_to_sql_contains_insert(self, populated):
         _, t = populated
         assert "INSERT" in t.to_sql()
+
+    def test_dump_load_roundtrip(self, mem_db, int_table):
+        import io
+        int_table.create_index("score")
+        int_table["odd"] = {"col1": "it's\n\"quoted\"", "score": None}
+        int_table.insert_many([(f"n{i}", None, i) for i in range(5)])
+        out = io.StringIO()
+        assert int_table.dump(out, batch_rows=3) == 9
+        assert out.getvalue().count("INSERT INTO") == 3
+        rows = sorted(int_table.iter_dict("list"), key=lambda x: x["key"])
+
+        restored = Database(":memory:", autocommit=True)
+        try:
+            out.seek(0)
+            assert restored.load(out, batch_statements=2) == 9
+            table = restored["scores", "table"]
+            assert sorted(table.iter_dict("list"),
+                          key=lambda x: x["key"]) == rows
+            assert "scores_score_idx" in [x["name"] for x in table.indexes]
+        finally:
+            restored.close(do_log=False, force=True)
+
+    def test_dump_reads_bounded_batches(self, mem_db):
+        import io
+        mem_db.conn.execute('CREATE TABLE "kv" ("key" TEXT PRIMARY KEY,'
+                            ' "v" INTEGER) WITHOUT ROWID')
+        table = mem_db["kv", "table"]
+        table.insert_many([(f"k{i}", i) for i in range(5)])
+
+        class Sink(io.StringIO):
+            def write(self, text):
+                # Later batches are separate queries and see this row
+                if text.startswith("INSERT") and "k9" not in table:
+                    table["k9"] = (9,)
+                return super().write(text)
+
+        out = Sink()
+        assert table.dump(out, batch_rows=2) == 6
+        assert out.getvalue().count("INSERT INTO") == 3
+        with pytest.raises(ValueError):
+            table.dump(io.StringIO(), batch_rows=0)
+
+    def test_load_count_ignores_other_threads(self, mem_db, populated):
+        import io
+        import threading
+        _, t = populated
+        dump = t.to_sql()
+        t.delete_range(prefix="")
+        other = mem_db["other", "table"]
+        stop = threading.Event()
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                other[f"k{i}"] = ("x",)
+                i += 1
+
+        # Inside one transaction, the writer's commits cannot end it
+        tx = Transaction("txn", mem_db.conn)
+        tx.begin()
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(20):
+                assert t.load(io.StringIO(dump)) == 3
+                t.delete_range(prefix="")
+        finally:
+            stop.set()
+            writer.join()
+            tx.commit()
+
+    def test_load_into_existing_table_replays_dump(self, populated):
+        import io
+        _, t = populated
+        out = io.StringIO(t.to_sql())
+        t.delete_range(prefix="")
+        assert len(t) == 0
+        assert t.load(out) == 3 and t["bob"] == ("bob", "world")
+
+    def test_load_failure_rolls_back_batch(self, populated):
+        import io
+        _, t = populated
+        dump = t.to_sql()
+        with pytest.raises(Exception):
+            t.load(io.StringIO(dump))    # duplicate keys
+        assert len(t) == 3
+        with pytest.raises(ValueError):
+            t.load(io.StringIO('INSERT INTO "people" VALUES (\'x\''))
     
     # ── to_dict("dict") ──────────────────────────────────────────────────────
  
@@ -453,6 +594,31 @@ class TestTable:
         _, t = populated
         d = t.to_dict("column")
         assert len(d["key"]) == len(d["col1"]) == 3
+
+    def test_to_dict_empty_table(self, table):
+        assert table.to_dict("column") == {"key": [], "col1": []}
+        assert table.to_dict("list") == {"users": []}
+        assert table.to_dict("dict") == {}
+
+    def test_iter_dict_streams_every_shape(self, populated):
+        _, t = populated
+        assert next(t.iter_dict("dict")) == ("alice", {"col1": "hello"})
+        assert list(t.iter_dict("list"))[2] == {"key": "carol", "col1": "xdbx"}
+        chunks = list(t.iter_dict("column", chunk_size=2))
+        assert chunks == [{"key": ["alice", "bob"], "col1": ["hello", "world"]},
+                          {"key": ["carol"], "col1": ["xdbx"]}]
+        with pytest.raises(TypeError):
+            t.iter_dict("invalid")
+
+    def test_iter_dict_reads_bounded_chunks(self, populated):
+        _, t = populated
+        rows = t.iter_dict("list", chunk_size=2)
+        assert next(rows)["key"] == "alice"
+        # Later chunks are separate queries and see rows added meanwhile
+        t["dave"] = ("late",)
+        assert [x["key"] for x in rows] == ["bob", "carol", "dave"]
+        with pytest.raises(ValueError):
+            list(t.iter_dict("list", chunk_size=0))
     
     def test_columns_on_fresh_table(self, table):
         assert table.columns == ["key", "col1"]
@@ -468,4 +634,268 @@ class TestTable:
  
     def test_columns_reflects_rename_column(self, table):
         table.rename_column("col1", "value")
-        assert "value" in table.columns and "col1" not in table.columns
\ No newline at end of file
+        assert "value" in table.columns and "col1" not in table.columns
+
+    # ── bulk insert ──────────────────────────────────────────────────────────
+
+    def test_insert_many_tuples_in_batches(self, table):
+        rows = ((f"k{i}", f"v{i}") for i in range(25))
+        assert table.insert_many(rows, batch_size=10) == 25
+        assert len(table) == 25 and table["k24"] == ("k24", "v24")
+
+    def test_insert_many_dicts_and_columns(self, int_table):
+        count = int_table.insert_many([{"key": "a", "score": 1},
+                                       {"key": "b", "score": 2, "col1": "x"}])
+        assert count == 2
+        assert int_table["a"] == ("a", None, 1)
+        assert int_table["b"] == ("b", None, 2)
+
+    def test_insert_many_column_arrays(self, int_table):
+        from array import array
+        int_table.insert_many({"key": ["p", "q"], "score": array("q", [7, 8])})
+        assert int_table["q"] == ("q", None, 8)
+
+    def test_insert_many_conflicts(self, int_table):
+        rows = [("low", "new", 11)]
+        assert int_table.insert_many(rows, on_conflict="ignore") == 0
+        assert int_table["low"] == ("low", "a", 10)
+        int_table.insert_many([("low", 12)], columns=["key", "score"],
+                              on_conflict="update")
+        assert int_table["low"] == ("low", "a", 12)
+        int_table.insert_many(rows)
+        assert int_table["low"] == ("low", "new", 11)
+
+    def test_insert_many_update_quoted_columns(self, mem_db):
+        mem_db.conn.execute('CREATE TABLE "q" ("key" TEXT PRIMARY KEY,'
+                            ' "va""l" INTEGER)')
+        table = mem_db["q", "table"]
+        table.insert_many([("a", 1)])
+        assert table.insert_many([("a", 2)], on_conflict="update") == 1
+        assert table["a"] == ("a", 2)
+
+    def test_insert_many_count_ignores_other_threads(self, mem_db, table):
+        import threading
+        other = mem_db["other", "table"]
+        stop = threading.Event()
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                other[f"k{i}"] = ("x",)
+                i += 1
+
+        # Inside one transaction, the writer's commits cannot end it
+        tx = Transaction("txn", mem_db.conn)
+        tx.begin()
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for i in range(20):
+                rows = [(f"k{i}:{j}", "v") for j in range(5)]
+                assert table.insert_many(rows, batch_size=2) == 5
+        finally:
+            stop.set()
+            writer.join()
+            tx.commit()
+
+    def test_insert_many_failure_rolls_back(self, int_table):
+        rows = [("new", "x", 1), ("low", "y", 2)]
+        with pytest.raises(Exception):
+            int_table.insert_many(rows, on_conflict="abort", batch_size=1)
+        assert "new" not in int_table and len(int_table) == 3
+
+    def test_insert_many_validation(self, table):
+        assert table.insert_many([]) == 0
+        with pytest.raises(KeyError):
+            table.insert_many([("a",)], columns=["nope"])
+        with pytest.raises(ValueError):
+            table.insert_many([("a", "b")], on_conflict="merge")
+
+    # ── columnar arrays ──────────────────────────────────────────────────────
+
+    def test_to_arrays_uses_declared_types(self, int_table):
+        from array import array
+        arrays = int_table.to_arrays(["score", "key"], use_numpy=False)
+        assert arrays["score"] == array("q", [10, 50, 90])
+        assert arrays["key"] == ["low", "mid", "high"]
+
+    def test_to_arrays_float_dtype_maps_null_to_nan(self, int_table):
+        import math
+        int_table["none"] = {"col1": "d", "score": None}
+        with pytest.raises(ValueError):
+            int_table.to_arrays("score", use_numpy=False)
+        scores = int_table.to_arrays("score", dtype="d",
+                                     use_numpy=False)["score"]
+        assert scores.typecode == "d" and math.isnan(scores[3])
+
+    def test_iter_arrays_chunks(self, int_table):
+        chunks = list(int_table.iter_arrays("score", chunk_size=2,
+                                            use_numpy=False))
+        assert [list(x["score"]) for x in chunks] == [[10, 50], [90]]
+
+    def test_iter_arrays_reads_bounded_chunks(self, int_table):
+        chunks = int_table.iter_arrays("score", chunk_size=2,
+                                       use_numpy=False)
+        assert list(next(chunks)["score"]) == [10, 50]
+        int_table["late"] = {"col1": "d", "score": 70}
+        assert [list(x["score"]) for x in chunks] == [[90, 70]]
+
+    def test_to_arrays_numpy_and_records(self, int_table):
+        np = pytest.importorskip("numpy")
+        arrays = int_table.to_arrays(["score"])
+        assert arrays["score"].dtype == np.int64
+        assert arrays["score"].sum() == 150
+        records = int_table.to_arrays(["key", "score"], record=True)
+        assert records["score"].tolist() == [10, 50, 90]
+        assert records[0]["key"] == "low"
+
+    # ── update_where / delete_where ──────────────────────────────────────────
+
+    def test_update_where_by_column_predicate(self, int_table):
+        count = int_table.update_where(
+            {"path": "score", "op": "gte", "value": 50}, {"col1": "top"}
+        )
+        assert count == 2
+        assert int_table["high"][1] == "top" and int_table["low"][1] == "a"
+
+    def test_delete_where_by_column_predicate(self, int_table):
+        assert int_table.delete_where(
+            {"path": "score", "op": "lt", "value": 50}) == 1
+        assert "low" not in int_table and len(int_table) == 2
+
+    def test_where_counts_ignore_other_threads(self, mem_db, int_table):
+        import threading
+        other = mem_db["other", "table"]
+        stop = threading.Event()
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                other[f"k{i}"] = ("x",)
+                i += 1
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(50):
+                assert int_table.update_where(
+                    {"path": "score", "op": "gte", "value": 50},
+                    {"col1": "top"}) == 2
+                assert int_table.delete_where(
+                    {"path": "score", "op": "gt", "value": 100}) == 0
+        finally:
+            stop.set()
+            writer.join()
+
+    def test_where_unknown_column_raises(self, int_table):
+        with pytest.raises(KeyError):
+            int_table.delete_where({"path": "nope", "op": "eq", "value": 1})
+
+    # ── key ranges ───────────────────────────────────────────────────────────
+
+    def test_keys_by_prefix_in_key_order(self, table):
+        for key in ("b:2", "a:1", "b:1", "c:1"):
+            table[key] = ("x",)
+        assert list(table.keys(prefix="b:")) == ["b:1", "b:2"]
+        assert list(table.keys(start="b", reverse=True, limit=2)) == \
+            ["c:1", "b:2"]
+
+    def test_items_range_yields_rows(self, table):
+        table["a"] = ("x",)
+        table["b"] = ("y",)
+        assert list(table.items(start="b")) == [("b", ("b", "y"))]
+
+    def test_delete_range(self, table):
+        for key in ("a:1", "a:2", "b:1"):
+            table[key] = ("x",)
+        assert table.delete_range(prefix="a:") == 2
+        assert list(table) == ["b:1"]
+        with pytest.raises(ValueError):
+            table.delete_range()
+
+    # ── keyset pages ─────────────────────────────────────────────────────────
+
+    def test_page_walks_rowid_order(self, table):
+        for key in ("c", "a", "b"):
+            table[key] = ("x",)
+        items, cursor = table.page(2)
+        assert [k for k, _ in items] == ["c", "a"]
+        items, cursor = table.page(2, cursor)
+        assert items == [("b", ("b", "x"))] and cursor is None
+
+    def test_page_by_key(self, table):
+        for key in ("c", "a", "b"):
+            table[key] = ("x",)
+        _, cursor = table.page(1, by="key")
+        items, _ = table.page(None, cursor, by="key")
+        assert [k for k, _ in items] == ["b", "c"]
+
+    def test_view_page_keeps_null_rows(self, mem_db):
+        from db86.storages import TableView
+        mem_db.conn.execute('CREATE TABLE "pairs" ("a" INTEGER, "b" TEXT)')
+        rows = [(None, "a"), (None, "b"), (1, None), (1, "x"), (2, "y")]
+        for row in rows:
+            mem_db.conn.execute('INSERT INTO "pairs" VALUES (?, ?)', row)
+        view = TableView("v", mem_db.conn, "c", 'SELECT * FROM "pairs"')
+        seen, cursor = [], None
+        while True:
+            items, cursor = view.page(1, cursor)
+            seen += items
+            if cursor is None:
+                break
+        assert seen == rows
+
+    def test_view_page_blob_cursor(self, mem_db):
+        from db86.storages import TableView
+        mem_db.conn.execute('CREATE TABLE "blobs" ("k" BLOB)')
+        for value in (b"\x00", b"\x01\xff", b"\x02"):
+            mem_db.conn.execute('INSERT INTO "blobs" VALUES (?)', (value,))
+        view = TableView("vb", mem_db.conn, "c", 'SELECT * FROM "blobs"')
+        items, cursor = view.page(2)
+        assert items == [(b"\x00",), (b"\x01\xff",)]
+        assert view.page(2, cursor) == ([(b"\x02",)], None)
+
+    # ── storage layouts ──────────────────────────────────────────────────────
+
+    def test_without_rowid_orders_by_key(self, mem_db):
+        t = mem_db["clustered", "table", {"without_rowid": True}]
+        for key in ("c", "a", "b"):
+            t[key] = (key * 2,)
+        assert list(t) == ["a", "b", "c"]
+        assert t["b"] == ("b", "bb")
+        items, cursor = t.page(2)
+        assert [k for k, _ in items] == ["a", "b"]
+        assert [k for k, _ in t.page(2, cursor)[0]] == ["c"]
+        del t["a"]
+        assert len(t) == 2
+        sql = mem_db.conn.select_one(
+            "SELECT sql FROM sqlite_master WHERE name = 'clustered'")[0]
+        assert "WITHOUT ROWID" in sql
+
+    def test_layout_detected_on_reopen(self, mem_db):
+        mem_db.storage("clustered", "table", without_rowid=True)
+        t = mem_db["clustered", "table"]
+        for key in ("b", "a"):
+            t[key] = ("x",)
+        assert list(t) == ["a", "b"]
+
+    def test_strict_rejects_wrong_types(self, mem_db):
+        t = mem_db.storage("typed", "table", primary_key_dtype="INTEGER",
+                           strict=True)
+        t[1] = ("x",)
+        with pytest.raises(sqlite3.IntegrityError):
+            t["not a number"] = ("x",)
+            t.commit()
+        with pytest.raises(ValueError):
+            mem_db.storage("bad", "table", primary_key_dtype="VARCHAR(10)",
+                           strict=True)
+
+    def test_integer_key_aliases_rowid(self, mem_db):
+        t = mem_db.storage("nums", "table", primary_key_dtype="INTEGER")
+        t[42] = ("x",)
+        assert mem_db.conn.select_one('SELECT rowid FROM "nums"') == (42,)
+
+    def test_invalid_key_dtype_raises(self, mem_db):
+        with pytest.raises(ValueError):
+            mem_db.storage("bad", "table",
+                           primary_key_dtype='TEXT); DROP TABLE "users"; --')